@@ -1,4 +1,5 @@
 import asyncio
+import io
 import logging
 import os
 import time
@@ -14,7 +15,12 @@ from pyrogram.types import (
 
 from config import Config
 from database import db
-from helper import small_caps, format_size, escape_markdown, format_uptime, human_size, check_owner
+from helper import small_caps, format_size, escape_markdown, format_uptime, human_size, check_owner, egress_shaper
+from helper import logpipe, memdiag
+from helper.profiler import MAX_PROFILE_SECONDS, profile
+from helper.registry import stream_registry
+from helper.revocation import revocation_bus
+from helper.accounting import bandwidth_accountant
 
 logger = logging.getLogger(__name__)
 
@@ -31,7 +37,8 @@ async def show_panel(client: Client, source, panel_type: str):
             f"📡 **{small_caps('bandwidth')}**  : {'🟢 ᴀᴄᴛɪᴠᴇ' if bw_toggle else '🔴 ɪɴᴀᴄᴛɪᴠᴇ'} | `{format_size(max_bw)}`\n"
             f"👥 **{small_caps('sudo users')}** : ᴍᴀɴᴀɢᴇ ᴀᴄᴄᴇꜱꜱ\n"
             f"🤖 **{small_caps('bot mode')}**  : {'🟢 ᴘᴜʙʟɪᴄ' if config.get('public_bot') else '🔴 ᴘʀɪᴠᴀᴛᴇ'}\n"
-            f"📢 **{small_caps('force sub')}** : {'🟢 ᴀᴄᴛɪᴠᴇ' if config.get('fsub_mode') else '🔴 ɪɴᴀᴄᴛɪᴠᴇ'}\n\n"
+            f"📢 **{small_caps('force sub')}** : {'🟢 ᴀᴄᴛɪᴠᴇ' if config.get('fsub_mode') else '🔴 ɪɴᴀᴄᴛɪᴠᴇ'}\n"
+            f"🚦 **{small_caps('egress')}**    : `{_format_rate(config.get('egress_limit', 0))}`\n\n"
             "👇 ᴄʜᴏᴏꜱᴇ ᴀ ᴄᴀᴛᴇɢᴏʀʏ ᴛᴏ ᴄᴏɴꜰɪɢᴜʀᴇ."
         )
         buttons = InlineKeyboardMarkup([
@@ -43,6 +50,7 @@ async def show_panel(client: Client, source, panel_type: str):
                 InlineKeyboardButton("🤖 ʙᴏᴛ ᴍᴏᴅᴇ",   callback_data="settings_botmode"),
                 InlineKeyboardButton("📢 ꜰᴏʀᴄᴇ ꜱᴜʙ",  callback_data="settings_fsub"),
             ],
+            [InlineKeyboardButton("🚦 ᴇɢʀᴇꜱꜱ ꜱʜᴀᴘɪɴɢ", callback_data="settings_egress")],
             [InlineKeyboardButton("❌ ᴄʟᴏꜱᴇ", callback_data="settings_close")],
         ])
 
@@ -58,15 +66,45 @@ async def show_panel(client: Client, source, panel_type: str):
             f"⚡ **{small_caps('mode')}**       : {'🟢 ᴀᴄᴛɪᴠᴇ' if bw_toggle else '🔴 ɪɴᴀᴄᴛɪᴠᴇ'}\n"
             f"📊 **{small_caps('limit')}**      : `{format_size(max_bw)}`\n"
             f"📤 **{small_caps('used (total)')}**: `{format_size(bw_used)}` ({bw_pct:.1f}%)\n"
-            f"📅 **{small_caps('used today')}** : `{format_size(bw_today)}`"
+            f"📅 **{small_caps('used today')}** : `{format_size(bw_today)}`\n\n"
+            f"👤 **{small_caps('user daily quota')}**  : `{_format_quota(config.get('user_daily_quota', 0))}`\n"
+            f"👤 **{small_caps('user monthly quota')}**: `{_format_quota(config.get('user_monthly_quota', 0))}`"
         )
         buttons = InlineKeyboardMarkup([
             [InlineKeyboardButton("⚡ ᴛᴏɢɢʟᴇ",         callback_data="toggle_bandwidth")],
             [InlineKeyboardButton("✏️ ꜱᴇᴛ ʟɪᴍɪᴛ",     callback_data="set_bandwidth_limit")],
+            [
+                InlineKeyboardButton("👤 ᴅᴀɪʟʏ Qᴜᴏᴛᴀ",   callback_data="set_quota_daily"),
+                InlineKeyboardButton("👤 ᴍᴏɴᴛʜʟʏ Qᴜᴏᴛᴀ", callback_data="set_quota_monthly"),
+            ],
             [InlineKeyboardButton("🔄 ʀᴇꜱᴇᴛ ᴜꜱᴀɢᴇ",   callback_data="reset_bandwidth")],
             [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ",           callback_data="settings_back")],
         ])
 
+    elif panel_type == "egress_panel":
+        live = egress_shaper.snapshot()
+        text = (
+            f"💠 **{small_caps('egress shaping')}** 💠\n\n"
+            f"🌐 **{small_caps('global')}**      : `{_format_rate(config.get('egress_limit', 0))}`\n"
+            f"👤 **{small_caps('per ip')}**      : `{_format_rate(config.get('ip_egress_limit', 0))}`\n"
+            f"🎞️ **{small_caps('per stream')}**  : `{_format_rate(config.get('stream_egress_limit', 0))}`\n"
+            f"🛡️ **{small_caps('stream floor')}** : `{_format_rate(config.get('stream_floor', 0))}`\n\n"
+            f"📺 **{small_caps('viewers')}** : `{live['viewers']}`  |  "
+            f"📥 **{small_caps('dl budget')}** : `{_format_rate(live['dl_rate'])}`\n\n"
+            "ᴠɪᴇᴡᴇʀꜱ ᴏɴ /ꜱᴛʀᴇᴀᴍ ᴀʀᴇ ɢᴜᴀʀᴀɴᴛᴇᴇᴅ ᴛʜᴇ ꜰʟᴏᴏʀ — /ᴅʟ ᴜꜱᴇꜱ ᴛʜᴇ ʀᴇꜱᴛ."
+        )
+        buttons = InlineKeyboardMarkup([
+            [
+                InlineKeyboardButton(f"🌐 {small_caps('global')}",  callback_data="set_egress_global"),
+                InlineKeyboardButton(f"👤 {small_caps('per ip')}",  callback_data="set_egress_ip"),
+            ],
+            [
+                InlineKeyboardButton(f"🎞️ {small_caps('per stream')}", callback_data="set_egress_stream"),
+                InlineKeyboardButton(f"🛡️ {small_caps('floor')}",      callback_data="set_egress_floor"),
+            ],
+            [InlineKeyboardButton("⬅️ ʙᴀᴄᴋ", callback_data="settings_back")],
+        ])
+
     elif panel_type == "sudo_panel":
         sudo_users = await db.get_sudo_users()
         count = len(sudo_users)
@@ -149,6 +187,31 @@ async def show_panel(client: Client, source, panel_type: str):
         )
 
 
+def _format_rate(rate: int) -> str:
+    return f"{format_size(rate)}/s" if rate else "ᴜɴʟɪᴍɪᴛᴇᴅ"
+
+
+# /logs sends this much of the log's end; Telegram caps messages at 4096 chars
+_LOG_TAIL_BYTES = 3500
+
+_EGRESS_SETTINGS = {
+    "set_egress_global": ("egress_limit",        "global egress limit"),
+    "set_egress_ip":     ("ip_egress_limit",     "per ip egress limit"),
+    "set_egress_stream": ("stream_egress_limit", "per stream egress limit"),
+    "set_egress_floor":  ("stream_floor",        "per viewer stream floor"),
+}
+
+
+_QUOTA_SETTINGS = {
+    "set_quota_daily":   ("user_daily_quota",   "daily per user quota"),
+    "set_quota_monthly": ("user_monthly_quota", "monthly per user quota"),
+}
+
+
+def _format_quota(quota: int) -> str:
+    return format_size(quota) if quota else "ᴜɴʟɪᴍɪᴛᴇᴅ"
+
+
 _pending: dict[int, asyncio.Future] = {}
 
 
@@ -212,6 +275,7 @@ async def settings_callback(client: Client, callback: CallbackQuery):
         "settings_sudo":      ("sudo_panel",      f"👥 {small_caps('sudo users')}"),
         "settings_botmode":   ("botmode_panel",   f"🤖 {small_caps('bot mode settings')}"),
         "settings_fsub":      ("fsub_panel",      f"📌 {small_caps('force sub settings')}"),
+        "settings_egress":    ("egress_panel",    f"🚦 {small_caps('egress shaping')}"),
         "settings_back":      ("main_panel",      f"⬅️ {small_caps('back to main menu')}"),
     }
     if data in panel_nav:
@@ -229,20 +293,20 @@ async def settings_callback(client: Client, callback: CallbackQuery):
 
     if data == "toggle_bandwidth":
         new_val = not config.get("bandwidth_mode", True)
-        await Config.update(db.db, {"bandwidth_mode": new_val})
+        await Config.update(db, {"bandwidth_mode": new_val})
         await callback.answer(f"✅ {small_caps('bandwidth mode toggled')}!", show_alert=True)
         return await show_panel(client, callback, "bandwidth_panel")
 
     if data == "toggle_botmode":
         new_val = not config.get("public_bot", False)
-        await Config.update(db.db, {"public_bot": new_val})
+        await Config.update(db, {"public_bot": new_val})
         mode = small_caps("public") if new_val else small_caps("private")
         await callback.answer(f"✅ {small_caps('bot set to')} {mode}!", show_alert=True)
         return await show_panel(client, callback, "botmode_panel")
 
     if data == "toggle_fsub":
         new_val = not config.get("fsub_mode", False)
-        await Config.update(db.db, {"fsub_mode": new_val})
+        await Config.update(db, {"fsub_mode": new_val})
         await callback.answer(f"✅ {small_caps('force sub toggled')}!", show_alert=True)
         return await show_panel(client, callback, "fsub_panel")
 
@@ -262,10 +326,52 @@ async def settings_callback(client: Client, callback: CallbackQuery):
             await callback.answer(f"❌ {small_caps('invalid number')}!", show_alert=True)
             return
         new_limit = int(text) or 107374182400
-        await Config.update(db.db, {"max_bandwidth": new_limit})
+        await Config.update(db, {"max_bandwidth": new_limit})
         await callback.answer(f"✅ {small_caps('limit set to')} {format_size(new_limit)}!", show_alert=True)
         return await show_panel(client, callback, "bandwidth_panel")
 
+    if data in _EGRESS_SETTINGS:
+        key, label = _EGRESS_SETTINGS[data]
+        text = await ask_input(
+            client, callback.from_user.id,
+            f"🚦 **{small_caps('send ' + label + ' in bytes per second')}**\n\n"
+            f"{small_caps('examples')}:\n"
+            "`12500000` — 100 Mbit/s\n"
+            "`1250000`  — 10 Mbit/s\n"
+            "`524288`   — 512 KB/s\n\n"
+            f"{small_caps('send')} `0` {small_caps('to remove the limit')}.",
+        )
+        if text is None:
+            return
+        if not text.isdigit():
+            await callback.answer(f"❌ {small_caps('invalid number')}!", show_alert=True)
+            return
+        await Config.update(db, {key: int(text)})
+        egress_shaper.reload()
+        await callback.answer(f"✅ {small_caps(label)}: {_format_rate(int(text))}", show_alert=True)
+        return await show_panel(client, callback, "egress_panel")
+
+    if data in _QUOTA_SETTINGS:
+        key, label = _QUOTA_SETTINGS[data]
+        text = await ask_input(
+            client, callback.from_user.id,
+            f"👤 **{small_caps('send ' + label + ' in bytes')}**\n\n"
+            f"{small_caps('bytes served from files a user uploaded, owners excluded')}.\n\n"
+            f"{small_caps('examples')}:\n"
+            "`10737418240` — 10 GB\n"
+            "`5368709120`  — 5 GB\n"
+            "`1073741824`  — 1 GB\n\n"
+            f"{small_caps('send')} `0` {small_caps('to remove the quota')}.",
+        )
+        if text is None:
+            return
+        if not text.isdigit():
+            await callback.answer(f"❌ {small_caps('invalid number')}!", show_alert=True)
+            return
+        await Config.update(db, {key: int(text)})
+        await callback.answer(f"✅ {small_caps(label)}: {_format_quota(int(text))}", show_alert=True)
+        return await show_panel(client, callback, "bandwidth_panel")
+
     if data == "reset_bandwidth":
         await callback.answer(f"🔄 {small_caps('resetting bandwidth usage')}…", show_alert=False)
         ok = await db.reset_bandwidth()
@@ -316,7 +422,7 @@ async def settings_callback(client: Client, callback: CallbackQuery):
         value = int(text) if text != "0" and text.lstrip("-").isdigit() else 0
 
         if value == 0:
-            await Config.update(db.db, {"fsub_chat_id": 0, "fsub_inv_link": ""})
+            await Config.update(db, {"fsub_chat_id": 0, "fsub_inv_link": ""})
             await callback.answer(f"✅ {small_caps('force sub channel unset')}!", show_alert=True)
             return await show_panel(client, callback, "fsub_panel")
 
@@ -349,7 +455,7 @@ async def settings_callback(client: Client, callback: CallbackQuery):
             except Exception:
                 inv = ""
 
-            await Config.update(db.db, {"fsub_chat_id": value, "fsub_inv_link": inv})
+            await Config.update(db, {"fsub_chat_id": value, "fsub_inv_link": inv})
             await callback.answer(
                 f"✅ {small_caps('force sub channel saved')}!\n\n🆔 {small_caps('id')} + 🔗 {small_caps('invite link added')}.",
                 show_alert=True,
@@ -366,7 +472,7 @@ async def settings_callback(client: Client, callback: CallbackQuery):
             f"🔗 **{small_caps('send invite link')}**\n\n{small_caps('send')} `0` {small_caps('to unset')}.",
         )
         if text is not None:
-            await Config.update(db.db, {"fsub_inv_link": "" if text == "0" else text})
+            await Config.update(db, {"fsub_inv_link": "" if text == "0" else text})
             await callback.answer(f"✅ {small_caps('force sub invite link updated')}!", show_alert=True)
             return await show_panel(client, callback, "fsub_panel")
         return
@@ -394,8 +500,17 @@ async def adminstats_command(client: Client, message: Message):
         f"📡 **{small_caps('bandwidth mode')}:**  {bw_mode}\n"
         f"📶 **{small_caps('bw limit')}:**        `{format_size(max_bw)}`\n"
         f"📤 **{small_caps('bw used total')}:**   `{format_size(bw_used)}` ({bw_pct:.1f}%)\n"
-        f"📅 **{small_caps('bw used today')}:**   `{format_size(bw_stats['today_bandwidth'])}`"
+        f"📅 **{small_caps('bw used today')}:**   `{format_size(bw_stats['today_bandwidth'])}`\n\n"
+        f"👤 **{small_caps('user quota')}:**      "
+        f"`{_format_quota(Config.get('user_daily_quota', 0))}` / {small_caps('day')} · "
+        f"`{_format_quota(Config.get('user_monthly_quota', 0))}` / {small_caps('month')}"
     )
+    top_users = bandwidth_accountant.top_users(5)
+    if top_users:
+        text += f"\n\n🏆 **{small_caps('top users this month')}:**\n" + "\n".join(
+            f"`{user}` — `{format_size(month)}` ({small_caps('today')} `{format_size(today)}`)"
+            for user, today, month in top_users
+        )
 
     await client.send_message(
         chat_id=message.chat.id,
@@ -561,6 +676,7 @@ async def revokeall_callback(client: Client, callback: CallbackQuery):
         pass
 
     deleted_count = await db.delete_all_files()
+    await revocation_bus.revoke(everything=True)
     try:
         await callback.message.edit_text(
             f"🗑️ **{small_caps('all files deleted')}!**\n\n"
@@ -585,7 +701,11 @@ async def revokeuser_confirm_callback(client: Client, callback: CallbackQuery):
     except Exception:
         pass
 
+    refs          = await db.get_file_refs(target_id)
     deleted_count = await db.delete_user_files(target_id)
+    await revocation_bus.revoke(
+        [r["file_id"] for r in refs], [r["message_id"] for r in refs],
+    )
     try:
         await callback.message.edit_text(
             f"🗑️ **{small_caps('done')}!**\n\n"
@@ -600,7 +720,8 @@ async def logs_command(client: Client, message: Message):
     if not await check_owner(client, message):
         return
 
-    log_file = "bot.log"
+    log_file = Config.LOG_FILE
+    full     = len(message.command) > 1 and message.command[1].lower() == "full"
 
     if not os.path.isfile(log_file) or os.path.getsize(log_file) == 0:
         await client.send_message(
@@ -610,32 +731,239 @@ async def logs_command(client: Client, message: Message):
         )
         return
 
+    if full:
+        try:
+            await client.send_document(
+                chat_id=message.chat.id,
+                document=log_file,
+                file_name=os.path.basename(log_file),
+                caption=(
+                    f"📋 **{small_caps('bot logs')}**\n\n"
+                    f"📁 **{small_caps('file')}:** `{os.path.basename(log_file)}`\n"
+                    f"📦 **{small_caps('size')}:** `{human_size(os.path.getsize(log_file))}`"
+                ),
+                reply_to_message_id=message.id,
+            )
+        except Exception as exc:
+            logger.error("logs_command send document error: %s", exc)
+            await client.send_message(
+                chat_id=message.chat.id,
+                text=f"❌ **{small_caps('error sending logs')}:** `{exc}`",
+                reply_to_message_id=message.id,
+            )
+        return
+
     try:
-        await client.send_document(
+        tail = logpipe.tail(log_file, _LOG_TAIL_BYTES)
+    except Exception as exc:
+        logger.error("logs_command tail error: %s", exc)
+        await client.send_message(
             chat_id=message.chat.id,
-            document=log_file,
-            file_name="bot.log",
-            caption=(
-                f"📋 **{small_caps('bot logs')}**\n\n"
-                f"📁 **{small_caps('file')}:** `bot.log`\n"
-                f"📦 **{small_caps('size')}:** `{human_size(os.path.getsize(log_file))}`"
+            text=f"❌ **{small_caps('error reading logs')}:** `{exc}`",
+            reply_to_message_id=message.id,
+        )
+        return
+
+    try:
+        await client.send_message(
+            chat_id=message.chat.id,
+            text=(
+                f"📋 **{small_caps('bot logs')}** *({small_caps('tail')} · `/logs full` "
+                f"{small_caps('for the whole file')})*\n\n```\n{tail}\n```"
             ),
             reply_to_message_id=message.id,
         )
     except Exception as exc:
-        logger.error("logs_command send document error: %s", exc)
+        # markup in the log lines can break the message — send the tail as a file
+        logger.debug("logs_command tail message failed, sending as file: %s", exc)
+        doc      = io.BytesIO(tail.encode())
+        doc.name = "tail_" + os.path.basename(log_file)
+        await client.send_document(
+            chat_id=message.chat.id,
+            document=doc,
+            caption=f"📋 **{small_caps('bot logs')}** *({small_caps('tail')})*",
+            reply_to_message_id=message.id,
+        )
+
+
+@Client.on_message(filters.command("profile") & filters.private, group=2)
+async def profile_command(client: Client, message: Message):
+    if not await check_owner(client, message):
+        return
+
+    seconds = 30
+    if len(message.command) > 1:
         try:
-            with open(log_file, "r", encoding="utf-8", errors="replace") as fh:
-                tail = fh.read()[-4000:]
+            seconds = int(message.command[1])
+        except ValueError:
             await client.send_message(
                 chat_id=message.chat.id,
-                text=f"📋 **{small_caps('bot logs')}** *({small_caps('last 4000 chars')})*\n\n```\n{tail}\n```",
+                text=f"❌ **{small_caps('usage')}:** `/profile [seconds]` (1–{MAX_PROFILE_SECONDS})",
                 reply_to_message_id=message.id,
             )
-        except Exception as exc2:
-            logger.error("logs_command fallback error: %s", exc2)
-            await client.send_message(
-                chat_id=message.chat.id,
-                text=f"❌ **{small_caps('error reading logs')}:** `{exc2}`",
-                reply_to_message_id=message.id,
+            return
+    seconds = max(1, min(seconds, MAX_PROFILE_SECONDS))
+
+    status = await client.send_message(
+        chat_id=message.chat.id,
+        text=f"🔬 {small_caps('profiling for')} `{seconds}s`…",
+        reply_to_message_id=message.id,
+    )
+
+    try:
+        path, profiler = await profile(seconds)
+    except RuntimeError as exc:
+        await status.edit_text(f"❌ **{small_caps('profiler busy')}:** `{exc}`")
+        return
+    except Exception as exc:
+        logger.error("profile_command error: %s", exc)
+        await status.edit_text(f"❌ **{small_caps('profiling failed')}:** `{exc}`")
+        return
+
+    top = "\n".join(
+        f"`{share * 100:5.1f}%` `{escape_markdown(name[:60])}`"
+        for name, share in profiler.top_functions(5)
+    )
+    try:
+        await client.send_document(
+            chat_id=message.chat.id,
+            document=path,
+            file_name=os.path.basename(path),
+            caption=(
+                f"🔥 **{small_caps('cpu profile')}**\n\n"
+                f"⏱️ **{small_caps('duration')}:** `{seconds}s`\n"
+                f"🧮 **{small_caps('samples')}:** `{profiler.samples}`\n\n"
+                f"**{small_caps('top frames')}:**\n{top}\n\n"
+                f"{small_caps('collapsed stacks — open with speedscope or flamegraph.pl')}"
+            )[:1024],
+            reply_to_message_id=message.id,
+        )
+        await status.delete()
+    except Exception as exc:
+        logger.error("profile_command send document error: %s", exc)
+        await status.edit_text(f"❌ **{small_caps('could not send profile')}:** `{exc}`")
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+@Client.on_message(filters.command("memory") & filters.private, group=2)
+async def memory_command(client: Client, message: Message):
+    if not await check_owner(client, message):
+        return
+
+    action = message.command[1].lower() if len(message.command) > 1 else "report"
+    if action == "stop":
+        memdiag.stop()
+        await client.send_message(
+            chat_id=message.chat.id,
+            text=f"🧠 **{small_caps('memory tracing stopped')}.**",
+            reply_to_message_id=message.id,
+        )
+        return
+    if action in ("start", "baseline"):
+        memdiag.start()
+        await client.send_message(
+            chat_id=message.chat.id,
+            text=(
+                f"🧠 **{small_caps('baseline taken')}.**\n\n"
+                f"{small_caps('run')} `/memory` {small_caps('later to see what grew')}. "
+                f"{small_caps('tracing slows every allocation and stops by itself after')} "
+                f"`{memdiag.MAX_TRACE_SECONDS // 60}` {small_caps('min')} (`/memory stop` {small_caps('ends it now')})."
+            ),
+            reply_to_message_id=message.id,
+        )
+        return
+    if action != "report":
+        await client.send_message(
+            chat_id=message.chat.id,
+            text=f"❌ **{small_caps('usage')}:** `/memory [start | baseline | stop]`",
+            reply_to_message_id=message.id,
+        )
+        return
+
+    try:
+        rep = await memdiag.report(limit=8)
+    except Exception as exc:
+        logger.error("memory_command error: %s", exc)
+        await client.send_message(
+            chat_id=message.chat.id,
+            text=f"❌ **{small_caps('memory report failed')}:** `{exc}`",
+            reply_to_message_id=message.id,
+        )
+        return
+
+    body = "\n".join(memdiag.format_report(rep, human_size))
+    await client.send_message(
+        chat_id=message.chat.id,
+        text=f"🧠 **{small_caps('memory report')}**\n\n```\n{escape_markdown(body)[:3800]}\n```",
+        reply_to_message_id=message.id,
+    )
+
+
+@Client.on_message(filters.command("streams") & filters.private, group=2)
+async def streams_command(client: Client, message: Message):
+    if not await check_owner(client, message):
+        return
+
+    args   = message.command[1:]
+    action = args[0].lower() if args else "list"
+    usage  = (
+        f"❌ **{small_caps('usage')}:**\n"
+        "`/streams`\n"
+        "`/streams kill <id | file_hash>`\n"
+        "`/streams throttle <id | file_hash> <KB/s>`\n"
+        "`/streams unthrottle <id | file_hash>`"
+    )
+
+    if action == "list":
+        snap  = stream_registry.snapshot(limit=15)
+        lines = [
+            f"📡 **{small_caps('active streams')}:** `{snap['count']}`  ·  "
+            f"`{human_size(snap['rate'])}/s`",
+        ]
+        for s in snap["streams"]:
+            cap = f" ≤{human_size(s['throttle'])}/s" if s["throttle"] else ""
+            lines.append(
+                f"\n`{s['id']}` • {escape_markdown(s['file_name'][:40])}\n"
+                f"   {s['client_ip']} · {s['route']} · DC{s['dc']} · "
+                f"{human_size(s['bytes_sent'])} · {human_size(s['rate'])}/s{cap}\n"
+                f"   `{s['file_hash']}`"
             )
+        if not snap["streams"]:
+            lines.append(f"\n{small_caps('nothing is streaming right now')}.")
+        await client.send_message(
+            chat_id=message.chat.id,
+            text="\n".join(lines)[:4000],
+            reply_to_message_id=message.id,
+            disable_web_page_preview=True,
+        )
+        return
+
+    if len(args) < 2 or action not in ("kill", "throttle", "unthrottle"):
+        await client.send_message(chat_id=message.chat.id, text=usage, reply_to_message_id=message.id)
+        return
+
+    target = args[1]
+    if action == "kill":
+        count = stream_registry.terminate(target)
+        done  = small_caps("terminated")
+    elif action == "unthrottle":
+        count = stream_registry.throttle(target, None)
+        done  = small_caps("unthrottled")
+    else:
+        try:
+            rate = int(float(args[2]) * 1024)
+        except (IndexError, ValueError):
+            await client.send_message(chat_id=message.chat.id, text=usage, reply_to_message_id=message.id)
+            return
+        count = stream_registry.throttle(target, rate)
+        done  = f"{small_caps('throttled to')} `{human_size(rate)}/s`"
+
+    if not count:
+        text = f"❌ **{small_caps('no live stream matches')}** `{target}`."
+    else:
+        text = f"✅ `{count}` {small_caps('stream(s)')} {done}."
+    await client.send_message(chat_id=message.chat.id, text=text, reply_to_message_id=message.id)
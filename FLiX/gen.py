@@ -1,5 +1,8 @@
+import base64
 import logging
 import math
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
 
 from pyrogram import Client, filters
 from pyrogram.types import (
@@ -15,11 +18,16 @@ from pyrogram.types import (
 from config import Config
 from helper import Cryptic, format_size, escape_markdown, small_caps, check_fsub, check_owner
 from database import db
+from helper.revocation import revocation_bus
+from helper.accounting import bandwidth_accountant
 
 logger = logging.getLogger(__name__)
 
 STREAMABLE_TYPES = ("video", "audio")
 PAGE_SIZE = 10
+FIRST_PAGE = "1"            # page token for the newest files
+_EPOCH = datetime(1970, 1, 1)
+_BACKWARD = 0x8000
 
 
 async def check_access(user_id: int) -> bool:
@@ -245,7 +253,7 @@ async def files_command(client: Client, message: Message):
 
         target_id = raw
         markup, caption = await _build_user_files_markup(
-            client, target_id, page=1, owner_view=True
+            client, target_id, FIRST_PAGE, owner_view=True
         )
 
         if Config.Files_IMG:
@@ -278,7 +286,7 @@ async def files_command(client: Client, message: Message):
         return
 
     markup, caption = await _build_user_files_markup(
-        client, str(user_id), page=1, owner_view=False
+        client, str(user_id), FIRST_PAGE, owner_view=False
     )
 
     if Config.Files_IMG:
@@ -302,38 +310,84 @@ async def files_command(client: Client, message: Message):
     )
 
 
+def _page_token(page: int, anchor: dict, backward: bool = False) -> str:
+    """Callback-safe token for the page bordering *anchor* (27 chars).
+
+    Packs the page number (high bit = backward), the anchor's ``created_at``
+    in ms and its ``_id`` so a page turn is a keyset query and every
+    callback stays within Telegram's 64-byte limit.
+    """
+    ms  = (anchor["created_at"] - _EPOCH) // timedelta(milliseconds=1)
+    raw = (
+        (page | (_BACKWARD if backward else 0)).to_bytes(2, "big")
+        + ms.to_bytes(6, "big")
+        + anchor["_id"].binary
+    )
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _parse_page_token(token: str) -> Tuple[int, Optional[tuple], bool]:
+    """``(page, (created_at, _id) or None, backward)``; anything else is page 1."""
+    from bson import ObjectId
+    if token.isdigit():
+        return 1, None, False
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        if len(raw) != 20:
+            raise ValueError("bad token length")
+        head = int.from_bytes(raw[:2], "big")
+        ms   = int.from_bytes(raw[2:8], "big")
+        return (
+            max(1, head & ~_BACKWARD),
+            (_EPOCH + timedelta(milliseconds=ms), ObjectId(raw[8:])),
+            bool(head & _BACKWARD),
+        )
+    except Exception:
+        return 1, None, False
+
+
 async def _build_user_files_markup(
     client,
     user_id: str,
-    page: int,
+    token: str,
     owner_view: bool,
 ) -> tuple:
-    skip           = (page - 1) * PAGE_SIZE
-    user_files_cur, total_files = await db.find_files(user_id, [skip + 1, PAGE_SIZE])
+    page, cursor, backward = _parse_page_token(token)
+    files = await db.find_files(user_id, PAGE_SIZE + 1, cursor, backward)
+    if cursor is not None and not files:
+        # everything past the anchor was revoked — start over from the top
+        page, cursor, backward, token = 1, None, False, FIRST_PAGE
+        files = await db.find_files(user_id, PAGE_SIZE + 1)
+    if backward:
+        has_prev, has_next = len(files) > PAGE_SIZE, True
+        files = files[-PAGE_SIZE:]
+        if not has_prev:
+            page, token = 1, FIRST_PAGE
+    else:
+        has_prev, has_next = cursor is not None, len(files) > PAGE_SIZE
+        files = files[:PAGE_SIZE]
+    total_files = await db.count_user_files(user_id)
 
     file_list = []
-    async for x in user_files_cur:
+    for x in files:
         name = x.get("file_name", "Unknown")
         if len(name) > 30:
             name = name[:27] + "…"
         cb = (
             f"ownview_{x['message_id']}_{user_id}"
             if owner_view
-            else f"myfile_{x['_id']}_{page}"
+            else f"myfile_{x['_id']}_{token}"
         )
         file_list.append([InlineKeyboardButton(f"📄 {name}", callback_data=cb)])
 
-    total_pages = math.ceil(total_files / PAGE_SIZE) if total_files else 1
+    total_pages = max(page + has_next, math.ceil(total_files / PAGE_SIZE) if total_files else 1)
+    prefix      = f"ownfiles_{user_id}_" if owner_view else "userfiles_"
 
-    if total_files > PAGE_SIZE:
+    if has_prev or has_next:
         nav = []
-        if page > 1:
-            prev_cb = (
-                f"ownfiles_{user_id}_{page - 1}"
-                if owner_view
-                else f"userfiles_{page - 1}"
-            )
-            nav.append(InlineKeyboardButton("◄", callback_data=prev_cb))
+        if has_prev:
+            prev_token = _page_token(page - 1, files[0], backward=True) if page > 2 else FIRST_PAGE
+            nav.append(InlineKeyboardButton("◄", callback_data=prefix + prev_token))
         else:
             nav.append(InlineKeyboardButton("◄", callback_data="N/A"))
 
@@ -341,13 +395,8 @@ async def _build_user_files_markup(
             f"{page}/{total_pages}", callback_data="N/A"
         ))
 
-        if page < total_pages:
-            next_cb = (
-                f"ownfiles_{user_id}_{page + 1}"
-                if owner_view
-                else f"userfiles_{page + 1}"
-            )
-            nav.append(InlineKeyboardButton("►", callback_data=next_cb))
+        if has_next:
+            nav.append(InlineKeyboardButton("►", callback_data=prefix + _page_token(page + 1, files[-1])))
         else:
             nav.append(InlineKeyboardButton("►", callback_data="N/A"))
 
@@ -360,11 +409,23 @@ async def _build_user_files_markup(
 
     markup = InlineKeyboardMarkup(file_list)
 
+    day_used, month_used = bandwidth_accountant.usage(user_id)
+    daily   = Config.get("user_daily_quota", 0)
+    monthly = Config.get("user_monthly_quota", 0)
+    usage = (
+        f"📡 **{small_caps('served today')}:** `{format_size(day_used)}`"
+        + (f" / `{format_size(daily)}`" if daily else "")
+        + f"\n🗓️ **{small_caps('this month')}:** `{format_size(month_used)}`"
+        + (f" / `{format_size(monthly)}`" if monthly else "")
+        + "\n\n"
+    )
+
     if owner_view:
         caption = (
             f"📂 **{small_caps('files for user')}** `{user_id}`\n"
             f"📊 **{small_caps('total')}:** `{total_files}` "
             f"| **{small_caps('page')}:** `{page}/{total_pages}`\n\n"
+            f"{usage}"
             "ᴄʟɪᴄᴋ ᴀ ꜰɪʟᴇ ᴛᴏ ᴠɪᴇᴡ ᴏʀ ʀᴇᴠᴏᴋᴇ ɪᴛ:"
         ) if total_files else (
             f"📂 **{small_caps('files for user')}** `{user_id}`\n\n"
@@ -375,6 +436,7 @@ async def _build_user_files_markup(
             f"📂 **{small_caps('your files')}**\n"
             f"📊 **{small_caps('total')}:** `{total_files}` "
             f"| **{small_caps('page')}:** `{page}/{total_pages}`\n\n"
+            f"{usage}"
             "ᴄʟɪᴄᴋ ᴏɴ ᴀɴʏ ꜰɪʟᴇ ᴛᴏ ᴠɪᴇᴡ ᴅᴇᴛᴀɪʟꜱ:"
         ) if total_files else (
             f"📂 **{small_caps('your files')}**\n\n"
@@ -385,13 +447,14 @@ async def _build_user_files_markup(
     return markup, caption
 
 
-@Client.on_callback_query(filters.regex(r"^userfiles_\d+$"), group=0)
+@Client.on_callback_query(filters.regex(r"^userfiles_"), group=0)
 async def cb_user_files_page(client: Client, callback: CallbackQuery):
-    page    = int(callback.data.replace("userfiles_", ""))
+    # Format: userfiles_<page token>
+    token   = callback.data[len("userfiles_"):]
     user_id = str(callback.from_user.id)
 
     markup, caption = await _build_user_files_markup(
-        client, user_id, page=page, owner_view=False
+        client, user_id, token, owner_view=False
     )
     try:
         await callback.message.edit_text(caption, reply_markup=markup)
@@ -405,13 +468,13 @@ async def cb_owner_files_page(client: Client, callback: CallbackQuery):
     if not await check_owner(client, callback):
         return
 
-    # Format: ownfiles_<user_id>_<page>
+    # Format: ownfiles_<user_id>_<page token>
     parts     = callback.data.split("_", 2)
     target_id = parts[1]
-    page      = int(parts[2]) if len(parts) > 2 else 1
+    token     = parts[2] if len(parts) > 2 else FIRST_PAGE
 
     markup, caption = await _build_user_files_markup(
-        client, target_id, page=page, owner_view=True
+        client, target_id, token, owner_view=True
     )
     try:
         await callback.message.edit_text(caption, reply_markup=markup)
@@ -422,16 +485,12 @@ async def cb_owner_files_page(client: Client, callback: CallbackQuery):
 
 @Client.on_callback_query(filters.regex(r"^myfile_"), group=0)
 async def cb_user_file_detail(client: Client, callback: CallbackQuery):
-    # Format: myfile_<_id_hex>_<page>
+    # Format: myfile_<_id_hex>_<page token>
     parts     = callback.data.split("_", 2)
     oid_str   = parts[1]
-    back_page = int(parts[2]) if len(parts) > 2 else 1
+    back_page = parts[2] if len(parts) > 2 else FIRST_PAGE
 
-    from bson import ObjectId
-    try:
-        file_data = await db.files.find_one({"_id": ObjectId(oid_str)})
-    except Exception:
-        file_data = None
+    file_data = await db.get_file_by_oid(oid_str)
 
     if not file_data:
         await callback.answer("❌ ꜰɪʟᴇ ɴᴏᴛ ꜰᴏᴜɴᴅ", show_alert=True)
@@ -605,6 +664,7 @@ async def cb_owner_revoke_yes(client: Client, callback: CallbackQuery):
         logger.error("owner revoke dump delete: msg=%s err=%s", file_data["message_id"], exc)
 
     await db.delete_file(file_data["message_id"])
+    await revocation_bus.revoke([file_hash], [file_data["message_id"]])
 
     safe_name = escape_markdown(file_data["file_name"])
     await callback.message.edit_text(
@@ -615,7 +675,7 @@ async def cb_owner_revoke_yes(client: Client, callback: CallbackQuery):
         reply_markup=InlineKeyboardMarkup([
             [InlineKeyboardButton(
                 f"⬅️ {small_caps('back to user files')}",
-                callback_data=f"ownfiles_{target_id}_1",
+                callback_data=f"ownfiles_{target_id}_{FIRST_PAGE}",
             )],
         ]),
     )
@@ -629,7 +689,7 @@ async def cb_owner_revoke_no(client: Client, callback: CallbackQuery):
 
     target_id = callback.data[len("ownrevoke_no_"):]
     markup, caption = await _build_user_files_markup(
-        client, target_id, page=1, owner_view=True
+        client, target_id, FIRST_PAGE, owner_view=True
     )
     try:
         await callback.message.edit_text(caption, reply_markup=markup)
@@ -645,7 +705,7 @@ async def cb_owner_back(client: Client, callback: CallbackQuery):
 
     target_id = callback.data[len("ownback_"):]
     markup, caption = await _build_user_files_markup(
-        client, target_id, page=1, owner_view=True
+        client, target_id, FIRST_PAGE, owner_view=True
     )
     try:
         await callback.message.edit_text(caption, reply_markup=markup)
@@ -660,12 +720,12 @@ async def cb_owner_back(client: Client, callback: CallbackQuery):
 #       confirmation and execution are handled in one place.
 @Client.on_callback_query(filters.regex(r"^revoke_(?!yes_|no_)"), group=0)
 async def cb_revoke_confirm(client: Client, callback: CallbackQuery):
-    # Format (from file detail): revoke_<file_hash>_<back_page>
-    # Format (from /revoke cmd): revoke_<file_hash>   (no back_page)
+    # Format (from file detail): revoke_<file_hash>_<page token>
+    # Format (from /revoke cmd): revoke_<file_hash>   (no page token)
     raw       = callback.data[len("revoke_"):]
     parts     = raw.split("_", 1)
     file_hash = parts[0]
-    back_page = parts[1] if len(parts) > 1 else "1"
+    back_page = parts[1] if len(parts) > 1 else FIRST_PAGE
 
     file_data = await db.get_file_by_hash(file_hash)
     if not file_data:
@@ -691,11 +751,11 @@ async def cb_revoke_confirm(client: Client, callback: CallbackQuery):
 
 @Client.on_callback_query(filters.regex(r"^revoke_yes_"), group=0)
 async def cb_revoke_yes(client: Client, callback: CallbackQuery):
-    # Format: revoke_yes_<file_hash>_<back_page>
+    # Format: revoke_yes_<file_hash>_<page token>
     raw       = callback.data[len("revoke_yes_"):]
     parts     = raw.split("_", 1)
     file_hash = parts[0]
-    back_page = parts[1] if len(parts) > 1 else "1"
+    back_page = parts[1] if len(parts) > 1 else FIRST_PAGE
 
     file_data = await db.get_file_by_hash(file_hash)
     if not file_data:
@@ -707,6 +767,7 @@ async def cb_revoke_yes(client: Client, callback: CallbackQuery):
         return
 
     await db.delete_file(file_data["message_id"])
+    await revocation_bus.revoke([file_hash], [file_data["message_id"]])
 
     safe_name = escape_markdown(file_data["file_name"])
     await callback.message.edit_text(
@@ -723,15 +784,11 @@ async def cb_revoke_yes(client: Client, callback: CallbackQuery):
 
 @Client.on_callback_query(filters.regex(r"^revoke_no_"), group=0)
 async def cb_revoke_no(client: Client, callback: CallbackQuery):
-    back_page_str = callback.data[len("revoke_no_"):]
-    try:
-        back_page = int(back_page_str)
-    except ValueError:
-        back_page = 1
+    back_page = callback.data[len("revoke_no_"):] or FIRST_PAGE
 
     user_id = str(callback.from_user.id)
     markup, caption = await _build_user_files_markup(
-        client, user_id, page=back_page, owner_view=False
+        client, user_id, back_page, owner_view=False
     )
     try:
         await callback.message.edit_text(caption, reply_markup=markup)
@@ -1,7 +1,8 @@
-import json
+import hmac
 import logging
 import time
 import asyncio
+from datetime import datetime, timedelta
 from pathlib import Path
 
 import psutil
@@ -13,8 +14,18 @@ from bot import Bot
 from config import Config
 from database import Database
 from helper import StreamingService, check_bandwidth_limit, format_size
+from helper.admission import admission, conn_limiter
+from helper.metrics import render_metrics
+from helper import tracing
+from helper.loopmon import loop_monitor
+from helper import memdiag
+from helper.dashboard import DashboardSampler
+from helper.registry import stream_registry
+from helper.accounting import HOUR, SCOPES, auto_step, bandwidth_accountant, parse_span
 from helper.stream import (
     get_active_session_count,
+    get_dc_health,
+    is_session_active,
     _register_session,
     _unregister_session,
     _get_client_ip,
@@ -41,6 +52,19 @@ def _bot_info(bot: Bot) -> dict:
 def build_app(bot: Bot, database) -> web.Application:
     streaming_service = StreamingService(bot, database)
 
+    @web.middleware
+    async def request_id_middleware(request: web.Request, handler):
+        token = tracing.begin_request(request.headers.get("X-Request-ID"))
+        try:
+            with tracing.span("http.request", method=request.method, path=request.path) as sp:
+                response = await handler(request)
+                sp.set(status=response.status)
+            if not response.prepared:
+                response.headers.setdefault("X-Request-ID", tracing.current_request_id())
+            return response
+        finally:
+            tracing.end_request(token)
+
     @web.middleware
     async def not_found_middleware(request: web.Request, handler):
         try:
@@ -82,7 +106,7 @@ def build_app(bot: Bot, database) -> web.Application:
                 content_type="text/plain",
             )
 
-    app = web.Application(middlewares=[not_found_middleware])
+    app = web.Application(middlewares=[request_id_middleware, not_found_middleware])
     aiohttp_jinja2.setup(app, loader=jinja2.FileSystemLoader(str(TEMPLATES_DIR)))
 
     @aiohttp_jinja2.template("home.html")
@@ -100,10 +124,50 @@ def build_app(bot: Bot, database) -> web.Application:
         # player only refresh the heartbeat, they never increment the counter.
         client_ip   = _get_client_ip(request)
         session_key = f"{file_hash}:{client_ip}"
+
+        # Per-IP / per-(IP, file) connection caps; excess connections queue.
+        with tracing.span("conn_limiter.acquire") as sp:
+            acquired = await conn_limiter.acquire(client_ip, file_hash)
+            sp.set(acquired=acquired)
+        if not acquired:
+            return web.Response(
+                status=503,
+                text="Too many connections — please retry shortly",
+                headers={"Retry-After": str(int(Config.CONN_QUEUE_TIMEOUT))},
+            )
+        try:
+            return await _admitted_stream(request, file_hash, client_ip, session_key, is_download)
+        finally:
+            conn_limiter.release(client_ip, file_hash)
+
+    async def _admitted_stream(
+        request: web.Request,
+        file_hash: str,
+        client_ip: str,
+        session_key: str,
+        is_download: bool,
+    ):
+        # Admission control: continuing sessions always pass so existing
+        # viewers keep seeking smoothly; new ones are shed or queued.
+        with tracing.span("admission.acquire") as sp:
+            retry_after = await admission.acquire(
+                is_download,
+                is_session_active(session_key),
+                streaming_service.peek_dc(file_hash),
+            )
+            sp.set(retry_after=retry_after)
+        if retry_after is not None:
+            return web.Response(
+                status=503,
+                text="Server busy — please retry shortly",
+                headers={"Retry-After": str(retry_after)},
+            )
+
         await _register_session(session_key)
         try:
             return await streaming_service.stream_file(request, file_hash, is_download=is_download)
         finally:
+            admission.release()
             await _unregister_session(session_key)
 
     async def stream_page(request: web.Request):
@@ -114,15 +178,17 @@ def build_app(bot: Bot, database) -> web.Application:
         if range_h or "text/html" not in accept:
             return await _tracked_stream(request, file_hash, is_download=False)
 
-        file_data = await database.get_file_by_hash(file_hash)
-        if not file_data:
+        with tracing.span("db.get_file_record"):
+            file_data = await database.get_file_record(file_hash)
+        if file_data is None:
             raise web.HTTPNotFound(reason="File not found")
 
         # Also verify the file exists in the Flog/dump channel so we can
         # surface a clean 404 instead of a player error mid-stream.
         try:
             from helper.stream import get_file_ids
-            await get_file_ids(bot, str(file_data["message_id"]))
+            with tracing.span("tg.get_messages"):
+                await get_file_ids(bot, file_data.message_id)
         except web.HTTPNotFound:
             raise
         except Exception as exc:
@@ -131,22 +197,25 @@ def build_app(bot: Bot, database) -> web.Application:
             )
             raise web.HTTPNotFound(reason="File no longer available on Telegram")
 
-        allowed, _ = await check_bandwidth_limit(database)
+        with tracing.span("db.check_bandwidth"):
+            allowed, _ = await check_bandwidth_limit(database)
         if not allowed:
             raise web.HTTPServiceUnavailable(reason="bandwidth limit exceeded")
+        if Config.get("bandwidth_mode", True) and bandwidth_accountant.over_quota(file_data.user_id):
+            raise web.HTTPServiceUnavailable(reason="user bandwidth quota exceeded")
 
         base      = str(request.url.origin())
         file_type = (
-            "video"   if file_data["file_type"] == Config.FILE_TYPE_VIDEO
-            else "audio" if file_data["file_type"] == Config.FILE_TYPE_AUDIO
+            "video"   if file_data.file_type == Config.FILE_TYPE_VIDEO
+            else "audio" if file_data.file_type == Config.FILE_TYPE_AUDIO
             else "document"
         )
 
         mime = (
-            file_data.get("mime_type")
+            file_data.mime_type
             or _mime_for_filename(
-                file_data["file_name"],
-                MIME_TYPE_MAP.get(file_data.get("file_type"), "application/octet-stream"),
+                file_data.file_name,
+                MIME_TYPE_MAP.get(file_data.file_type, "application/octet-stream"),
             )
             or "application/octet-stream"
         )
@@ -161,8 +230,8 @@ def build_app(bot: Bot, database) -> web.Application:
             "bot_name":         info["bot_name"],
             "bot_username":     info["bot_username"],
             "owner_username":   "FLiX_LY",
-            "file_name":        file_data["file_name"],
-            "file_size":        format_size(file_data["file_size"]),
+            "file_name":        file_data.file_name,
+            "file_size":        format_size(file_data.file_size),
             "file_type":        file_type,
             "mime_type":        mime,
             "browser_playable": playable,
@@ -177,13 +246,19 @@ def build_app(bot: Bot, database) -> web.Application:
         file_hash = request.match_info["file_hash"]
         return await _tracked_stream(request, file_hash, is_download=True)
 
+    db_cache = {"at": float("-inf"), "stats": None, "bw_stats": None}
+
     async def _collect_panel_data():
-        try:
-            stats    = await database.get_stats()
-            bw_stats = await database.get_bandwidth_stats()
-        except Exception:
-            stats    = {"total_users": 0, "total_files": 0}
-            bw_stats = {"total_bandwidth": 0, "today_bandwidth": 0}
+        now = time.monotonic()
+        if now - db_cache["at"] >= Config.DASHBOARD_DB_INTERVAL:
+            db_cache["at"] = now
+            try:
+                db_cache["stats"]    = await database.get_stats()
+                db_cache["bw_stats"] = await database.get_bandwidth_stats()
+            except Exception as exc:
+                logger.error("dashboard db refresh error: %s", exc)
+        stats    = db_cache["stats"]    or {"total_users": 0, "total_files": 0}
+        bw_stats = db_cache["bw_stats"] or {"total_bandwidth": 0, "today_bandwidth": 0}
 
         max_bw    = Config.get("max_bandwidth", 107374182400)
         bw_mode   = Config.get("bandwidth_mode", True)
@@ -205,27 +280,72 @@ def build_app(bot: Bot, database) -> web.Application:
         uptime_seconds = time.time() - Config.UPTIME if Config.UPTIME else 0
         uptime_str     = _format_uptime(uptime_seconds)
 
-        info = _bot_info(bot)
+        info       = _bot_info(bot)
+        bot_status = "running" if getattr(bot, "me", None) else "initializing"
 
         return {
-            **info,
-            "total_users":  stats.get("total_users",  0),
-            "total_chats":  stats.get("total_users",  0),
-            "total_files":  stats.get("total_files",  0),
-            "ram_used":     ram_used_fmt,
-            "ram_pct":      ram_pct,
-            "cpu_pct":      cpu_pct,
-            "uptime":       uptime_str,
-            "bw_mode":      bw_mode,
-            "bw_limit":     format_size(max_bw),
-            "bw_used":      format_size(bw_used),
-            "bw_today":     format_size(bw_today),
-            "bw_remaining": format_size(remaining),
-            "bw_pct":       bw_pct,
-            "bot_status":   "running" if getattr(bot, "me", None) else "initializing",
-            "active_conns": get_active_session_count(),
+            "panel": {
+                **info,
+                "total_users":  stats.get("total_users",  0),
+                "total_chats":  stats.get("total_users",  0),
+                "total_files":  stats.get("total_files",  0),
+                "ram_used":     ram_used_fmt,
+                "ram_pct":      ram_pct,
+                "cpu_pct":      cpu_pct,
+                "uptime":       uptime_str,
+                "bw_mode":      bw_mode,
+                "bw_limit":     format_size(max_bw),
+                "bw_used":      format_size(bw_used),
+                "bw_today":     format_size(bw_today),
+                "bw_remaining": format_size(remaining),
+                "bw_pct":       bw_pct,
+                "bot_status":   bot_status,
+                "active_conns": get_active_session_count(),
+            },
+            "stats": {
+                "total_users": stats.get("total_users", 0),
+                "total_chats": stats.get("total_users", 0),
+                "total_files": stats.get("total_files", 0),
+                "ram_used":    ram_used_fmt,
+                "cpu_pct":     cpu_pct,
+                "uptime":      uptime_str,
+                "bw_pct":      bw_pct,
+                "bw_used":     format_size(bw_used),
+                "bw_today":    format_size(bw_today),
+                "bw_limit":    format_size(max_bw),
+            },
+            "bandwidth": {
+                **bw_stats,
+                "limit":          max_bw,
+                "remaining":      remaining,
+                "percentage":     bw_pct,
+                "bandwidth_mode": bw_mode,
+                "formatted": {
+                    "total_bandwidth": format_size(bw_used),
+                    "today_bandwidth": format_size(bw_today),
+                    "limit":           format_size(max_bw),
+                    "remaining":       format_size(remaining),
+                },
+            },
+            "health": {
+                "status":       "ok",
+                "bot_status":   bot_status,
+                "bot_name":     info["bot_name"],
+                "bot_username": info["bot_username"],
+                "bot_id":       info["bot_id"],
+                "bot_dc":       info["bot_dc"],
+                "active_conns": get_active_session_count(),
+                "admission":    admission.snapshot(),
+                "connections":  conn_limiter.snapshot(),
+                "dc_health":    get_dc_health(),
+                "event_loop":   loop_monitor.snapshot(),
+            },
+            # totals only: the page is public, rows come from /admin/streams
+            "streams": stream_registry.summary(),
         }
 
+    dashboard = DashboardSampler(_collect_panel_data, Config.DASHBOARD_INTERVAL)
+
     def _format_uptime(seconds: float) -> str:
         seconds = int(seconds)
         d, seconds = divmod(seconds, 86400)
@@ -240,7 +360,7 @@ def build_app(bot: Bot, database) -> web.Application:
 
     async def bot_settings_page(request: web.Request):
         try:
-            ctx = await _collect_panel_data()
+            ctx = (await dashboard.get("panel")).data
             return aiohttp_jinja2.render_template("bot_settings.html", request, ctx)
         except Exception as exc:
             logger.error("bot_settings page error: %s", exc)
@@ -248,84 +368,155 @@ def build_app(bot: Bot, database) -> web.Application:
 
     async def api_stats(request: web.Request):
         try:
-            stats    = await database.get_stats()
-            bw_stats = await database.get_bandwidth_stats()
-            max_bw   = Config.get("max_bandwidth", 107374182400)
-            bw_used  = bw_stats["total_bandwidth"]
-            bw_today = bw_stats["today_bandwidth"]
-            bw_pct   = round((bw_used / max_bw * 100) if max_bw else 0, 1)
-
-            try:
-                ram          = psutil.virtual_memory()
-                cpu_pct      = psutil.cpu_percent(interval=None)
-                ram_used_fmt = format_size(ram.used)
-            except Exception:
-                cpu_pct      = 0
-                ram_used_fmt = "N/A"
-
-            uptime_str = _format_uptime(time.time() - Config.UPTIME if Config.UPTIME else 0)
-
-            payload = {
-                "total_users": stats.get("total_users", 0),
-                "total_chats": stats.get("total_users", 0),
-                "total_files": stats.get("total_files", 0),
-                "ram_used":    ram_used_fmt,
-                "cpu_pct":     cpu_pct,
-                "uptime":      uptime_str,
-                "bw_pct":      bw_pct,
-                "bw_used":     format_size(bw_used),
-                "bw_today":    format_size(bw_today),
-                "bw_limit":    format_size(max_bw),
-            }
-            return web.Response(text=json.dumps(payload), content_type="application/json")
+            return dashboard.respond(request, await dashboard.get("stats"))
         except Exception as exc:
             logger.error("api_stats error: %s", exc)
             return web.json_response({"error": str(exc)}, status=500)
 
     async def api_bandwidth(request: web.Request):
         try:
-            stats     = await database.get_bandwidth_stats()
-            max_bw    = Config.get("max_bandwidth", 107374182400)
-            bw_mode   = Config.get("bandwidth_mode", True)
-            used      = stats["total_bandwidth"]
-            today     = stats["today_bandwidth"]
-            remaining = max(0, max_bw - used)
-            pct       = round((used / max_bw * 100) if max_bw else 0, 1)
-            payload = {
-                **stats,
-                "limit":          max_bw,
-                "remaining":      remaining,
-                "percentage":     pct,
-                "bandwidth_mode": bw_mode,
-                "formatted": {
-                    "total_bandwidth": format_size(used),
-                    "today_bandwidth": format_size(today),
-                    "limit":           format_size(max_bw),
-                    "remaining":       format_size(remaining),
-                },
-            }
-            return web.Response(text=json.dumps(payload), content_type="application/json")
+            return dashboard.respond(request, await dashboard.get("bandwidth"))
         except Exception as exc:
             logger.error("api_bandwidth error: %s", exc)
             return web.json_response({"error": str(exc)}, status=500)
 
+    async def api_bandwidth_history(request: web.Request):
+        query = request.query
+        scope = query.get("scope", "total")
+        key   = query.get("key", "")
+        if scope not in SCOPES:
+            return web.json_response({"error": f"scope must be one of {', '.join(SCOPES)}"}, status=400)
+        if scope != "total" and not key:
+            return web.json_response({"error": "key is required for this scope"}, status=400)
+        try:
+            top = min(50, max(0, int(query.get("top", 0))))
+            now = datetime.utcnow()
+            if "from" in query:
+                since = datetime.utcfromtimestamp(float(query["from"]))
+            else:
+                since = now - timedelta(seconds=parse_span(query.get("range", ""), 24 * HOUR))
+            until = datetime.utcfromtimestamp(float(query["to"])) if "to" in query else now
+            if until <= since:
+                raise ValueError("empty range")
+            step = max(
+                -(-parse_span(query.get("step", ""), HOUR) // HOUR) * HOUR,
+                auto_step(until - since, Config.HISTORY_MAX_POINTS),
+            )
+        except (ValueError, OverflowError, OSError):
+            return web.json_response(
+                {"error": "range / step like 24h, 7d; from / to in unix seconds"}, status=400,
+            )
+        # per-file / per-user breakdowns name what people watched — operators only
+        if (scope != "total" or top) and not _admin_authorized(request):
+            return web.json_response({"error": "not found"}, status=404)
+        try:
+            result = await bandwidth_accountant.history(database, scope, key, since, until, step, top)
+            return web.json_response(result, headers={
+                "Cache-Control": f"private, max-age={max(1, int(Config.BANDWIDTH_FLUSH_INTERVAL))}",
+            })
+        except Exception as exc:
+            logger.error("api_bandwidth_history error: %s", exc)
+            return web.json_response({"error": str(exc)}, status=500)
+
     async def api_health(request: web.Request):
         try:
-            info = _bot_info(bot)
-            payload = {
-                "status":       "ok",
-                "bot_status":   "running" if getattr(bot, "me", None) else "initializing",
-                "bot_name":     info["bot_name"],
-                "bot_username": info["bot_username"],
-                "bot_id":       info["bot_id"],
-                "bot_dc":       info["bot_dc"],
-                "active_conns": get_active_session_count(),
-            }
-            return web.Response(text=json.dumps(payload), content_type="application/json")
+            return dashboard.respond(request, await dashboard.get("health"))
         except Exception as exc:
             logger.error("api_health error: %s", exc)
             return web.json_response({"error": str(exc)}, status=500)
 
+    async def api_live(request: web.Request):
+        if dashboard.subscriber_count >= Config.LIVE_MAX_CLIENTS:
+            return web.json_response({"error": "too many live clients"}, status=503)
+        await dashboard.get("health")   # make sure there is a snapshot to start from
+        response = web.StreamResponse(headers={
+            "Content-Type":      "text/event-stream",
+            "Cache-Control":     "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await response.prepare(request)
+        queue = dashboard.subscribe()
+        try:
+            await response.write(b"retry: 3000\n" + dashboard.snapshot_event())
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    message = b": keepalive\n\n"
+                if message is None:
+                    message = dashboard.snapshot_event()
+                elif not message:
+                    break
+                await response.write(message)
+        except ConnectionResetError:
+            pass   # client went away mid-write
+        finally:
+            dashboard.unsubscribe(queue)
+        return response
+
+    async def metrics_endpoint(request: web.Request):
+        return web.Response(
+            text=render_metrics(),
+            content_type="text/plain",
+            headers={"Cache-Control": "no-store"},
+            charset="utf-8",
+        )
+
+    def _admin_authorized(request: web.Request) -> bool:
+        if not Config.ADMIN_TOKEN:
+            return False
+        auth  = request.headers.get("Authorization", "")
+        token = auth[7:] if auth.startswith("Bearer ") else request.query.get("token", "")
+        return hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode())
+
+    async def admin_memory(request: web.Request):
+        if not _admin_authorized(request):
+            return web.json_response({"error": "not found"}, status=404)
+        action = request.query.get("action", "report")
+        try:
+            if action in ("start", "baseline"):
+                memdiag.start()
+                return web.json_response({
+                    "status":           "baseline taken",
+                    "tracing_stops_in": memdiag.MAX_TRACE_SECONDS,
+                })
+            if action == "stop":
+                memdiag.stop()
+                return web.json_response({"status": "tracing stopped"})
+            limit = min(50, max(1, int(request.query.get("limit", 15))))
+            return web.json_response(await memdiag.report(limit=limit))
+        except Exception as exc:
+            logger.error("admin_memory error: %s", exc)
+            return web.json_response({"error": str(exc)}, status=500)
+
+    async def admin_streams(request: web.Request):
+        if not _admin_authorized(request):
+            return web.json_response({"error": "not found"}, status=404)
+        return web.json_response(stream_registry.snapshot(limit=500))
+
+    async def admin_stream_action(request: web.Request):
+        if not _admin_authorized(request):
+            return web.json_response({"error": "not found"}, status=404)
+        target = request.match_info["target"]
+        action = request.match_info["action"]
+        if request.query.get("scope") == "file":
+            stream = stream_registry.get(target)
+            if stream is not None:
+                target = stream.file_hash
+        if action == "terminate":
+            count = stream_registry.terminate(target)
+        elif action == "throttle":
+            try:
+                rate = max(0, int(request.query.get("rate", "0")))
+            except ValueError:
+                return web.json_response({"error": "rate must be bytes per second"}, status=400)
+            count = stream_registry.throttle(target, rate)
+        else:
+            return web.json_response({"error": f"unknown action: {action}"}, status=400)
+        if not count:
+            return web.json_response({"error": "no matching stream"}, status=404)
+        return web.json_response({"action": action, "target": target, "streams": count})
+
     async def stats_endpoint(request: web.Request):
         if "application/json" in request.headers.get("Accept", ""):
             return await api_stats(request)
@@ -341,13 +532,32 @@ def build_app(bot: Bot, database) -> web.Application:
             return await api_health(request)
         raise web.HTTPFound("/bot_settings")
 
+    async def _start_dashboard(app: web.Application):
+        dashboard.ensure_started()
+
+    async def _stop_dashboard(app: web.Application):
+        await dashboard.stop()
+
+    async def _close_live(app: web.Application):
+        dashboard.close_subscribers()
+
+    app.on_startup.append(_start_dashboard)
+    app.on_shutdown.append(_close_live)
+    app.on_cleanup.append(_stop_dashboard)
+
     app.router.add_get("/",                      home)
     app.router.add_get("/stream/{file_hash}",    stream_page)
     app.router.add_get("/dl/{file_hash}",        download_file)
     app.router.add_get("/bot_settings",          bot_settings_page)
     app.router.add_get("/api/stats",             api_stats)
     app.router.add_get("/api/bandwidth",         api_bandwidth)
+    app.router.add_get("/api/bandwidth/history", api_bandwidth_history)
     app.router.add_get("/api/health",            api_health)
+    app.router.add_get("/api/live",              api_live)
+    app.router.add_get("/metrics",               metrics_endpoint)
+    app.router.add_get("/admin/memory",          admin_memory)
+    app.router.add_get("/admin/streams",         admin_streams)
+    app.router.add_post("/admin/streams/{target}/{action}", admin_stream_action)
     app.router.add_get("/stats",                 stats_endpoint)
     app.router.add_get("/bandwidth",             bandwidth_endpoint)
     app.router.add_get("/health",                health_endpoint)
@@ -0,0 +1,131 @@
+"""Recovery latency of the fetch pipeline under injected Telegram faults.
+
+Wraps the fake media session in ``helper.chaos.ChaosSession`` and streams
+files through ``ByteStreamer.yield_file`` once per fault scenario. For each
+scenario it reports how often a stream was truncated (ended short of the
+file), the stall time per stream (inter-chunk gaps above --stall-ms) and the
+p95 of the longest gap — i.e. how long a viewer's player sat waiting while
+``_fetch_worker`` retried.
+
+    python -m benchmarks.bench_chaos
+    python -m benchmarks.bench_chaos --rate 0.05 --streams 20 --rpc-timeout 2
+    python -m benchmarks.bench_chaos --scenarios timeout mixed --retries 3 --backoff 0.2
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List, Tuple
+
+import helper.stream as stream_mod
+from config import Config
+from helper.chaos import FAULTS, ChaosSession
+from helper.stream import StreamingService
+from benchmarks.fakes import FakeBotClient, FakeDatabase, percentile
+
+MB = 1024 * 1024
+
+SCENARIOS = ("baseline",) + FAULTS + ("mixed",)
+
+
+def _rates(scenario: str, rate: float) -> Dict[str, float]:
+    if scenario == "baseline":
+        return {}
+    if scenario == "mixed":
+        return {name: rate / len(FAULTS) for name in FAULTS}
+    return {scenario: rate}
+
+
+async def _run(args, scenario: str) -> dict:
+    bot = FakeBotClient(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    bot.media_sessions[4] = ChaosSession(
+        bot.session, _rates(scenario, args.rate),
+        floodwait_seconds=args.floodwait_seconds, seed=args.seed,
+    )
+    db   = FakeDatabase()
+    size = int(args.file_mb * MB)
+    for i in range(args.streams):
+        bot.add_file(1000 + i, size)
+        db.add_file(f"chaos{i}", 1000 + i, size)
+
+    service  = StreamingService(bot, db)
+    chunk    = stream_mod.CHUNK_SIZE
+    stall_at = args.stall_ms / 1000
+
+    async def one(i: int) -> Tuple[int, float, float]:
+        file_id = await service.streamer.get_file_properties(str(1000 + i))
+        parts   = -(-size // chunk)
+        last    = time.perf_counter()
+        got     = 0
+        stall   = 0.0
+        worst   = 0.0
+        async for piece in service.streamer.yield_file(file_id, 0, 0, (size - 1) % chunk + 1, parts, chunk):
+            now   = time.perf_counter()
+            gap   = now - last
+            last  = now
+            worst = max(worst, gap)
+            if gap > stall_at:
+                stall += gap
+            got += len(piece)
+        return got, stall, worst
+
+    start   = time.perf_counter()
+    results = await asyncio.gather(*(one(i) for i in range(args.streams)))
+    elapsed = time.perf_counter() - start
+
+    truncated = sum(1 for got, _, _ in results if got < size)
+    return {
+        "scenario":  scenario,
+        "truncated": truncated / args.streams,
+        "stall":     sum(s for _, s, _ in results) / args.streams,
+        "worst_p95": percentile([w for _, _, w in results], 95),
+        "mbps":      sum(g for g, _, _ in results) / MB / elapsed,
+        "injected":  sum(bot.session.injected.values()),
+        "calls":     bot.session.inner.calls + sum(bot.session.injected.values()),
+    }
+
+
+async def _main(args) -> None:
+    logging.basicConfig(level=logging.CRITICAL)
+    Config._data = {"bandwidth_mode": False}
+    stream_mod._RPC_TIMEOUT        = args.rpc_timeout
+    stream_mod._MAX_CHUNK_RETRIES  = args.retries
+    stream_mod._RETRY_BACKOFF      = args.backoff
+
+    print(
+        f"{args.streams} streams × {args.file_mb} MB  fault rate={args.rate:.1%}  "
+        f"retries={args.retries}  backoff={args.backoff}s  rpc timeout={args.rpc_timeout}s"
+    )
+    print(
+        f"{'scenario':<17} {'truncated':>9} {'stall/stream':>13} {'worst gap p95':>14} "
+        f"{'MB/s':>7} {'faults':>11}"
+    )
+    rows: List[dict] = []
+    for scenario in args.scenarios:
+        r = await _run(args, scenario)
+        rows.append(r)
+        print(
+            f"{r['scenario']:<17} {r['truncated']:>8.0%} {r['stall']:>12.2f}s "
+            f"{r['worst_p95'] * 1000:>12.0f}ms {r['mbps']:>7.1f} {r['injected']:>5}/{r['calls']:<5}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--rate",      type=float, default=0.05, help="per-call fault probability")
+    parser.add_argument("--streams",   type=int,   default=10)
+    parser.add_argument("--file-mb",   type=float, default=16)
+    parser.add_argument("--latency",   type=float, default=0.03)
+    parser.add_argument("--jitter",    type=float, default=0.01)
+    parser.add_argument("--stall-ms",  type=float, default=250, help="gap counted as a stall")
+    parser.add_argument("--floodwait-seconds", type=int, default=1)
+    parser.add_argument("--rpc-timeout", type=float, default=2.0, help="overrides _RPC_TIMEOUT")
+    parser.add_argument("--retries",   type=int,   default=stream_mod._MAX_CHUNK_RETRIES)
+    parser.add_argument("--backoff",   type=float, default=stream_mod._RETRY_BACKOFF)
+    parser.add_argument("--seed",      type=int,   default=1)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""File lookup latency: embedded SQLite backend vs. MongoDB through Motor.
+
+Seeds the same N files into a scratch SQLite file and (when reachable) a
+scratch Mongo database, then times the stream path's lookups —
+``get_file_record`` and ``get_file_by_hash`` — one at a time and with C
+concurrent callers, plus a burst of ``add_file`` writes. Reports p50 / p99
+per call and calls per second. The Mongo database is dropped afterwards.
+
+    python -m benchmarks.bench_db
+    python -m benchmarks.bench_db --files 50000 --lookups 20000 --concurrency 64
+    python -m benchmarks.bench_db --mongo mongodb://localhost:27017/
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from database import Database, MongoDatabase, SQLiteDatabase
+from benchmarks.fakes import percentile
+
+_MONGO_DB = "flix_bench_db"
+
+
+def _file(i: int) -> dict:
+    return {
+        "file_id":          f"{i:024x}",
+        "message_id":       str(100_000 + i),
+        "telegram_file_id": "BAACAgUAAxkBAAI" + f"{i:078x}",
+        "user_id":          str(10_000_000 + i % 500),
+        "username":         f"user_{i % 500}",
+        "file_name":        f"bench_{i}.mkv",
+        "file_size":        1_500_000_000 + i,
+        "file_type":        "video",
+        "mime_type":        "video/x-matroska",
+    }
+
+
+async def _timed(calls: List[Callable[[], Awaitable]], concurrency: int) -> tuple:
+    """Run *calls* with at most *concurrency* in flight → (latencies µs, calls/s)."""
+    latencies: List[float] = []
+    pending = iter(calls)
+
+    async def worker():
+        for call in pending:
+            t0 = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - t0) * 1e6)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, len(calls) / (time.perf_counter() - start)
+
+
+async def _bench(name: str, db: Database, args) -> None:
+    await asyncio.gather(*(db.add_file(_file(i)) for i in range(args.files)))
+    hashes = [_file(random.randrange(args.files))["file_id"] for _ in range(args.lookups)]
+
+    for label, method in (("get_file_record", db.get_file_record),
+                          ("get_file_by_hash", db.get_file_by_hash)):
+        for conc in (1, args.concurrency):
+            lat, rate = await _timed([lambda h=h: method(h) for h in hashes], conc)
+            print(
+                f"{name:<8} {label:<17} c={conc:<4} p50 {percentile(lat, 50):>8.0f} µs  "
+                f"p99 {percentile(lat, 99):>8.0f} µs  {rate:>9.0f} /s"
+            )
+
+    base = args.files
+    writes = [lambda i=i: db.add_file(_file(base + i)) for i in range(args.writes)]
+    lat, rate = await _timed(writes, args.concurrency)
+    print(
+        f"{name:<8} {'add_file':<17} c={args.concurrency:<4} p50 {percentile(lat, 50):>8.0f} µs  "
+        f"p99 {percentile(lat, 99):>8.0f} µs  {rate:>9.0f} /s"
+    )
+
+
+async def _mongo(uri: str) -> Optional[MongoDatabase]:
+    db = MongoDatabase(uri, _MONGO_DB)
+    try:
+        await db.client.admin.command("ping")
+    except Exception as exc:
+        print(f"mongo    skipped — {uri} unreachable ({type(exc).__name__})")
+        await db.close()
+        return None
+    await db.client.drop_database(_MONGO_DB)
+    await db.init_db()
+    return db
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files",       type=int, default=10_000)
+    parser.add_argument("--lookups",     type=int, default=5_000)
+    parser.add_argument("--writes",      type=int, default=2_000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mongo",       default=os.environ.get("DB_URI", "mongodb://localhost:27017/"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = SQLiteDatabase(os.path.join(tmp, "bench.db"))
+        await sqlite.init_db()
+        try:
+            await _bench("sqlite", sqlite, args)
+        finally:
+            await sqlite.close()
+
+    if args.mongo.startswith("mongodb"):
+        mongo = await _mongo(args.mongo)
+        if mongo is not None:
+            try:
+                await _bench("mongo", mongo, args)
+            finally:
+                await mongo.client.drop_database(_MONGO_DB)
+                await mongo.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""Per-request cost of session / bandwidth-dedup tracking vs. live key count.
+
+Compares the old approach (plain dict, full scan for stale keys on every
+request) against ``helper.expiring.ExpiringDict``. Each "request" refreshes
+one existing session and inserts one dedup key, exactly what the stream path
+does; the population is held at N live keys.
+
+    python -m benchmarks.bench_expiring
+    python -m benchmarks.bench_expiring --sizes 1000 10000 100000 --ops 20000
+"""
+import argparse
+import random
+import time
+
+from helper.expiring import ExpiringDict
+
+TTL = 30.0
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _bench_scan(size: int, ops: int) -> float:
+    clock    = _Clock()
+    sessions = {f"s{i}": clock.now for i in range(size)}
+    dedup    = {("ip", str(i), 0): clock.now + TTL for i in range(size)}
+    keys     = list(sessions)
+
+    start = time.perf_counter()
+    for i in range(ops):
+        clock.now += TTL / size
+        now = clock.now
+        # _register_session → _prune_stale_sessions
+        stale = [k for k, ts in sessions.items() if now - ts > TTL]
+        for k in stale:
+            del sessions[k]
+        sessions[random.choice(keys)] = now
+        # bandwidth dedup
+        expired = [k for k, exp in dedup.items() if now > exp]
+        for k in expired:
+            del dedup[k]
+        dedup[("ip", str(size + i), 0)] = now + TTL
+    return (time.perf_counter() - start) / ops
+
+
+def _bench_expiring(size: int, ops: int) -> float:
+    clock    = _Clock()
+    sessions = ExpiringDict(TTL, clock=clock)
+    dedup    = ExpiringDict(TTL, clock=clock)
+    for i in range(size):
+        sessions.set(f"s{i}", clock.now)
+        dedup.set(("ip", str(i), 0), True)
+    keys = [f"s{i}" for i in range(size)]
+
+    start = time.perf_counter()
+    for i in range(ops):
+        clock.now += TTL / size
+        key = random.choice(keys)
+        if key in sessions:
+            sessions.touch(key, clock.now)
+        else:
+            sessions.set(key, clock.now)
+        dedup_key = ("ip", str(size + i), 0)
+        if dedup_key not in dedup:
+            dedup.set(dedup_key, True)
+    return (time.perf_counter() - start) / ops
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1_000, 10_000, 50_000])
+    parser.add_argument("--ops",   type=int, default=5_000)
+    args = parser.parse_args()
+
+    print(f"{'live keys':>10}  {'dict scan':>14}  {'ExpiringDict':>14}  {'speed-up':>9}")
+    for size in args.sizes:
+        # The scan variant is O(n) per op — cap its op count so big sizes finish
+        scan_ops = max(50, min(args.ops, 5_000_000 // size))
+        scan     = _bench_scan(size, scan_ops)
+        heap     = _bench_expiring(size, args.ops)
+        print(
+            f"{size:>10}  {scan * 1e6:>11.2f} µs  {heap * 1e6:>11.2f} µs  {scan / heap:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
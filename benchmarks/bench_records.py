@@ -0,0 +1,77 @@
+"""Bytes per cached file: full ``files`` documents vs. projected ``FileRecord``.
+
+Fills a stand-in for ``helper.stream._file_meta_cache`` with N entries the way
+the stream path used to (whole decoded Mongo documents) and the way it does
+now (``FileRecord`` built from a projected query), and reports the traced
+allocation per entry for each.
+
+    python -m benchmarks.bench_records
+    python -m benchmarks.bench_records --files 1000 10000 100000
+"""
+import argparse
+import gc
+import os
+import tracemalloc
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from database.records import FILE_RECORD_PROJECTION, FileRecord
+
+_EPOCH = datetime(2024, 1, 1)
+
+
+def _full_doc(i: int) -> dict:
+    """A ``files`` document shaped like ``Database.add_file`` writes it."""
+    return {
+        "_id":              ObjectId(),
+        "file_id":          os.urandom(12).hex(),
+        "message_id":       str(100_000 + i),
+        # pyrogram file ids are ~70–100 chars of base64
+        "telegram_file_id": "BAACAgUAAxkBAAI" + os.urandom(48).hex()[:78],
+        "user_id":          str(10_000_000 + i % 5_000),
+        "username":         f"user_{i % 5_000}",
+        "file_name":        f"Some.Show.S01E{i % 24:02d}.1080p.WEB-DL.x264-GROUP.mkv",
+        "file_size":        1_500_000_000 + i,
+        "file_type":        "video",
+        "mime_type":        "video/x-matroska",
+        "created_at":       _EPOCH + timedelta(seconds=i),
+        "bandwidth_used":   i * 4096,
+    }
+
+
+def _projected_doc(i: int) -> dict:
+    doc = _full_doc(i)
+    return {k: v for k, v in doc.items() if FILE_RECORD_PROJECTION.get(k)}
+
+
+def _measure(n: int, build) -> float:
+    gc.collect()
+    tracemalloc.start()
+    cache = {}
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(n):
+        entry = build(i)
+        key   = entry.file_id if isinstance(entry, FileRecord) else entry["file_id"]
+        cache[key] = entry
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del cache
+    return used / n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    args = parser.parse_args()
+
+    print(f"{'files':>8}  {'full doc':>12}  {'FileRecord':>12}  {'saved':>7}")
+    for n in args.files:
+        full   = _measure(n, _full_doc)
+        record = _measure(n, lambda i: FileRecord.from_doc(_projected_doc(i)))
+        print(f"{n:>8}  {full:>8.0f} B/f  {record:>8.0f} B/f  {1 - record / full:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Offline streaming throughput benchmark — no Telegram credentials needed.
+
+Streams fake files through ``ByteStreamer.yield_file`` directly and through
+``StreamingService.stream_file`` over aiohttp's test client, against a
+simulated media session (see ``benchmarks.fakes``). For every chunk size ×
+prefetch depth it reports aggregate MB/s, TTFB percentiles and the peak
+Python heap per concurrent stream (tracemalloc, measured in a second pass so
+it does not skew the timings).
+
+    python -m benchmarks.bench_stream
+    python -m benchmarks.bench_stream --streams 8 --file-mb 32 --latency 0.08 --bandwidth-mb 8
+    python -m benchmarks.bench_stream --floodwait-rate 0.02 --timeout-rate 0.01 --rpc-timeout 1
+"""
+import argparse
+import asyncio
+import logging
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+import helper.stream as stream_mod
+from config import Config
+from helper.stream import StreamingService
+from benchmarks.fakes import FakeBotClient, FakeDatabase, file_bytes, percentile
+
+KB = 1024
+MB = 1024 * 1024
+
+
+def _make_env(args, n_files: int) -> Tuple[FakeBotClient, FakeDatabase]:
+    bot = FakeBotClient(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth_mb * MB,
+        floodwait_rate=args.floodwait_rate,
+        floodwait_seconds=args.floodwait_seconds,
+        timeout_rate=args.timeout_rate,
+        seed=args.seed,
+    )
+    db = FakeDatabase()
+    for i in range(n_files):
+        size = int(args.file_mb * MB) + 4321   # deliberately not chunk-aligned
+        bot.add_file(1000 + i, size)
+        db.add_file(f"bench{i}", 1000 + i, size)
+    return bot, db
+
+
+async def _run_yield(args, bot: FakeBotClient, db: FakeDatabase) -> Tuple[int, List[float], int]:
+    service = StreamingService(bot, db)
+    chunk   = stream_mod.CHUNK_SIZE
+
+    async def one(i: int) -> Tuple[int, float]:
+        doc     = db.files[f"bench{i}"]
+        size    = doc["file_size"]
+        file_id = await service.streamer.get_file_properties(doc["message_id"])
+        parts   = -(-size // chunk)
+        start   = time.perf_counter()
+        ttfb    = None
+        total   = 0
+        async for piece in service.streamer.yield_file(file_id, 0, 0, (size - 1) % chunk + 1, parts, chunk):
+            if ttfb is None:
+                ttfb = time.perf_counter() - start
+            total += len(piece)
+        return total, ttfb or 0.0
+
+    results = await asyncio.gather(*(one(i) for i in range(args.streams)))
+    errors  = sum(1 for i, (n, _) in enumerate(results) if n != db.files[f"bench{i}"]["file_size"])
+    return sum(n for n, _ in results), [t for _, t in results], errors
+
+
+async def _run_http(args, bot: FakeBotClient, db: FakeDatabase) -> Tuple[int, List[float], int]:
+    service = StreamingService(bot, db)
+
+    async def handler(request: web.Request):
+        return await service.stream_file(request, request.match_info["file_hash"], is_download=True)
+
+    app = web.Application()
+    app.router.add_get("/dl/{file_hash}", handler)
+
+    async with TestClient(TestServer(app)) as client:
+        async def one(i: int) -> Tuple[int, float, bool]:
+            size  = db.files[f"bench{i}"]["file_size"]
+            start = time.perf_counter()
+            resp  = await client.get(f"/dl/bench{i}")
+            ttfb  = None
+            total = 0
+            head  = b""
+            while True:
+                data = await resp.content.readany()
+                if not data:
+                    break
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if len(head) < 4096:
+                    head += data[:4096 - len(head)]
+                total += len(data)
+            ok = total == size and head == file_bytes(0, len(head), size)
+            return total, ttfb or 0.0, ok
+
+        results = await asyncio.gather(*(one(i) for i in range(args.streams)))
+    return sum(n for n, _, _ in results), [t for _, t, _ in results], sum(1 for *_, ok in results if not ok)
+
+
+async def _measure(args, mode: str, chunk: int, prefetch: int) -> dict:
+    stream_mod.CHUNK_SIZE     = chunk
+    stream_mod.PREFETCH_COUNT = prefetch
+    runner = _run_yield if mode == "yield" else _run_http
+
+    bot, db = _make_env(args, args.streams)
+    start   = time.perf_counter()
+    total, ttfbs, errors = await runner(args, bot, db)
+    elapsed = time.perf_counter() - start
+
+    mem_per_stream = 0.0
+    if not args.no_memory:
+        bot, db = _make_env(args, args.streams)
+        tracemalloc.start()
+        await runner(args, bot, db)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        mem_per_stream = peak / args.streams
+
+    return {
+        "mode":      mode,
+        "chunk":     chunk,
+        "prefetch":  prefetch,
+        "mbps":      total / MB / elapsed,
+        "ttfb_p50":  percentile(ttfbs, 50),
+        "ttfb_p95":  percentile(ttfbs, 95),
+        "ttfb_p99":  percentile(ttfbs, 99),
+        "mem":       mem_per_stream,
+        "errors":    errors,
+        "getfile":   bot.session.calls,
+    }
+
+
+async def _main(args) -> None:
+    logging.basicConfig(level=logging.CRITICAL)
+    Config._data = {"bandwidth_mode": False}
+    stream_mod._RPC_TIMEOUT = args.rpc_timeout
+
+    print(
+        f"{args.streams} streams × {args.file_mb} MB  latency={args.latency * 1000:.0f}±{args.jitter * 1000:.0f} ms  "
+        f"bandwidth={'∞' if not args.bandwidth_mb else f'{args.bandwidth_mb} MB/s'}  "
+        f"floodwait={args.floodwait_rate:.2%}  timeout={args.timeout_rate:.2%}"
+    )
+    print(
+        f"{'mode':<6} {'chunk':>7} {'prefetch':>8} {'MB/s':>8} {'ttfb p50':>9} {'p95':>8} {'p99':>8} "
+        f"{'mem/stream':>11} {'errors':>6}"
+    )
+    for mode in args.modes:
+        for chunk_kb in args.chunk_kb:
+            for prefetch in args.prefetch:
+                r = await _measure(args, mode, chunk_kb * KB, prefetch)
+                print(
+                    f"{r['mode']:<6} {chunk_kb:>5}KB {r['prefetch']:>8} {r['mbps']:>8.1f} "
+                    f"{r['ttfb_p50'] * 1000:>7.0f}ms {r['ttfb_p95'] * 1000:>6.0f}ms {r['ttfb_p99'] * 1000:>6.0f}ms "
+                    f"{r['mem'] / MB:>8.2f} MB {r['errors']:>6}"
+                )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes",     nargs="+", choices=["yield", "http"], default=["yield", "http"])
+    parser.add_argument("--chunk-kb",  type=int, nargs="+", default=[256, 512, 1024])
+    parser.add_argument("--prefetch",  type=int, nargs="+", default=[1, 4, 12])
+    parser.add_argument("--streams",   type=int, default=4)
+    parser.add_argument("--file-mb",   type=float, default=16)
+    parser.add_argument("--latency",   type=float, default=0.05, help="GetFile base latency (s)")
+    parser.add_argument("--jitter",    type=float, default=0.02, help="± uniform jitter (s)")
+    parser.add_argument("--bandwidth-mb",      type=float, default=0, help="per-call transfer rate, 0 = unlimited")
+    parser.add_argument("--floodwait-rate",    type=float, default=0.0)
+    parser.add_argument("--floodwait-seconds", type=int,   default=1)
+    parser.add_argument("--timeout-rate",      type=float, default=0.0)
+    parser.add_argument("--rpc-timeout",       type=float, default=stream_mod._RPC_TIMEOUT)
+    parser.add_argument("--seed",      type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""In-memory stand-ins for Telegram and MongoDB used by the offline benchmarks.
+
+``FakeBotClient`` exposes just what ``ByteStreamer`` / ``StreamingService``
+touch on a pyrogram ``Client``: ``get_messages``, ``media_sessions``,
+``storage`` and ``me``. Its media sessions are ``FakeMediaSession`` objects
+that answer ``upload.GetFile`` with deterministic bytes after a simulated
+network delay, optionally injecting FloodWait or a hung RPC.
+"""
+import asyncio
+import os
+import random
+import time
+from datetime import timezone
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+from pyrogram import raw
+from pyrogram.errors import FloodWait
+from pyrogram.file_id import FileId, FileType
+
+from database import FileRecord
+
+_BLOCK = os.urandom(1024 * 1024)
+
+
+def file_bytes(offset: int, length: int, file_size: int) -> bytes:
+    """The content every fake file has at [offset, offset + length)."""
+    out = bytearray()
+    while length > 0 and offset < file_size:
+        pos = offset % len(_BLOCK)
+        n   = min(length, len(_BLOCK) - pos, file_size - offset)
+        out += _BLOCK[pos:pos + n]
+        offset += n
+        length -= n
+    return bytes(out)
+
+
+class FakeMediaSession:
+    """Simulated media DC session.
+
+    Each GetFile sleeps ``latency`` ± ``jitter`` seconds plus transfer time
+    at ``bandwidth`` bytes/s (0 = unlimited). ``floodwait_rate`` and
+    ``timeout_rate`` are per-call probabilities of raising FloodWait
+    (``floodwait_seconds``) or never answering, so the caller's own
+    ``_RPC_TIMEOUT`` fires.
+    """
+
+    def __init__(
+        self,
+        sizes: Dict[int, int],
+        latency: float = 0.05,
+        jitter: float = 0.02,
+        bandwidth: float = 0,
+        floodwait_rate: float = 0.0,
+        floodwait_seconds: int = 1,
+        timeout_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.sizes             = sizes
+        self.latency           = latency
+        self.jitter            = jitter
+        self.bandwidth         = bandwidth
+        self.floodwait_rate    = floodwait_rate
+        self.floodwait_seconds = floodwait_seconds
+        self.timeout_rate      = timeout_rate
+        self.calls             = 0
+        self._rng              = random.Random(seed)
+
+    async def invoke(self, query, *args, **kwargs):
+        if not isinstance(query, raw.functions.upload.GetFile):
+            raise NotImplementedError(type(query).__name__)
+        self.calls += 1
+
+        roll = self._rng.random()
+        if roll < self.floodwait_rate:
+            raise FloodWait(value=self.floodwait_seconds)
+        if roll < self.floodwait_rate + self.timeout_rate:
+            await asyncio.sleep(3600)
+
+        size  = self.sizes[query.location.id]
+        chunk = file_bytes(query.offset, query.limit, size)
+        delay = self.latency + self.jitter * (2 * self._rng.random() - 1)
+        if self.bandwidth:
+            delay += len(chunk) / self.bandwidth
+        await asyncio.sleep(max(0.0, delay))
+        return raw.types.upload.File(
+            type=raw.types.storage.FilePartial(),
+            mtime=int(time.time()),
+            bytes=chunk,
+        )
+
+    async def stop(self):
+        pass
+
+
+class _FakeStorage:
+    def __init__(self, dc_id: int):
+        self._dc_id = dc_id
+
+    async def dc_id(self) -> int:
+        return self._dc_id
+
+    async def test_mode(self) -> bool:
+        return False
+
+    async def auth_key(self) -> bytes:
+        return b"\0" * 256
+
+
+class FakeBotClient:
+    """Minimal pyrogram ``Client`` replacement backed by fake media sessions."""
+
+    def __init__(self, dc_id: int = 4, **session_kwargs):
+        self.me             = SimpleNamespace(id=1, first_name="Bench", username="BenchBot", dc_id=dc_id)
+        self.storage        = _FakeStorage(dc_id)
+        self.sizes: Dict[int, int] = {}
+        self.media_sessions = {dc_id: FakeMediaSession(self.sizes, **session_kwargs)}
+        self._messages: Dict[int, str] = {}
+        self._dc_id         = dc_id
+
+    @property
+    def session(self) -> FakeMediaSession:
+        return self.media_sessions[self._dc_id]
+
+    def add_file(self, message_id: int, file_size: int) -> None:
+        self.sizes[message_id] = file_size
+        self._messages[message_id] = FileId(
+            file_type=FileType.DOCUMENT,
+            dc_id=self._dc_id,
+            media_id=message_id,
+            access_hash=message_id,
+            file_reference=b"bench",
+        ).encode()
+
+    async def get_messages(self, chat_id, message_ids):
+        file_id = self._messages.get(int(message_ids))
+        if file_id is None:
+            return SimpleNamespace(empty=True)
+        return SimpleNamespace(
+            empty=False,
+            document=SimpleNamespace(file_id=file_id, thumbs=None),
+            video=None, audio=None, photo=None, sticker=None,
+            animation=None, voice=None, video_note=None,
+        )
+
+
+class FakeDatabase:
+    """In-memory subset of ``database.Database`` used by the web app."""
+
+    def __init__(self):
+        self.files: Dict[str, dict] = {}
+        self.total_bandwidth = 0
+        self.today_bandwidth = 0
+        self.hourly: Dict[tuple, list] = {}
+
+    def add_file(self, file_hash: str, message_id: int, file_size: int, file_name: str = None) -> dict:
+        doc = {
+            "file_id":    file_hash,
+            "message_id": str(message_id),
+            "file_name":  file_name or f"bench_{message_id}.mp4",
+            "file_size":  file_size,
+            "file_type":  "video",
+            "mime_type":  "video/mp4",
+            "user_id":    "1",
+        }
+        self.files[file_hash] = doc
+        return doc
+
+    async def get_file_by_hash(self, file_hash: str) -> Optional[dict]:
+        return self.files.get(file_hash)
+
+    async def get_file_record(self, file_hash: str) -> Optional[FileRecord]:
+        return FileRecord.from_doc(self.files.get(file_hash))
+
+    async def get_file(self, message_id: str) -> Optional[dict]:
+        return next((f for f in self.files.values() if f["message_id"] == str(message_id)), None)
+
+    async def track_bandwidth(self, message_id: str, size: int) -> bool:
+        self.total_bandwidth += size
+        self.today_bandwidth += size
+        return True
+
+    async def get_bandwidth_stats(self) -> dict:
+        return {"total_bandwidth": self.total_bandwidth, "today_bandwidth": self.today_bandwidth}
+
+    async def add_bandwidth_buckets(self, buckets: list, files: dict = None) -> bool:
+        for size in (files or {}).values():
+            self.total_bandwidth += size
+            self.today_bandwidth += size
+        for b in buckets:
+            row = self.hourly.setdefault((b["scope"], b["key"], b["hour"]), [0, 0])
+            row[0] += b["bytes"]
+            row[1] += b["requests"]
+        return True
+
+    async def get_bandwidth_history(self, scope, key, since, until, step) -> list:
+        bins: Dict[int, list] = {}
+        for (s, k, hour), (nbytes, reqs) in self.hourly.items():
+            if s == scope and k == key and since <= hour < until:
+                t   = int(hour.replace(tzinfo=timezone.utc).timestamp()) // step * step
+                row = bins.setdefault(t, [0, 0])
+                row[0] += nbytes
+                row[1] += reqs
+        return [{"t": t, "bytes": b, "requests": n} for t, (b, n) in sorted(bins.items())]
+
+    async def get_user_usage(self, day, month) -> dict:
+        usage: Dict[str, list] = {}
+        for (s, k, period), (nbytes, _) in self.hourly.items():
+            if (s, period) == ("user_day", day):
+                usage.setdefault(k, [0, 0])[0] += nbytes
+            elif (s, period) == ("user_month", month):
+                usage.setdefault(k, [0, 0])[1] += nbytes
+        return {k: tuple(v) for k, v in usage.items()}
+
+    async def get_bandwidth_top(self, scope, since, until, limit=10) -> list:
+        totals: Dict[str, list] = {}
+        for (s, k, hour), (nbytes, reqs) in self.hourly.items():
+            if s == scope and since <= hour < until:
+                row = totals.setdefault(k, [0, 0])
+                row[0] += nbytes
+                row[1] += reqs
+        ranked = sorted(totals.items(), key=lambda kv: kv[1][0], reverse=True)[:limit]
+        return [{"key": k, "bytes": b, "requests": n} for k, (b, n) in ranked]
+
+    async def get_stats(self) -> dict:
+        return {"total_users": 1, "total_files": len(self.files), "total_bandwidth": self.total_bandwidth}
+
+    async def close(self):
+        pass
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx     = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
@@ -0,0 +1,300 @@
+"""Concurrent-viewer load test for the full web app (``app.build_app``).
+
+Starts the app in a child process against ``FakeBotClient`` /
+``FakeDatabase`` (see ``benchmarks.fakes``) and ramps virtual viewers
+through the given stages. Each viewer loops over a weighted traffic mix:
+
+  download  sequential full-file GET /dl/<hash>
+  seek      player-style Range GETs at random offsets, read at --bitrate
+  accel     download accelerator: --accel-parts parallel Range GETs on /dl
+  page      HTML player page view (GET /stream/<hash>, Accept: text/html)
+
+Every viewer sends its own X-Forwarded-For so per-IP caps behave as in
+production. Per stage it prints throughput, request/error/shed counts,
+TTFB p95, the server's event-loop lag (from /api/health) and RSS; --csv
+writes the one-second samples behind those numbers.
+
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --stages 25 50 100 200 --stage-seconds 20 --latency 0.08
+    python -m benchmarks.load_test --mix download=1,seek=4,accel=1,page=2 --csv load.csv
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+import psutil
+
+from benchmarks.fakes import percentile
+
+MB = 1024 * 1024
+
+
+# ── Server side (child process) ──────────────────────────────────────────────
+
+def _serve(args) -> None:
+    from aiohttp import web
+
+    from app import build_app
+    from config import Config
+    from benchmarks.fakes import FakeBotClient, FakeDatabase
+
+    logging.basicConfig(level=logging.CRITICAL)
+    Config._data = {"bandwidth_mode": False}
+
+    async def run() -> None:
+        bot = FakeBotClient(latency=args.latency, jitter=args.jitter, bandwidth=args.bandwidth_mb * MB)
+        db  = FakeDatabase()
+        for i in range(args.files):
+            size = int(args.file_mb * MB)
+            bot.add_file(1000 + i, size)
+            db.add_file(f"load{i}", 1000 + i, size)
+
+        runner = web.AppRunner(build_app(bot, db), access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", args.port).start()
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+# ── Client side ──────────────────────────────────────────────────────────────
+
+class _Stats:
+    def __init__(self):
+        self.bytes    = 0
+        self.requests = 0
+        self.errors   = 0
+        self.shed     = 0
+        self.ttfb: List[float] = []
+
+    def reset(self) -> "_Stats":
+        old = _Stats()
+        old.__dict__.update(self.__dict__)
+        self.__init__()
+        return old
+
+
+async def _read_body(resp: aiohttp.ClientResponse, stats: _Stats, started: float,
+                     limit: Optional[int] = None, rate: float = 0) -> None:
+    got = 0
+    first = True
+    while limit is None or got < limit:
+        data = await resp.content.readany()
+        if not data:
+            break
+        if first:
+            stats.ttfb.append(time.perf_counter() - started)
+            first = False
+        got        += len(data)
+        stats.bytes += len(data)
+        if rate:
+            await asyncio.sleep(len(data) / rate)
+
+
+async def _request(session: aiohttp.ClientSession, stats: _Stats, url: str, headers: Dict[str, str],
+                   limit: Optional[int] = None, rate: float = 0) -> None:
+    started = time.perf_counter()
+    stats.requests += 1
+    try:
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 503:
+                stats.shed += 1
+                return
+            if resp.status >= 400:
+                stats.errors += 1
+                return
+            await _read_body(resp, stats, started, limit, rate)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        stats.errors += 1
+
+
+async def _viewer(idx: int, args, base: str, stats: _Stats, stop: asyncio.Event) -> None:
+    rng       = random.Random(idx)
+    ip        = f"10.{idx // 65536 % 256}.{idx // 256 % 256}.{idx % 256}"
+    file_size = int(args.file_mb * MB)
+    scenarios = list(args.mix)
+    weights   = [args.mix[s] for s in scenarios]
+    bitrate   = args.bitrate * MB / 8
+
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=60)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        while not stop.is_set():
+            file_hash = f"load{rng.randrange(args.files)}"
+            headers   = {"X-Forwarded-For": ip}
+            kind      = rng.choices(scenarios, weights)[0]
+
+            if kind == "download":
+                await _request(session, stats, f"{base}/dl/{file_hash}", headers)
+
+            elif kind == "seek":
+                for _ in range(args.seeks):
+                    if stop.is_set():
+                        break
+                    start = rng.randrange(0, max(1, file_size - 1))
+                    await _request(
+                        session, stats, f"{base}/stream/{file_hash}",
+                        {**headers, "Range": f"bytes={start}-"},
+                        limit=int(args.seek_read_mb * MB), rate=bitrate,
+                    )
+
+            elif kind == "accel":
+                part = -(-file_size // args.accel_parts)
+                await asyncio.gather(*(
+                    _request(
+                        session, stats, f"{base}/dl/{file_hash}",
+                        {**headers, "Range": f"bytes={p * part}-{min(file_size, (p + 1) * part) - 1}"},
+                    )
+                    for p in range(args.accel_parts)
+                ))
+
+            else:
+                await _request(
+                    session, stats, f"{base}/stream/{file_hash}",
+                    {**headers, "Accept": "text/html"},
+                )
+                await asyncio.sleep(rng.uniform(0.5, 2.0))
+
+
+async def _server_lag(session: aiohttp.ClientSession, base: str) -> float:
+    try:
+        async with session.get(f"{base}/api/health") as resp:
+            data = await resp.json()
+            return data["admission"]["loop_lag_ms"]
+    except Exception:
+        return float("nan")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _drive(args, port: int, proc: psutil.Process) -> None:
+    base  = f"http://127.0.0.1:{port}"
+    stats = _Stats()
+    stop  = asyncio.Event()
+    tasks: List[asyncio.Task] = []
+    rows: List[dict] = []
+    t0    = time.perf_counter()
+
+    async with aiohttp.ClientSession() as probe:
+        for _ in range(100):
+            try:
+                async with probe.get(f"{base}/api/health"):
+                    break
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.1)
+        else:
+            raise RuntimeError("server did not come up")
+
+        print(
+            f"{'viewers':>7} {'MB/s':>8} {'req/s':>7} {'errors':>7} {'shed':>6} "
+            f"{'ttfb p95':>9} {'lag p95':>8} {'rss':>8}"
+        )
+        for users in args.stages:
+            while len(tasks) < users:
+                tasks.append(asyncio.ensure_future(_viewer(len(tasks), args, base, stats, stop)))
+
+            stage: List[dict] = []
+            for _ in range(int(args.stage_seconds)):
+                await asyncio.sleep(1)
+                snap = stats.reset()
+                row  = {
+                    "t":        round(time.perf_counter() - t0, 1),
+                    "viewers":  users,
+                    "mbps":     snap.bytes / MB,
+                    "requests": snap.requests,
+                    "errors":   snap.errors,
+                    "shed":     snap.shed,
+                    "ttfb_p95": percentile(snap.ttfb, 95),
+                    "lag_ms":   await _server_lag(probe, base),
+                    "rss_mb":   proc.memory_info().rss / MB,
+                }
+                stage.append(row)
+                rows.append(row)
+
+            n = len(stage)
+            print(
+                f"{users:>7} {sum(r['mbps'] for r in stage) / n:>8.1f} "
+                f"{sum(r['requests'] for r in stage) / n:>7.1f} "
+                f"{sum(r['errors'] for r in stage):>7} {sum(r['shed'] for r in stage):>6} "
+                f"{max(r['ttfb_p95'] for r in stage) * 1000:>7.0f}ms "
+                f"{percentile([r['lag_ms'] for r in stage], 95):>6.1f}ms "
+                f"{max(r['rss_mb'] for r in stage):>6.0f}MB"
+            )
+
+    stop.set()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"samples written to {args.csv}")
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ("download", "seek", "accel", "page"):
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages",        type=int, nargs="+", default=[10, 25, 50, 100])
+    parser.add_argument("--stage-seconds", type=float, default=10)
+    parser.add_argument("--mix",           type=_parse_mix, default=_parse_mix("download=1,seek=4,accel=1,page=2"))
+    parser.add_argument("--files",         type=int, default=20)
+    parser.add_argument("--file-mb",       type=float, default=64)
+    parser.add_argument("--bitrate",       type=float, default=8, help="player read rate, Mbit/s")
+    parser.add_argument("--seeks",         type=int, default=4, help="Range requests per seek session")
+    parser.add_argument("--seek-read-mb",  type=float, default=4, help="bytes read after each seek")
+    parser.add_argument("--accel-parts",   type=int, default=8)
+    parser.add_argument("--latency",       type=float, default=0.05)
+    parser.add_argument("--jitter",        type=float, default=0.02)
+    parser.add_argument("--bandwidth-mb",  type=float, default=0)
+    parser.add_argument("--csv")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port",  type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args)
+        return
+
+    port  = _free_port()
+    child = subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.load_test", "--serve", "--port", str(port),
+            "--files", str(args.files), "--file-mb", str(args.file_mb),
+            "--latency", str(args.latency), "--jitter", str(args.jitter),
+            "--bandwidth-mb", str(args.bandwidth_mb),
+        ],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    try:
+        asyncio.run(_drive(args, port, psutil.Process(child.pid)))
+    finally:
+        child.terminate()
+        child.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -66,6 +66,9 @@ class Bot(Client):
             BotCommand("revoke",       "🗑️ ʀᴇᴠᴏᴋᴇ ꜰɪʟᴇ ʙʏ ʜᴀꜱʜ"),
             BotCommand("revokeall",    "🗑️ ʙᴜʟᴋ ʀᴇᴠᴏᴋᴇ [ᴀʟʟ | ᴜꜱᴇʀ_ɪᴅ]"),
             BotCommand("logs",         "📄 ɢᴇᴛ ʙᴏᴛ ʟᴏɢꜱ"),
+            BotCommand("profile",      "🔥 ꜱᴀᴍᴘʟɪɴɢ ᴄᴘᴜ ᴘʀᴏꜰɪʟᴇ [ꜱᴇᴄᴏɴᴅꜱ]"),
+            BotCommand("memory",       "🧠 ᴍᴇᴍᴏʀʏ ʀᴇᴘᴏʀᴛ [ꜱᴛᴀʀᴛ | ʙᴀꜱᴇʟɪɴᴇ | ꜱᴛᴏᴘ]"),
+            BotCommand("streams",      "📡 ʟɪᴠᴇ ꜱᴛʀᴇᴀᴍꜱ [ᴋɪʟʟ | ᴛʜʀᴏᴛᴛʟᴇ]"),
         ]
         try:
             await self.set_bot_commands(user_commands)
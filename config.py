@@ -40,13 +40,65 @@ class Config:
 
     SECRET_KEY = os.environ.get("SECRET_KEY", "change-this-secret-key")
 
+    # Bearer token for /admin/* diagnostics endpoints — empty disables them
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
     BIND_ADDRESS = os.environ.get("BIND_ADDRESS", "0.0.0.0")
     PORT         = int(os.environ.get("PORT", 8080))
     URL          = os.environ.get("URL", os.environ.get("BASE_URL", ""))
 
+    MAX_ACTIVE_STREAMS = int(os.environ.get("MAX_ACTIVE_STREAMS", 200))
+    MAX_BUFFERED_MB    = int(os.environ.get("MAX_BUFFERED_MB", 1024))
+    MAX_LOOP_LAG_MS    = int(os.environ.get("MAX_LOOP_LAG_MS", 250))
+    DC_ERROR_THRESHOLD = float(os.environ.get("DC_ERROR_THRESHOLD", 0.5))
+    DL_QUEUE_SIZE      = int(os.environ.get("DL_QUEUE_SIZE", 50))
+    DL_QUEUE_TIMEOUT   = float(os.environ.get("DL_QUEUE_TIMEOUT", 30))
+
+    DASHBOARD_INTERVAL    = float(os.environ.get("DASHBOARD_INTERVAL", 1))
+    DASHBOARD_DB_INTERVAL = float(os.environ.get("DASHBOARD_DB_INTERVAL", 30))
+    LIVE_MAX_CLIENTS      = int(os.environ.get("LIVE_MAX_CLIENTS", 100))
+
+    SLOW_CALLBACK_MS        = int(os.environ.get("SLOW_CALLBACK_MS", 100))
+    LOOP_LAG_ALERT_MS       = int(os.environ.get("LOOP_LAG_ALERT_MS", 200))
+    LOOP_LAG_ALERT_WINDOW   = float(os.environ.get("LOOP_LAG_ALERT_WINDOW", 30))
+    LOOP_LAG_ALERT_COOLDOWN = float(os.environ.get("LOOP_LAG_ALERT_COOLDOWN", 900))
+
+    STREAM_KILL_COOLDOWN = float(os.environ.get("STREAM_KILL_COOLDOWN", 300))
+
+    BANDWIDTH_FLUSH_INTERVAL = float(os.environ.get("BANDWIDTH_FLUSH_INTERVAL", 10))
+    HISTORY_MAX_POINTS       = int(os.environ.get("HISTORY_MAX_POINTS", 240))
+    QUOTA_SYNC_INTERVAL      = float(os.environ.get("QUOTA_SYNC_INTERVAL", 60))
+    BW_DEDUP_TTL             = float(os.environ.get("BW_DEDUP_TTL", 60))
+
+    REVOCATION_POLL_INTERVAL = float(os.environ.get("REVOCATION_POLL_INTERVAL", 5))
+    REVOCATION_DENY_TTL      = float(os.environ.get("REVOCATION_DENY_TTL", 3600))
+
+    MAX_CONNS_PER_IP   = int(os.environ.get("MAX_CONNS_PER_IP", 8))
+    MAX_CONNS_PER_FILE = int(os.environ.get("MAX_CONNS_PER_FILE", 4))
+    CONN_QUEUE_SIZE    = int(os.environ.get("CONN_QUEUE_SIZE", 32))
+    CONN_QUEUE_TIMEOUT = float(os.environ.get("CONN_QUEUE_TIMEOUT", 15))
+
+    LOG_FILE          = os.environ.get("LOG_FILE", "bot.log")
+    LOG_MAX_MB        = int(os.environ.get("LOG_MAX_MB", 20))
+    LOG_ROTATE_WHEN   = os.environ.get("LOG_ROTATE_WHEN", "midnight")
+    LOG_BACKUPS       = int(os.environ.get("LOG_BACKUPS", 5))
+    LOG_QUEUE_SIZE    = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    LOG_DEBUG_RATE    = float(os.environ.get("LOG_DEBUG_RATE", 20))
+    LOG_DEBUG_BURST   = float(os.environ.get("LOG_DEBUG_BURST", 100))
+    LOG_DEBUG_SAMPLE  = int(os.environ.get("LOG_DEBUG_SAMPLE", 100))
+
+    TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", 0.01))
+    TRACE_FILE        = os.environ.get("TRACE_FILE", "traces.jsonl")
+    TRACE_MAX_MB      = int(os.environ.get("TRACE_MAX_MB", 50))
+
+    # Staging only: inject media session faults (see helper/chaos.py)
+    CHAOS_MODE              = os.environ.get("CHAOS_MODE", "False").lower() == "true"
+    CHAOS_RATES             = os.environ.get("CHAOS_RATES", "")
+    CHAOS_FLOODWAIT_SECONDS = int(os.environ.get("CHAOS_FLOODWAIT_SECONDS", 1))
+
     @classmethod
     async def load(cls, db):
-        doc = await db.config.find_one({"key": "Settings"})
+        doc = await db.get_settings()
         if not doc:
             logger.warning("⚠️ ᴄᴏɴꜰɪɢ ɴᴏᴛ ꜰᴏᴜɴᴅ ɪɴ ᴅʙ — ᴀᴘᴘʟˏɪɴɢ ꜰʀᴇꜱʜ ᴄᴏɴꜰɪɢ ᴠᴀʟᴜᴇꜱ")
             doc = {
@@ -58,8 +110,14 @@ class Config:
                 "max_bandwidth":  int(os.environ.get("MAX_BANDWIDTH", 107374182400)),
                 "public_bot":     os.environ.get("PUBLIC_BOT", "False").lower() == "true",
                 "max_file_size":  int(os.environ.get("MAX_FILE_SIZE", 4294967296)),
+                "egress_limit":        int(os.environ.get("EGRESS_LIMIT", 0)),
+                "ip_egress_limit":     int(os.environ.get("IP_EGRESS_LIMIT", 0)),
+                "stream_egress_limit": int(os.environ.get("STREAM_EGRESS_LIMIT", 0)),
+                "stream_floor":        int(os.environ.get("STREAM_FLOOR", 524288)),
+                "user_daily_quota":    int(os.environ.get("USER_DAILY_QUOTA", 0)),
+                "user_monthly_quota":  int(os.environ.get("USER_MONTHLY_QUOTA", 0)),
             }
-            await db.config.insert_one(doc)
+            await db.save_settings(doc)
             logger.info("✅ ᴄᴏɴꜰɪɢ ᴄʀᴇᴀᴛᴇᴅ & ꜰᴜʟʟˏ ᴛᴜɴᴇᴅ ɪɴ ᴅʙ")
         else:
             defaults = {
@@ -67,13 +125,16 @@ class Config:
                 "fsub_mode":      doc.get("fsub_mode", False),
                 "fsub_chat_id":   doc.get("fsub_chat_id", 0),
                 "fsub_inv_link":  doc.get("fsub_inv_link", ""),
+                "egress_limit":        int(os.environ.get("EGRESS_LIMIT", 0)),
+                "ip_egress_limit":     int(os.environ.get("IP_EGRESS_LIMIT", 0)),
+                "stream_egress_limit": int(os.environ.get("STREAM_EGRESS_LIMIT", 0)),
+                "stream_floor":        int(os.environ.get("STREAM_FLOOR", 524288)),
+                "user_daily_quota":    int(os.environ.get("USER_DAILY_QUOTA", 0)),
+                "user_monthly_quota":  int(os.environ.get("USER_MONTHLY_QUOTA", 0)),
             }
             missing = {k: v for k, v in defaults.items() if k not in doc}
             if missing:
-                await db.config.update_one(
-                    {"key": "Settings"},
-                    {"$set": missing},
-                )
+                await db.save_settings(missing)
                 doc.update(missing)
                 logger.info("🔄 ᴄᴏɴꜰɪɢ ᴍɪɢʀᴀᴛᴇᴅ — ꜰɪᴇʟᴅꜱ ᴀᴅᴅᴇᴅ: %s", list(missing.keys()))
             logger.info("📥 ᴄᴏɴꜰɪɢ ꜰᴏᴜɴᴅ & ᴇɴʜᴀɴᴄᴇᴅ ꜰᴏʀ ᴜꜱᴇ")
@@ -83,11 +144,7 @@ class Config:
     @classmethod
     async def update(cls, db, updates: dict):
         cls._data.update(updates)
-        await db.config.update_one(
-            {"key": "Settings"},
-            {"$set": updates},
-            upsert=True,
-        )
+        await db.save_settings(updates)
 
     @classmethod
     def get(cls, key, default=None):
@@ -112,4 +169,8 @@ class Config:
             raise ValueError(f"missing required configuration: {', '.join(missing)}")
         if not Config.URL:
             logger.warning("⚠️ ᴜʀʟ ɴᴏᴛ ꜱᴇᴛ — ᴅᴏᴡɴʟᴏᴀᴅ ʟɪɴᴋꜱ ᴡɪʟʟ ᴜꜱᴇ ʟᴏᴄᴀʟʜᴏꜱᴛ")
+        if Config.CHAOS_MODE:
+            from helper.chaos import parse_rates
+            parse_rates(Config.CHAOS_RATES)
+            logger.warning("⚠️ ᴄʜᴀᴏꜱ ᴍᴏᴅᴇ ᴇɴᴀʙʟᴇᴅ — ɴᴏᴛ ꜰᴏʀ ᴘʀᴏᴅᴜᴄᴛɪᴏɴ")
         return True
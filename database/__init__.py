@@ -1,4 +1,14 @@
-from .mongodb import Database
+from .base import Database
+from .mongodb import MongoDatabase
+from .records import FileRecord
+from .sqlite import SQLiteDatabase
+
+
+def open_database(uri: str, database_name: str) -> Database:
+    """Storage backend for *uri*: ``sqlite:///…`` opens the embedded SQLite file, anything else is MongoDB."""
+    if uri.startswith("sqlite:"):
+        return SQLiteDatabase.from_uri(uri, database_name)
+    return MongoDatabase(uri, database_name)
 
 
 class _DbHolder:
@@ -21,4 +31,7 @@ class _DbHolder:
 db_instance = _DbHolder()
 db = db_instance
 
-__all__ = ["Database", "db_instance", "db"]
+__all__ = [
+    "Database", "MongoDatabase", "SQLiteDatabase", "FileRecord", "open_database",
+    "db_instance", "db",
+]
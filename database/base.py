@@ -0,0 +1,199 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .records import FileRecord
+
+# Revocation tombstones only need to outlive every node's caches
+REVOCATION_TTL = 24 * 3600
+# Hourly bandwidth rollups kept for charts / "what drove the peak"
+BANDWIDTH_HISTORY_TTL = 90 * 24 * 3600
+
+
+class Database(ABC):
+    """Storage interface the bot, web app and background tasks are written against.
+
+    Backends keep an in-memory mirror of the dashboard counters (file / user
+    totals, all-time and today's bandwidth) that their write paths adjust,
+    so ``get_stats`` / ``get_bandwidth_stats`` never hit storage on the
+    stream path. Every method logs and returns an empty / falsy result on
+    storage errors rather than raising.
+    """
+
+    def __init__(self):
+        self._file_count = 0
+        self._user_count = 0
+        self._bw_total   = 0
+        self._bw_day     = ""
+        self._bw_today   = 0
+
+    # ── counter mirror ──────────────────────────────────────────────────────
+
+    def _roll_bandwidth_day(self, today: str) -> None:
+        if self._bw_day != today:
+            self._bw_day   = today
+            self._bw_today = 0
+
+    def _count_bandwidth(self, day: str, size: int) -> None:
+        self._roll_bandwidth_day(datetime.utcnow().date().isoformat())
+        if day == self._bw_day:
+            self._bw_today += size
+        self._bw_total += size
+
+    @staticmethod
+    def _daily_bandwidth(buckets: List[Dict]) -> Dict[str, int]:
+        """Bytes per UTC day (``YYYY-MM-DD``) in the node-wide ``total`` buckets."""
+        days: Dict[str, int] = {}
+        for b in buckets:
+            if b["scope"] == "total":
+                day = b["hour"].date().isoformat()
+                days[day] = days.get(day, 0) + b["bytes"]
+        return days
+
+    async def get_bandwidth_stats(self) -> Dict:
+        self._roll_bandwidth_day(datetime.utcnow().date().isoformat())
+        return {
+            "total_bandwidth": self._bw_total,
+            "today_bandwidth": self._bw_today,
+        }
+
+    async def get_stats(self) -> Dict:
+        bw = await self.get_bandwidth_stats()
+        return {
+            "total_files":     self._file_count,
+            "total_users":     self._user_count,
+            "total_bandwidth": bw["total_bandwidth"],
+            "today_bandwidth": bw["today_bandwidth"],
+        }
+
+    async def get_user_count(self) -> int:
+        return self._user_count
+
+    # ── lifecycle / settings ────────────────────────────────────────────────
+
+    @abstractmethod
+    async def init_db(self) -> bool:
+        """Create tables / indexes and seed the counter mirror."""
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    async def get_settings(self) -> Optional[Dict]:
+        """The live ``Config`` settings document, or None on first boot."""
+
+    @abstractmethod
+    async def save_settings(self, values: Dict) -> bool:
+        """Merge *values* into the settings document, creating it if needed."""
+
+    # ── files ───────────────────────────────────────────────────────────────
+
+    @abstractmethod
+    async def add_file(self, file_data: Dict) -> bool: ...
+
+    @abstractmethod
+    async def get_file(self, message_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def get_file_by_hash(self, file_hash: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def get_file_by_oid(self, oid: str) -> Optional[Dict]:
+        """Look a file up by the hex ``_id`` carried in ``/files`` callbacks."""
+
+    @abstractmethod
+    async def get_file_record(self, file_hash: str) -> Optional[FileRecord]:
+        """Projected lookup for the stream / player paths — see :class:`FileRecord`."""
+
+    @abstractmethod
+    async def delete_file(self, message_id: str) -> bool: ...
+
+    @abstractmethod
+    async def delete_all_files(self) -> int: ...
+
+    @abstractmethod
+    async def delete_user_files(self, user_id: str) -> int: ...
+
+    @abstractmethod
+    async def get_user_files(self, user_id: str, limit: int = 50) -> List[Dict]: ...
+
+    @abstractmethod
+    async def find_files(self, user_id, limit: int,
+                         cursor: Optional[Tuple[datetime, object]] = None,
+                         backward: bool = False) -> List[Dict]:
+        """One page of *user_id*'s files, newest first, by keyset on ``(created_at, _id)``."""
+
+    @abstractmethod
+    async def count_user_files(self, user_id) -> int: ...
+
+    @abstractmethod
+    async def get_file_refs(self, user_id: Optional[str] = None) -> List[Dict]:
+        """``file_id`` / ``message_id`` of a user's files (all files if None)."""
+
+    # ── revocations ─────────────────────────────────────────────────────────
+
+    @abstractmethod
+    async def add_revocation(self, node: str, file_hashes: List[str],
+                             message_ids: List[str], everything: bool = False) -> bool: ...
+
+    @abstractmethod
+    async def get_revocations(self, since: datetime) -> List[Dict]: ...
+
+    # ── bandwidth ───────────────────────────────────────────────────────────
+
+    @abstractmethod
+    async def update_bandwidth(self, size: int) -> bool: ...
+
+    @abstractmethod
+    async def track_bandwidth(self, message_id: str, size: int) -> bool: ...
+
+    @abstractmethod
+    async def get_total_bandwidth(self) -> int: ...
+
+    @abstractmethod
+    async def reset_bandwidth(self) -> bool: ...
+
+    @abstractmethod
+    async def add_bandwidth_buckets(self, buckets: List[Dict],
+                                    files: Optional[Dict[str, int]] = None) -> bool:
+        """Add ``{scope, key, hour, bytes, requests}`` deltas to the hourly rollups.
+
+        The same batch adds *files* (``{message_id: bytes}``) to each file's
+        ``bandwidth_used`` and the ``total`` buckets to the daily / all-time
+        counters, so served bytes cost one write per flush.
+        """
+
+    @abstractmethod
+    async def get_bandwidth_history(self, scope: str, key: str, since: datetime,
+                                    until: datetime, step: int) -> List[Dict]:
+        """Hourly buckets for (*scope*, *key*) summed into *step*-second bins."""
+
+    @abstractmethod
+    async def get_bandwidth_top(self, scope: str, since: datetime, until: datetime,
+                                limit: int = 10) -> List[Dict]:
+        """Heaviest files / users by bytes served between *since* and *until*."""
+
+    @abstractmethod
+    async def get_user_usage(self, day: datetime, month: datetime) -> Optional[Dict[str, tuple]]:
+        """``{user_id: (bytes today, bytes this month)}`` from the per-user period rollups."""
+
+    # ── users / sudo ────────────────────────────────────────────────────────
+
+    @abstractmethod
+    async def register_user_on_start(self, user_data: Dict) -> bool:
+        """Record a /start; True only the first time the user is seen."""
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def add_sudo_user(self, user_id: str, added_by: str) -> bool: ...
+
+    @abstractmethod
+    async def remove_sudo_user(self, user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def is_sudo_user(self, user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def get_sudo_users(self) -> List[Dict]: ...
@@ -1,13 +1,28 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from bson import ObjectId
+from pymongo import UpdateOne
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+import asyncio
 import logging
+import time
+
+from .base import BANDWIDTH_HISTORY_TTL, REVOCATION_TTL, Database
+from .records import FILE_RECORD_PROJECTION, FileRecord
 
 logger = logging.getLogger(__name__)
 
+# Materialized file / user / bandwidth counters are re-based on Mongo this
+# often, picking up other nodes' writes and any drift
+_COUNTERS_RECONCILE = 60
+# Per-user file totals for /files page counts; adjusted on insert / delete
+_USER_TOTALS_TTL = 300
+_USER_TOTALS_MAX = 10_000
+
 
-class Database:
+class MongoDatabase(Database):
     def __init__(self, mongo_uri: str, database_name: str):
+        super().__init__()
         self.client = AsyncIOMotorClient(
             mongo_uri,
             maxPoolSize=50,
@@ -22,6 +37,13 @@ class Database:
         self.bandwidth  = self.db.bandwidth
         self.sudo_users = self.db.sudo_users
         self.config     = self.db.config
+        self.revocations = self.db.revocations
+        self.bandwidth_hourly = self.db.bandwidth_hourly
+
+        # The counter mirror is re-based on Mongo — see reconcile_counters()
+        self._reconciled = 0.0
+        self._reconcile_lock = asyncio.Lock()
+        self._user_totals: Dict[str, Tuple[float, int]] = {}
 
     async def init_db(self):
         try:
@@ -38,6 +60,8 @@ class Database:
                 await self.files.create_index('user_id')
             if 'created_at' not in files_idx:
                 await self.files.create_index('created_at')
+            if 'user_id_1_created_at_-1__id_-1' not in await self.files.index_information():
+                await self.files.create_index([('user_id', 1), ('created_at', -1), ('_id', -1)])
 
             users_idx = await _existing(self.users)
             if 'user_id'       not in users_idx:
@@ -53,6 +77,21 @@ class Database:
             if 'user_id' not in sudo_idx:
                 await self.sudo_users.create_index('user_id', unique=True)
 
+            rev_idx = await _existing(self.revocations)
+            if 'revoked_at' not in rev_idx:
+                await self.revocations.create_index('revoked_at', expireAfterSeconds=REVOCATION_TTL)
+
+            hourly_idx = await _existing(self.bandwidth_hourly)
+            if 'scope' not in hourly_idx:
+                await self.bandwidth_hourly.create_index(
+                    [('scope', 1), ('key', 1), ('hour', 1)], unique=True,
+                )
+            if 'hour' not in hourly_idx:
+                await self.bandwidth_hourly.create_index('hour', expireAfterSeconds=BANDWIDTH_HISTORY_TTL)
+            if 'scope_1_hour_1' not in await self.bandwidth_hourly.index_information():
+                await self.bandwidth_hourly.create_index([('scope', 1), ('hour', 1)])
+
+            await self.reconcile_counters()
             logger.info("✅ ᴅʙ ɪɴᴅᴇxᴇꜱ ʀᴇᴀᴅˏ ᴀʟʟ ɪɴꜱᴛᴀɴᴛ — ꜱᴄɪᴘᴘᴇᴅ ɴᴇᴡ ᴄʀᴇᴀᴛɪᴏɴ ᴏɴʟˏ")
             return True
         except Exception as e:
@@ -75,6 +114,8 @@ class Database:
                 "bandwidth_used":   0,
             }
             await self.files.insert_one(doc)
+            self._file_count += 1
+            self._adjust_user_total(str(doc["user_id"]), 1)
             return True
         except Exception as e:
             logger.error("add file error: %s", e)
@@ -94,10 +135,34 @@ class Database:
             logger.error("get file by hash error: %s", e)
             return None
 
+    async def get_file_by_oid(self, oid: str) -> Optional[Dict]:
+        if not ObjectId.is_valid(oid):
+            return None
+        try:
+            return await self.files.find_one({"_id": ObjectId(oid)})
+        except Exception as e:
+            logger.error("get file by oid error: %s", e)
+            return None
+
+    async def get_file_record(self, file_hash: str) -> Optional[FileRecord]:
+        try:
+            return FileRecord.from_doc(
+                await self.files.find_one({"file_id": file_hash}, FILE_RECORD_PROJECTION)
+            )
+        except Exception as e:
+            logger.error("get file record error: %s", e)
+            return None
+
     async def delete_file(self, message_id: str) -> bool:
         try:
-            result = await self.files.delete_one({"message_id": message_id})
-            return result.deleted_count > 0
+            deleted = await self.files.find_one_and_delete(
+                {"message_id": message_id}, projection={"user_id": 1},
+            )
+            if deleted is None:
+                return False
+            self._file_count = max(0, self._file_count - 1)
+            self._adjust_user_total(str(deleted.get("user_id")), -1)
+            return True
         except Exception as e:
             logger.error("delete file error: %s", e)
             return False
@@ -105,6 +170,8 @@ class Database:
     async def delete_all_files(self) -> int:
         try:
             result = await self.files.delete_many({})
+            self._file_count = max(0, self._file_count - result.deleted_count)
+            self._user_totals.clear()
             return result.deleted_count
         except Exception as e:
             logger.error("delete all files error: %s", e)
@@ -121,25 +188,94 @@ class Database:
             logger.error("get user files error: %s", e)
             return []
 
-    async def find_files(self, user_id, page_range: list) -> tuple:
+    async def find_files(self, user_id, limit: int,
+                         cursor: Optional[Tuple[datetime, object]] = None,
+                         backward: bool = False) -> List[Dict]:
+        """One page of *user_id*'s files, newest first, by keyset on ``(created_at, _id)``.
+
+        *cursor* is the ``(created_at, _id)`` of the file bordering the page:
+        the page holds the files just older than it, or just newer with
+        *backward*. Either way it is a single range scan of the
+        ``(user_id, created_at, _id)`` index, however deep the page.
+        """
         try:
-            skip  = page_range[0] - 1 if page_range[0] > 0 else 0
-            limit = page_range[1]
-            total = await self.files.count_documents({"user_id": str(user_id)})
-            cursor = (
-                self.files.find({"user_id": str(user_id)})
-                .sort("created_at", -1)
-                .skip(skip)
-                .limit(limit)
-            )
-            return cursor, total
+            query: Dict = {"user_id": str(user_id)}
+            if cursor is not None:
+                created_at, oid = cursor
+                op = "$gt" if backward else "$lt"
+                query["$or"] = [
+                    {"created_at": {op: created_at}},
+                    {"created_at": created_at, "_id": {op: oid}},
+                ]
+            order = 1 if backward else -1
+            found = self.files.find(query).sort([("created_at", order), ("_id", order)]).limit(limit)
+            files = await found.to_list(length=limit)
+            if backward:
+                files.reverse()
+            return files
         except Exception as e:
             logger.error("find_files error: %s", e)
-            return self.files.find({"user_id": str(user_id)}).limit(0), 0
+            return []
+
+    def _adjust_user_total(self, user_id: str, delta: int) -> None:
+        cached = self._user_totals.get(user_id)
+        if cached is not None:
+            self._user_totals[user_id] = (cached[0], max(0, cached[1] + delta))
+
+    async def count_user_files(self, user_id) -> int:
+        """*user_id*'s file count, cached for ``_USER_TOTALS_TTL`` seconds."""
+        user_id = str(user_id)
+        cached  = self._user_totals.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < _USER_TOTALS_TTL:
+            return cached[1]
+        try:
+            total = await self.files.count_documents({"user_id": user_id})
+        except Exception as e:
+            logger.error("count user files error: %s", e)
+            return cached[1] if cached is not None else 0
+        if len(self._user_totals) >= _USER_TOTALS_MAX:
+            self._user_totals.clear()
+        self._user_totals[user_id] = (time.monotonic(), total)
+        return total
+
+    async def get_file_refs(self, user_id: Optional[str] = None) -> List[Dict]:
+        """``file_id`` / ``message_id`` of a user's files (all files if None)."""
+        try:
+            query  = {} if user_id is None else {"user_id": str(user_id)}
+            cursor = self.files.find(query, {"_id": 0, "file_id": 1, "message_id": 1})
+            return await cursor.to_list(length=None)
+        except Exception as e:
+            logger.error("get file refs error: %s", e)
+            return []
+
+    async def add_revocation(self, node: str, file_hashes: List[str],
+                             message_ids: List[str], everything: bool = False) -> bool:
+        try:
+            await self.revocations.insert_one({
+                "node":        node,
+                "file_hashes": file_hashes,
+                "message_ids": message_ids,
+                "everything":  everything,
+                "revoked_at":  datetime.utcnow(),
+            })
+            return True
+        except Exception as e:
+            logger.error("add revocation error: %s", e)
+            return False
+
+    async def get_revocations(self, since: datetime) -> List[Dict]:
+        try:
+            cursor = self.revocations.find({"revoked_at": {"$gte": since}}).sort("revoked_at", 1)
+            return await cursor.to_list(length=None)
+        except Exception as e:
+            logger.error("get revocations error: %s", e)
+            return []
 
     async def delete_user_files(self, user_id: str) -> int:
         try:
             result = await self.files.delete_many({"user_id": str(user_id)})
+            self._file_count = max(0, self._file_count - result.deleted_count)
+            self._user_totals.pop(str(user_id), None)
             return result.deleted_count
         except Exception as e:
             logger.error("delete user files error: %s", e)
@@ -156,6 +292,7 @@ class Database:
                 },
                 upsert=True,
             )
+            self._count_bandwidth(today, size)
             return True
         except Exception as e:
             logger.error("update bandwidth error: %s", e)
@@ -173,10 +310,123 @@ class Database:
             logger.error("track bandwidth error: %s", e)
             return False
 
+    async def add_bandwidth_buckets(self, buckets: List[Dict],
+                                    files: Optional[Dict[str, int]] = None) -> bool:
+        if not buckets and not files:
+            return True
+        try:
+            days = self._daily_bandwidth(buckets)
+            if buckets:
+                await self.bandwidth_hourly.bulk_write([
+                    UpdateOne(
+                        {"scope": b["scope"], "key": b["key"], "hour": b["hour"]},
+                        {"$inc": {"bytes": b["bytes"], "requests": b["requests"]}},
+                        upsert=True,
+                    )
+                    for b in buckets
+                ], ordered=False)
+            if files:
+                await self.files.bulk_write([
+                    UpdateOne({"message_id": mid}, {"$inc": {"bandwidth_used": size}})
+                    for mid, size in files.items()
+                ], ordered=False)
+            if days:
+                now = datetime.utcnow()
+                await self.bandwidth.bulk_write([
+                    UpdateOne(
+                        {"date": day},
+                        {"$inc": {"total_bytes": size}, "$set": {"last_updated": now}},
+                        upsert=True,
+                    )
+                    for day, size in days.items()
+                ], ordered=False)
+            for day, size in days.items():
+                self._count_bandwidth(day, size)
+            return True
+        except Exception as e:
+            logger.error("add bandwidth buckets error: %s", e)
+            return False
+
+    async def get_bandwidth_history(self, scope: str, key: str, since: datetime,
+                                    until: datetime, step: int) -> List[Dict]:
+        """Hourly buckets for (*scope*, *key*) summed into *step*-second bins."""
+        try:
+            step_ms = step * 1000
+            pipeline = [
+                {"$match": {"scope": scope, "key": key, "hour": {"$gte": since, "$lt": until}}},
+                {"$group": {
+                    "_id": {"$subtract": [
+                        {"$toLong": "$hour"}, {"$mod": [{"$toLong": "$hour"}, step_ms]},
+                    ]},
+                    "bytes":    {"$sum": "$bytes"},
+                    "requests": {"$sum": "$requests"},
+                }},
+                {"$sort": {"_id": 1}},
+            ]
+            docs = await self.bandwidth_hourly.aggregate(pipeline).to_list(length=None)
+            return [
+                {"t": d["_id"] // 1000, "bytes": d["bytes"], "requests": d["requests"]}
+                for d in docs
+            ]
+        except Exception as e:
+            logger.error("get bandwidth history error: %s", e)
+            return []
+
+    async def get_bandwidth_top(self, scope: str, since: datetime, until: datetime,
+                                limit: int = 10) -> List[Dict]:
+        """Heaviest files / users by bytes served between *since* and *until*."""
+        try:
+            pipeline = [
+                {"$match": {"scope": scope, "hour": {"$gte": since, "$lt": until}}},
+                {"$group": {
+                    "_id":      "$key",
+                    "bytes":    {"$sum": "$bytes"},
+                    "requests": {"$sum": "$requests"},
+                }},
+                {"$sort": {"bytes": -1}},
+                {"$limit": limit},
+            ]
+            docs = await self.bandwidth_hourly.aggregate(pipeline).to_list(length=limit)
+            top  = [{"key": d["_id"], "bytes": d["bytes"], "requests": d["requests"]} for d in docs]
+            if scope == "file" and top:
+                names = {
+                    f["file_id"]: f.get("file_name", "")
+                    async for f in self.files.find(
+                        {"file_id": {"$in": [t["key"] for t in top]}},
+                        {"file_id": 1, "file_name": 1},
+                    )
+                }
+                for t in top:
+                    t["file_name"] = names.get(t["key"], "")
+            return top
+        except Exception as e:
+            logger.error("get bandwidth top error: %s", e)
+            return []
+
+    async def get_user_usage(self, day: datetime, month: datetime) -> Optional[Dict[str, tuple]]:
+        """``{user_id: (bytes today, bytes this month)}`` from the per-user period rollups."""
+        try:
+            usage: Dict[str, list] = {}
+            cursor = self.bandwidth_hourly.find(
+                {"$or": [
+                    {"scope": "user_day",   "hour": day},
+                    {"scope": "user_month", "hour": month},
+                ]},
+                {"_id": 0, "scope": 1, "key": 1, "bytes": 1},
+            )
+            async for doc in cursor:
+                row = usage.setdefault(doc["key"], [0, 0])
+                row[0 if doc["scope"] == "user_day" else 1] += doc["bytes"]
+            return {user: tuple(row) for user, row in usage.items()}
+        except Exception as e:
+            logger.error("get user usage error: %s", e)
+            return None
+
     async def reset_bandwidth(self) -> bool:
         try:
             await self.bandwidth.delete_many({})
             await self.files.update_many({}, {"$set": {"bandwidth_used": 0}})
+            self._bw_total = self._bw_today = 0
             return True
         except Exception as e:
             logger.error("reset bandwidth error: %s", e)
@@ -200,6 +450,7 @@ class Database:
                 "first_used":    datetime.utcnow(),
                 "last_activity": datetime.utcnow(),
             })
+            self._user_count += 1
             logger.info("👤 ɴᴇᴡ ᴜꜱᴇʀ ʀᴇɢɪꜱᴛᴇʀᴇᴅ: %s", user_data["user_id"])
             return True  # new user
         except Exception as e:
@@ -222,36 +473,42 @@ class Database:
             logger.error("get total bandwidth error: %s", e)
             return 0
 
-    async def get_bandwidth_stats(self) -> Dict:
-        try:
-            total       = await self.get_total_bandwidth()
-            today       = datetime.utcnow().date().isoformat()
-            today_stats = await self.bandwidth.find_one({"date": today})
-            return {
-                "total_bandwidth": total,
-                "today_bandwidth": today_stats.get("total_bytes", 0) if today_stats else 0,
-            }
-        except Exception as e:
-            logger.error("get bandwidth stats error: %s", e)
-            return {"total_bandwidth": 0, "today_bandwidth": 0}
+    async def reconcile_counters(self) -> None:
+        """Re-base the in-memory counters on Mongo.
+
+        ``get_stats`` / ``get_bandwidth_stats`` serve these counters, which
+        inserts, deletes and bandwidth updates adjust in place. File and
+        user totals come from ``estimated_document_count``, which reads
+        collection metadata rather than scanning documents. The bandwidth
+        sum covers one document per day.
+        """
+        files = await self.files.estimated_document_count()
+        users = await self.users.estimated_document_count()
+        summed = await self.bandwidth.aggregate(
+            [{"$group": {"_id": None, "total": {"$sum": "$total_bytes"}}}]
+        ).to_list(length=1)
+        today = datetime.utcnow().date().isoformat()
+        doc   = await self.bandwidth.find_one({"date": today}, {"total_bytes": 1})
+        self._file_count = files
+        self._user_count = users
+        self._bw_total   = summed[0]["total"] if summed else 0
+        self._bw_day     = today
+        self._bw_today   = doc.get("total_bytes", 0) if doc else 0
+        self._reconciled = time.monotonic()
+
+    async def _maybe_reconcile(self) -> None:
+        if time.monotonic() - self._reconciled < _COUNTERS_RECONCILE or self._reconcile_lock.locked():
+            return
+        async with self._reconcile_lock:
+            try:
+                await self.reconcile_counters()
+            except Exception as e:
+                self._reconciled = time.monotonic()   # keep serving the mirror; retry next period
+                logger.error("reconcile counters error: %s", e)
 
-    async def get_stats(self) -> Dict:
-        try:
-            total_files = await self.files.count_documents({})
-            total_users = await self.users.count_documents({})
-            bw          = await self.get_bandwidth_stats()
-            return {
-                "total_files":     total_files,
-                "total_users":     total_users,
-                "total_bandwidth": bw["total_bandwidth"],
-                "today_bandwidth": bw["today_bandwidth"],
-            }
-        except Exception as e:
-            logger.error("get stats error: %s", e)
-            return {
-                "total_files": 0, "total_users": 0,
-                "total_bandwidth": 0, "today_bandwidth": 0,
-            }
+    async def get_bandwidth_stats(self) -> Dict:
+        await self._maybe_reconcile()
+        return await super().get_bandwidth_stats()
 
     async def add_sudo_user(self, user_id: str, added_by: str) -> bool:
         try:
@@ -291,10 +548,30 @@ class Database:
 
     async def get_user_count(self) -> int:
         try:
-            return await self.users.count_documents({})
+            await self._maybe_reconcile()
+            return self._user_count
         except Exception as e:
             logger.error("get user count error: %s", e)
             return 0
 
+    async def get_settings(self) -> Optional[Dict]:
+        try:
+            return await self.config.find_one({"key": "Settings"}, {"_id": 0})
+        except Exception as e:
+            logger.error("get settings error: %s", e)
+            return None
+
+    async def save_settings(self, values: Dict) -> bool:
+        try:
+            await self.config.update_one(
+                {"key": "Settings"},
+                {"$set": values},
+                upsert=True,
+            )
+            return True
+        except Exception as e:
+            logger.error("save settings error: %s", e)
+            return False
+
     async def close(self):
         self.client.close()
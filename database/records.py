@@ -0,0 +1,51 @@
+from typing import Dict, Optional
+
+# Only the fields the stream / player pages read; everything else in a
+# ``files`` document (username, telegram_file_id, created_at, ...) stays in Mongo.
+FILE_RECORD_PROJECTION = {
+    "_id":        0,
+    "file_id":    1,
+    "message_id": 1,
+    "user_id":    1,
+    "file_name":  1,
+    "file_size":  1,
+    "file_type":  1,
+    "mime_type":  1,
+}
+
+
+class FileRecord:
+    """Compact, read-only view of a file for the streaming hot path.
+
+    Built from a projected query, so the per-file metadata cache holds one
+    small slotted object instead of a full BSON-decoded dict.
+    """
+
+    __slots__ = ("file_id", "message_id", "user_id", "file_name", "file_size", "file_type", "mime_type")
+
+    def __init__(self, file_id: str, message_id: str, user_id: str, file_name: str,
+                 file_size: int, file_type: str, mime_type: str = ""):
+        self.file_id    = file_id
+        self.message_id = message_id
+        self.user_id    = user_id
+        self.file_name  = file_name
+        self.file_size  = file_size
+        self.file_type  = file_type
+        self.mime_type  = mime_type
+
+    @classmethod
+    def from_doc(cls, doc: Optional[Dict]) -> Optional["FileRecord"]:
+        if not doc:
+            return None
+        return cls(
+            doc["file_id"],
+            str(doc["message_id"]),
+            str(doc.get("user_id", "")),
+            doc.get("file_name", ""),
+            int(doc.get("file_size") or 0),
+            doc.get("file_type") or "document",
+            doc.get("mime_type") or "",
+        )
+
+    def __repr__(self) -> str:
+        return f"FileRecord({self.file_id!r}, message_id={self.message_id!r}, size={self.file_size})"
@@ -0,0 +1,769 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from .base import BANDWIDTH_HISTORY_TTL, REVOCATION_TTL, Database
+from .records import FileRecord
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+# Reader threads, each holding its own connection; WAL lets them run beside the writer
+_READERS = 4
+# Queued write jobs committed together in one transaction
+_WRITE_BATCH = 256
+# Compiled statements kept per connection (sqlite3's LRU statement cache)
+_STATEMENT_CACHE = 256
+# Expired revocations / hourly rollups are deleted this often
+_PRUNE_INTERVAL = 3600
+_STOP = object()
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS files (
+        oid              TEXT PRIMARY KEY,
+        file_id          TEXT NOT NULL UNIQUE,
+        message_id       TEXT NOT NULL UNIQUE,
+        telegram_file_id TEXT,
+        user_id          TEXT NOT NULL,
+        username         TEXT,
+        file_name        TEXT,
+        file_size        INTEGER,
+        file_type        TEXT,
+        mime_type        TEXT,
+        created_at       INTEGER NOT NULL,
+        bandwidth_used   INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS files_user_created ON files (user_id, created_at DESC, oid DESC)",
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id       TEXT PRIMARY KEY,
+        username      TEXT,
+        first_name    TEXT,
+        last_name     TEXT,
+        first_used    INTEGER NOT NULL,
+        last_activity INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS bandwidth (
+        date         TEXT PRIMARY KEY,
+        total_bytes  INTEGER NOT NULL DEFAULT 0,
+        last_updated INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS bandwidth_hourly (
+        scope    TEXT NOT NULL,
+        key      TEXT NOT NULL,
+        hour     INTEGER NOT NULL,
+        bytes    INTEGER NOT NULL DEFAULT 0,
+        requests INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, key, hour)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS bandwidth_hourly_scope_hour ON bandwidth_hourly (scope, hour)",
+    "CREATE INDEX IF NOT EXISTS bandwidth_hourly_hour ON bandwidth_hourly (hour)",
+    """CREATE TABLE IF NOT EXISTS sudo_users (
+        user_id  TEXT PRIMARY KEY,
+        added_by TEXT,
+        added_at INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS settings (
+        name  TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS revocations (
+        id          INTEGER PRIMARY KEY AUTOINCREMENT,
+        node        TEXT NOT NULL,
+        file_hashes TEXT NOT NULL,
+        message_ids TEXT NOT NULL,
+        everything  INTEGER NOT NULL,
+        revoked_at  INTEGER NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS revocations_revoked_at ON revocations (revoked_at)",
+)
+
+# Every statement is a constant, so each connection compiles it once and
+# reuses the prepared statement from its cache on every later call.
+_FILE_KEYS = (
+    "_id", "file_id", "message_id", "telegram_file_id", "user_id", "username",
+    "file_name", "file_size", "file_type", "mime_type", "created_at", "bandwidth_used",
+)
+_SELECT_FILE = (
+    "SELECT oid, file_id, message_id, telegram_file_id, user_id, username, file_name, "
+    "file_size, file_type, mime_type, created_at, bandwidth_used FROM files"
+)
+_INSERT_FILE = (
+    "INSERT INTO files (oid, file_id, message_id, telegram_file_id, user_id, username, "
+    "file_name, file_size, file_type, mime_type, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+_FILE_BY_MESSAGE = _SELECT_FILE + " WHERE message_id = ?"
+_FILE_BY_HASH    = _SELECT_FILE + " WHERE file_id = ?"
+_FILE_BY_OID     = _SELECT_FILE + " WHERE oid = ?"
+_FILE_RECORD = (
+    "SELECT file_id, message_id, user_id, file_name, file_size, file_type, mime_type "
+    "FROM files WHERE file_id = ?"
+)
+_USER_FILES = _SELECT_FILE + " WHERE user_id = ? ORDER BY created_at DESC, oid DESC LIMIT ?"
+# (has cursor, backward) → keyset page query on the (user_id, created_at, oid) index
+_FIND_FILES = {
+    (False, False): _SELECT_FILE + " WHERE user_id = ? ORDER BY created_at DESC, oid DESC LIMIT ?",
+    (False, True):  _SELECT_FILE + " WHERE user_id = ? ORDER BY created_at, oid LIMIT ?",
+    (True, False):  _SELECT_FILE + " WHERE user_id = ? AND (created_at, oid) < (?, ?) "
+                                   "ORDER BY created_at DESC, oid DESC LIMIT ?",
+    (True, True):   _SELECT_FILE + " WHERE user_id = ? AND (created_at, oid) > (?, ?) "
+                                   "ORDER BY created_at, oid LIMIT ?",
+}
+_COUNT_USER_FILES = "SELECT COUNT(*) FROM files WHERE user_id = ?"
+_FILE_REFS        = "SELECT file_id, message_id FROM files"
+_USER_FILE_REFS   = "SELECT file_id, message_id FROM files WHERE user_id = ?"
+_FILE_NAME        = "SELECT file_name FROM files WHERE file_id = ?"
+_DELETE_FILE       = "DELETE FROM files WHERE message_id = ?"
+_DELETE_USER_FILES = "DELETE FROM files WHERE user_id = ?"
+_DELETE_ALL_FILES  = "DELETE FROM files"
+
+_ADD_FILE_BANDWIDTH = "UPDATE files SET bandwidth_used = bandwidth_used + ? WHERE message_id = ?"
+_ADD_DAY_BANDWIDTH = (
+    "INSERT INTO bandwidth (date, total_bytes, last_updated) VALUES (?, ?, ?) "
+    "ON CONFLICT (date) DO UPDATE SET total_bytes = total_bytes + excluded.total_bytes, "
+    "last_updated = excluded.last_updated"
+)
+_TOTAL_BANDWIDTH = "SELECT COALESCE(SUM(total_bytes), 0) FROM bandwidth"
+_COUNTERS = (
+    "SELECT (SELECT COUNT(*) FROM files), (SELECT COUNT(*) FROM users), "
+    "(SELECT COALESCE(SUM(total_bytes), 0) FROM bandwidth), "
+    "(SELECT COALESCE(SUM(total_bytes), 0) FROM bandwidth WHERE date = ?)"
+)
+_ADD_BUCKET = (
+    "INSERT INTO bandwidth_hourly (scope, key, hour, bytes, requests) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (scope, key, hour) DO UPDATE SET bytes = bytes + excluded.bytes, "
+    "requests = requests + excluded.requests"
+)
+_HISTORY = (
+    "SELECT hour - hour % ? AS t, SUM(bytes), SUM(requests) FROM bandwidth_hourly "
+    "WHERE scope = ? AND key = ? AND hour >= ? AND hour < ? GROUP BY t ORDER BY t"
+)
+_TOP = (
+    "SELECT key, SUM(bytes) AS total, SUM(requests) FROM bandwidth_hourly "
+    "WHERE scope = ? AND hour >= ? AND hour < ? GROUP BY key ORDER BY total DESC LIMIT ?"
+)
+_USER_USAGE = (
+    "SELECT scope, key, bytes FROM bandwidth_hourly "
+    "WHERE (scope = 'user_day' AND hour = ?) OR (scope = 'user_month' AND hour = ?)"
+)
+
+_TOUCH_USER  = "UPDATE users SET last_activity = ? WHERE user_id = ?"
+_INSERT_USER = (
+    "INSERT INTO users (user_id, username, first_name, last_name, first_used, last_activity) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+_GET_USER = (
+    "SELECT user_id, username, first_name, last_name, first_used, last_activity "
+    "FROM users WHERE user_id = ?"
+)
+_ADD_SUDO = (
+    "INSERT INTO sudo_users (user_id, added_by, added_at) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET added_by = excluded.added_by, added_at = excluded.added_at"
+)
+_REMOVE_SUDO = "DELETE FROM sudo_users WHERE user_id = ?"
+_IS_SUDO     = "SELECT 1 FROM sudo_users WHERE user_id = ?"
+_SUDO_USERS  = "SELECT user_id, added_by, added_at FROM sudo_users"
+
+_GET_SETTINGS = "SELECT name, value FROM settings"
+_SET_SETTING  = (
+    "INSERT INTO settings (name, value) VALUES (?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+)
+
+_ADD_REVOCATION = (
+    "INSERT INTO revocations (node, file_hashes, message_ids, everything, revoked_at) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+_GET_REVOCATIONS = (
+    "SELECT id, node, file_hashes, message_ids, everything, revoked_at FROM revocations "
+    "WHERE revoked_at >= ? ORDER BY revoked_at, id"
+)
+_PRUNE_REVOCATIONS = "DELETE FROM revocations WHERE revoked_at < ?"
+_PRUNE_BUCKETS     = "DELETE FROM bandwidth_hourly WHERE hour < ?"
+
+
+def _to_ms(dt: datetime) -> int:
+    """Naive-UTC datetime → epoch milliseconds (Mongo's date precision)."""
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
+def _from_ms(ms: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=ms)
+
+
+def _file_doc(row) -> Dict:
+    doc = dict(zip(_FILE_KEYS, row))
+    doc["_id"]        = ObjectId(doc["_id"])
+    doc["created_at"] = _from_ms(doc["created_at"])
+    return doc
+
+
+def _settle(fut: asyncio.Future, result, exc: Optional[BaseException]) -> None:
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
+
+
+class _Writer:
+    """The one thread that writes: queued jobs are group-committed.
+
+    Every job queued while the previous transaction was committing goes into
+    the next one, so a burst of N writes costs one commit rather than N.
+    Each job runs inside its own SAVEPOINT — a failing job rolls back only
+    its own statements and the rest of the batch still commits.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread  = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Callable[[sqlite3.Connection], object]) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        fut  = loop.create_future()
+        self._queue.put((job, fut, loop))
+        return fut
+
+    def stop(self) -> None:
+        """Commit everything already queued, then close (blocking)."""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    return
+                batch, stopping = [item], False
+                while len(batch) < _WRITE_BATCH:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _commit(conn: sqlite3.Connection, batch: List[tuple]) -> None:
+        outcomes: List[Tuple[object, Optional[BaseException]]] = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, _, _ in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((job(conn), None))
+                except Exception as exc:
+                    conn.execute("ROLLBACK TO job")
+                    outcomes.append((None, exc))
+                conn.execute("RELEASE job")
+            conn.execute("COMMIT")
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(None, exc)] * len(batch)
+        for (_, fut, loop), (result, exc) in zip(batch, outcomes):
+            try:
+                loop.call_soon_threadsafe(_settle, fut, result, exc)
+            except RuntimeError:
+                pass   # the caller's loop is already closed
+
+
+class SQLiteDatabase(Database):
+    """Embedded single-node backend, selected with ``DB_URI=sqlite:///path/to/flix.db``.
+
+    The file runs in WAL mode: lookups go to a small pool of reader threads,
+    each with its own read-only connection, and never wait on the writer.
+    Writes are queued to one writer thread and group-committed (see
+    :class:`_Writer`). Only this process writes the file, so the counter
+    mirror seeded in :meth:`init_db` stays exact without reconciling.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self._readers = ThreadPoolExecutor(_READERS, thread_name_prefix="sqlite-read")
+        self._writer  = _Writer(self._connect)
+        self._pruned  = 0.0
+
+    @classmethod
+    def from_uri(cls, uri: str, database_name: str) -> "SQLiteDatabase":
+        """``sqlite:///relative.db`` / ``sqlite:////abs/path.db``; a bare ``sqlite:///`` uses *database_name*.db."""
+        path = uri[len("sqlite://"):]
+        if path.startswith("/"):
+            path = path[1:]
+        return cls(path or f"{database_name}.db")
+
+    def _connect(self, readonly: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=_STATEMENT_CACHE,
+        )
+        conn.execute("PRAGMA busy_timeout = 5000")
+        if readonly:
+            conn.execute("PRAGMA query_only = 1")
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+            # WAL + NORMAL: no fsync per commit, the database can't corrupt on power loss
+            conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect(readonly=True)
+            self._reader_conns.append(conn)
+        return conn
+
+    async def _read(self, job: Callable[[sqlite3.Connection], object]):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._readers, lambda: job(self._reader()),
+        )
+
+    async def _fetchone(self, sql: str, params: tuple = ()):
+        return await self._read(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def _fetchall(self, sql: str, params: tuple = ()) -> List[tuple]:
+        return await self._read(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def _write(self, job: Callable[[sqlite3.Connection], object]):
+        return await self._writer.submit(job)
+
+    async def _execute(self, sql: str, params: tuple = ()) -> int:
+        return await self._write(lambda conn: conn.execute(sql, params).rowcount)
+
+    @staticmethod
+    def _prune(conn: sqlite3.Connection) -> None:
+        now = datetime.utcnow()
+        conn.execute(_PRUNE_REVOCATIONS, (_to_ms(now - timedelta(seconds=REVOCATION_TTL)),))
+        conn.execute(_PRUNE_BUCKETS, (_to_ms(now - timedelta(seconds=BANDWIDTH_HISTORY_TTL)),))
+
+    # ── lifecycle / settings ────────────────────────────────────────────────
+
+    async def init_db(self):
+        def create(conn):
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._prune(conn)
+
+        try:
+            await self._write(create)
+            self._pruned = time.monotonic()
+            today = datetime.utcnow().date().isoformat()
+            files, users, total, today_bytes = await self._fetchone(_COUNTERS, (today,))
+            self._file_count = files
+            self._user_count = users
+            self._bw_total   = total
+            self._bw_day     = today
+            self._bw_today   = today_bytes
+            logger.info("✅ ꜱQʟɪᴛᴇ ᴅʙ ʀᴇᴀᴅʏ (ᴡᴀʟ): %s", self.path)
+            return True
+        except Exception as e:
+            logger.error("❌ ᴅʙ ɪɴɪᴛ ᴇʀʀᴏʀ: %s", e)
+            return False
+
+    def _shutdown(self) -> None:
+        self._writer.stop()
+        self._readers.shutdown(wait=True)
+        for conn in self._reader_conns:
+            conn.close()
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._shutdown)
+
+    async def get_settings(self) -> Optional[Dict]:
+        try:
+            rows = await self._fetchall(_GET_SETTINGS)
+            return {name: json.loads(value) for name, value in rows} or None
+        except Exception as e:
+            logger.error("get settings error: %s", e)
+            return None
+
+    async def save_settings(self, values: Dict) -> bool:
+        try:
+            rows = [(k, json.dumps(v)) for k, v in values.items() if k != "_id"]
+            await self._write(lambda conn: conn.executemany(_SET_SETTING, rows))
+            return True
+        except Exception as e:
+            logger.error("save settings error: %s", e)
+            return False
+
+    # ── files ───────────────────────────────────────────────────────────────
+
+    async def add_file(self, file_data: Dict) -> bool:
+        try:
+            await self._execute(_INSERT_FILE, (
+                str(ObjectId()),
+                file_data["file_id"],
+                str(file_data["message_id"]),
+                file_data.get("telegram_file_id", ""),
+                str(file_data["user_id"]),
+                file_data.get("username", ""),
+                file_data["file_name"],
+                int(file_data["file_size"]),
+                file_data["file_type"],
+                file_data.get("mime_type", ""),
+                _to_ms(datetime.utcnow()),
+            ))
+            self._file_count += 1
+            return True
+        except Exception as e:
+            logger.error("add file error: %s", e)
+            return False
+
+    async def _get_file(self, sql: str, key: str) -> Optional[Dict]:
+        row = await self._fetchone(sql, (key,))
+        return _file_doc(row) if row else None
+
+    async def get_file(self, message_id: str) -> Optional[Dict]:
+        try:
+            return await self._get_file(_FILE_BY_MESSAGE, str(message_id))
+        except Exception as e:
+            logger.error("get file error: %s", e)
+            return None
+
+    async def get_file_by_hash(self, file_hash: str) -> Optional[Dict]:
+        try:
+            return await self._get_file(_FILE_BY_HASH, file_hash)
+        except Exception as e:
+            logger.error("get file by hash error: %s", e)
+            return None
+
+    async def get_file_by_oid(self, oid: str) -> Optional[Dict]:
+        if not ObjectId.is_valid(oid):
+            return None
+        try:
+            return await self._get_file(_FILE_BY_OID, str(ObjectId(oid)))
+        except Exception as e:
+            logger.error("get file by oid error: %s", e)
+            return None
+
+    async def get_file_record(self, file_hash: str) -> Optional[FileRecord]:
+        try:
+            row = await self._fetchone(_FILE_RECORD, (file_hash,))
+            return FileRecord(*row) if row else None
+        except Exception as e:
+            logger.error("get file record error: %s", e)
+            return None
+
+    async def delete_file(self, message_id: str) -> bool:
+        try:
+            deleted = await self._execute(_DELETE_FILE, (str(message_id),))
+            self._file_count = max(0, self._file_count - deleted)
+            return deleted > 0
+        except Exception as e:
+            logger.error("delete file error: %s", e)
+            return False
+
+    async def delete_all_files(self) -> int:
+        try:
+            deleted = await self._execute(_DELETE_ALL_FILES)
+            self._file_count = max(0, self._file_count - deleted)
+            return deleted
+        except Exception as e:
+            logger.error("delete all files error: %s", e)
+            return 0
+
+    async def delete_user_files(self, user_id: str) -> int:
+        try:
+            deleted = await self._execute(_DELETE_USER_FILES, (str(user_id),))
+            self._file_count = max(0, self._file_count - deleted)
+            return deleted
+        except Exception as e:
+            logger.error("delete user files error: %s", e)
+            return 0
+
+    async def get_user_files(self, user_id: str, limit: int = 50) -> List[Dict]:
+        try:
+            rows = await self._fetchall(_USER_FILES, (str(user_id), limit if limit and limit > 0 else -1))
+            return [_file_doc(row) for row in rows]
+        except Exception as e:
+            logger.error("get user files error: %s", e)
+            return []
+
+    async def find_files(self, user_id, limit: int,
+                         cursor: Optional[Tuple[datetime, object]] = None,
+                         backward: bool = False) -> List[Dict]:
+        try:
+            if cursor is None:
+                params: tuple = (str(user_id), limit)
+            else:
+                created_at, oid = cursor
+                params = (str(user_id), _to_ms(created_at), str(oid), limit)
+            rows  = await self._fetchall(_FIND_FILES[cursor is not None, backward], params)
+            files = [_file_doc(row) for row in rows]
+            if backward:
+                files.reverse()
+            return files
+        except Exception as e:
+            logger.error("find_files error: %s", e)
+            return []
+
+    async def count_user_files(self, user_id) -> int:
+        try:
+            return (await self._fetchone(_COUNT_USER_FILES, (str(user_id),)))[0]
+        except Exception as e:
+            logger.error("count user files error: %s", e)
+            return 0
+
+    async def get_file_refs(self, user_id: Optional[str] = None) -> List[Dict]:
+        try:
+            if user_id is None:
+                rows = await self._fetchall(_FILE_REFS)
+            else:
+                rows = await self._fetchall(_USER_FILE_REFS, (str(user_id),))
+            return [{"file_id": file_id, "message_id": message_id} for file_id, message_id in rows]
+        except Exception as e:
+            logger.error("get file refs error: %s", e)
+            return []
+
+    # ── revocations ─────────────────────────────────────────────────────────
+
+    async def add_revocation(self, node: str, file_hashes: List[str],
+                             message_ids: List[str], everything: bool = False) -> bool:
+        try:
+            await self._execute(_ADD_REVOCATION, (
+                node, json.dumps(file_hashes), json.dumps(message_ids),
+                int(everything), _to_ms(datetime.utcnow()),
+            ))
+            return True
+        except Exception as e:
+            logger.error("add revocation error: %s", e)
+            return False
+
+    async def get_revocations(self, since: datetime) -> List[Dict]:
+        try:
+            rows = await self._fetchall(_GET_REVOCATIONS, (_to_ms(since),))
+            return [
+                {
+                    "_id":         rid,
+                    "node":        node,
+                    "file_hashes": json.loads(hashes),
+                    "message_ids": json.loads(mids),
+                    "everything":  bool(everything),
+                    "revoked_at":  _from_ms(revoked_at),
+                }
+                for rid, node, hashes, mids, everything, revoked_at in rows
+            ]
+        except Exception as e:
+            logger.error("get revocations error: %s", e)
+            return []
+
+    # ── bandwidth ───────────────────────────────────────────────────────────
+
+    async def update_bandwidth(self, size: int) -> bool:
+        try:
+            now   = datetime.utcnow()
+            today = now.date().isoformat()
+            await self._execute(_ADD_DAY_BANDWIDTH, (today, size, _to_ms(now)))
+            self._count_bandwidth(today, size)
+            return True
+        except Exception as e:
+            logger.error("update bandwidth error: %s", e)
+            return False
+
+    async def track_bandwidth(self, message_id: str, size: int) -> bool:
+        now   = datetime.utcnow()
+        today = now.date().isoformat()
+
+        def track(conn):
+            conn.execute(_ADD_FILE_BANDWIDTH, (size, str(message_id)))
+            conn.execute(_ADD_DAY_BANDWIDTH, (today, size, _to_ms(now)))
+
+        try:
+            await self._write(track)
+            self._count_bandwidth(today, size)
+            return True
+        except Exception as e:
+            logger.error("track bandwidth error: %s", e)
+            return False
+
+    async def get_total_bandwidth(self) -> int:
+        try:
+            return (await self._fetchone(_TOTAL_BANDWIDTH))[0]
+        except Exception as e:
+            logger.error("get total bandwidth error: %s", e)
+            return 0
+
+    async def reset_bandwidth(self) -> bool:
+        def reset(conn):
+            conn.execute("DELETE FROM bandwidth")
+            conn.execute("UPDATE files SET bandwidth_used = 0")
+
+        try:
+            await self._write(reset)
+            self._bw_total = self._bw_today = 0
+            return True
+        except Exception as e:
+            logger.error("reset bandwidth error: %s", e)
+            return False
+
+    async def add_bandwidth_buckets(self, buckets: List[Dict],
+                                    files: Optional[Dict[str, int]] = None) -> bool:
+        if not buckets and not files:
+            return True
+        rows  = [(b["scope"], b["key"], _to_ms(b["hour"]), b["bytes"], b["requests"]) for b in buckets]
+        days  = self._daily_bandwidth(buckets)
+        now   = _to_ms(datetime.utcnow())
+        prune = time.monotonic() - self._pruned > _PRUNE_INTERVAL
+
+        def add(conn):
+            conn.executemany(_ADD_BUCKET, rows)
+            conn.executemany(_ADD_FILE_BANDWIDTH, [(size, mid) for mid, size in (files or {}).items()])
+            conn.executemany(_ADD_DAY_BANDWIDTH, [(day, size, now) for day, size in days.items()])
+            if prune:
+                self._prune(conn)
+
+        try:
+            await self._write(add)
+            if prune:
+                self._pruned = time.monotonic()
+            for day, size in days.items():
+                self._count_bandwidth(day, size)
+            return True
+        except Exception as e:
+            logger.error("add bandwidth buckets error: %s", e)
+            return False
+
+    async def get_bandwidth_history(self, scope: str, key: str, since: datetime,
+                                    until: datetime, step: int) -> List[Dict]:
+        try:
+            rows = await self._fetchall(
+                _HISTORY, (step * 1000, scope, key, _to_ms(since), _to_ms(until)),
+            )
+            return [{"t": t // 1000, "bytes": nbytes, "requests": requests} for t, nbytes, requests in rows]
+        except Exception as e:
+            logger.error("get bandwidth history error: %s", e)
+            return []
+
+    async def get_bandwidth_top(self, scope: str, since: datetime, until: datetime,
+                                limit: int = 10) -> List[Dict]:
+        def top(conn):
+            rows = conn.execute(_TOP, (scope, _to_ms(since), _to_ms(until), limit)).fetchall()
+            result = [{"key": key, "bytes": nbytes, "requests": requests} for key, nbytes, requests in rows]
+            if scope == "file":
+                for t in result:
+                    name = conn.execute(_FILE_NAME, (t["key"],)).fetchone()
+                    t["file_name"] = name[0] if name else ""
+            return result
+
+        try:
+            return await self._read(top)
+        except Exception as e:
+            logger.error("get bandwidth top error: %s", e)
+            return []
+
+    async def get_user_usage(self, day: datetime, month: datetime) -> Optional[Dict[str, tuple]]:
+        try:
+            usage: Dict[str, list] = {}
+            for scope, key, nbytes in await self._fetchall(_USER_USAGE, (_to_ms(day), _to_ms(month))):
+                row = usage.setdefault(key, [0, 0])
+                row[0 if scope == "user_day" else 1] += nbytes
+            return {user: tuple(row) for user, row in usage.items()}
+        except Exception as e:
+            logger.error("get user usage error: %s", e)
+            return None
+
+    # ── users / sudo ────────────────────────────────────────────────────────
+
+    async def register_user_on_start(self, user_data: Dict) -> bool:
+        user_id = str(user_data["user_id"])
+
+        def register(conn):
+            now = _to_ms(datetime.utcnow())
+            if conn.execute(_TOUCH_USER, (now, user_id)).rowcount:
+                return False  # not new
+            conn.execute(_INSERT_USER, (
+                user_id,
+                user_data.get("username", ""),
+                user_data.get("first_name", ""),
+                user_data.get("last_name", ""),
+                now, now,
+            ))
+            return True
+
+        try:
+            is_new = await self._write(register)
+            if is_new:
+                self._user_count += 1
+                logger.info("👤 ɴᴇᴡ ᴜꜱᴇʀ ʀᴇɢɪꜱᴛᴇʀᴇᴅ: %s", user_id)
+            return is_new
+        except Exception as e:
+            logger.error("❌ ʀᴇɢɪꜱᴛᴇʀ_ᴜꜱᴇʀ_ᴏɴ_ꜱᴛᴀʀᴛ ᴇʀʀᴏʀ: %s", e)
+            return False
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        try:
+            row = await self._fetchone(_GET_USER, (str(user_id),))
+            if not row:
+                return None
+            return {
+                "user_id":       row[0],
+                "username":      row[1],
+                "first_name":    row[2],
+                "last_name":     row[3],
+                "first_used":    _from_ms(row[4]),
+                "last_activity": _from_ms(row[5]),
+            }
+        except Exception as e:
+            logger.error("get user error: %s", e)
+            return None
+
+    async def add_sudo_user(self, user_id: str, added_by: str) -> bool:
+        try:
+            await self._execute(_ADD_SUDO, (str(user_id), str(added_by), _to_ms(datetime.utcnow())))
+            return True
+        except Exception as e:
+            logger.error("add sudo user error: %s", e)
+            return False
+
+    async def remove_sudo_user(self, user_id: str) -> bool:
+        try:
+            return await self._execute(_REMOVE_SUDO, (str(user_id),)) > 0
+        except Exception as e:
+            logger.error("remove sudo user error: %s", e)
+            return False
+
+    async def is_sudo_user(self, user_id: str) -> bool:
+        try:
+            return await self._fetchone(_IS_SUDO, (str(user_id),)) is not None
+        except Exception as e:
+            logger.error("is sudo user error: %s", e)
+            return False
+
+    async def get_sudo_users(self) -> List[Dict]:
+        try:
+            return [
+                {"user_id": user_id, "added_by": added_by, "added_at": _from_ms(added_at)}
+                for user_id, added_by, added_at in await self._fetchall(_SUDO_USERS)
+            ]
+        except Exception as e:
+            logger.error("get sudo users error: %s", e)
+            return []
@@ -10,6 +10,7 @@ from .utils import (
 from .crypto import Cryptic
 from .stream import StreamingService
 from .bandwidth import check_bandwidth_limit
+from .shaping import egress_shaper
 
 __all__ = [
     "format_size",
@@ -22,4 +23,5 @@ __all__ = [
     "Cryptic",
     "StreamingService",
     "check_bandwidth_limit",
+    "egress_shaper",
 ]
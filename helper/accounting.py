@@ -0,0 +1,372 @@
+import asyncio
+import bisect
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config import Config
+from .expiring import ExpiringDict
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+
+# Rollup scopes: one bucket per hour for the whole node, per file and per user
+SCOPES = ("total", "file", "user")
+# Per-user period totals (bucket "hour" is the day / month start) backing quotas
+_USER_DAY   = "user_day"
+_USER_MONTH = "user_month"
+
+# Failed flushes are retried; past this many pending buckets the oldest are dropped
+_MAX_PENDING = 50_000
+# Per-viewer cap on disjoint served ranges; beyond it the closest pair is merged
+_MAX_INTERVALS = 64
+
+BUCKET_WRITES = Counter(
+    "flix_bandwidth_buckets",
+    "Hourly bandwidth buckets flushed to Mongo.",
+    ["result"],
+)
+
+
+QUOTA_REJECTS = Counter(
+    "flix_quota_rejects",
+    "Streams refused or cut off because the file owner is over a bandwidth quota.",
+    ["period"],
+)
+
+
+def hour_floor(when: datetime) -> datetime:
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def day_floor(when: datetime) -> datetime:
+    return when.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class BandwidthAccountant:
+    """Pre-aggregate served bytes into hourly ``(scope, key, hour)`` buckets.
+
+    The stream path only bumps an in-memory dict; a background task hands
+    the accumulated buckets, together with each file's ``bandwidth_used``
+    delta, to :meth:`Database.add_bandwidth_buckets` every
+    ``BANDWIDTH_FLUSH_INTERVAL`` seconds as one unordered bulk of ``$inc``
+    upserts, so Mongo sees one write per touched bucket per interval rather
+    than one per response. The daily / all-time totals follow from the
+    ``total`` buckets in the same write.
+
+    The same pass keeps per-owner day / month byte counters in memory so
+    ``stream_file`` can enforce ``user_daily_quota`` / ``user_monthly_quota``
+    without a DB read; :meth:`sync_usage` re-bases them on the Mongo
+    totals every ``QUOTA_SYNC_INTERVAL`` seconds to pick up other nodes.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str, datetime], List[int]] = {}
+        # message_id -> bytes, added to files.bandwidth_used on flush
+        self._files:   Dict[str, int] = {}
+        # user_id -> [day, day_bytes, month, month_bytes]; quota checks read only this
+        self._usage: Dict[str, List] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._db   = None
+        self._lock = asyncio.Lock()
+        # bins only move when a flush lands, so identical chart queries share one aggregate
+        self._history: ExpiringDict = ExpiringDict(max(5.0, Config.BANDWIDTH_FLUSH_INTERVAL))
+
+    def record(self, file_hash: str, message_id: str, user_id, nbytes: int,
+               when: Optional[datetime] = None) -> None:
+        when  = when or datetime.utcnow()
+        self._files[message_id] = self._files.get(message_id, 0) + nbytes
+        if Config.BANDWIDTH_FLUSH_INTERVAL <= 0 and self._db is not None:
+            # batching disabled — write through
+            asyncio.ensure_future(self.flush())
+        user  = str(user_id or "")
+        day   = day_floor(when)
+        month = day.replace(day=1)
+        for key in (
+            ("total", "", hour_floor(when)),
+            ("file", file_hash, hour_floor(when)),
+            ("user", user, hour_floor(when)),
+            (_USER_DAY, user, day),
+            (_USER_MONTH, user, month),
+        ):
+            bucket = self._pending.get(key)
+            if bucket is None:
+                self._pending[key] = [nbytes, 1]
+            else:
+                bucket[0] += nbytes
+                bucket[1] += 1
+
+        usage = self._usage.get(user)
+        if usage is None:
+            self._usage[user] = [day, nbytes, month, nbytes]
+            return
+        if usage[0] != day:
+            usage[0], usage[1] = day, 0
+        if usage[2] != month:
+            usage[2], usage[3] = month, 0
+        usage[1] += nbytes
+        usage[3] += nbytes
+
+    # ── per-user quotas ─────────────────────────────────────────────────────
+
+    def usage(self, user_id) -> Tuple[int, int]:
+        """Bytes served for *user_id*'s files today and this month (UTC)."""
+        usage = self._usage.get(str(user_id))
+        if usage is None:
+            return 0, 0
+        day = day_floor(datetime.utcnow())
+        return (
+            usage[1] if usage[0] == day else 0,
+            usage[3] if usage[2] == day.replace(day=1) else 0,
+        )
+
+    def over_quota(self, user_id, in_flight: int = 0) -> Optional[str]:
+        """``"daily"`` / ``"monthly"`` when *user_id* is over a quota, else ``None``.
+
+        *in_flight* adds bytes of a response still being served, which are
+        only recorded once it finishes.
+        """
+        daily   = int(Config.get("user_daily_quota", 0) or 0)
+        monthly = int(Config.get("user_monthly_quota", 0) or 0)
+        if not (daily or monthly) or str(user_id) in {str(o) for o in Config.OWNER_ID}:
+            return None
+        day_used, month_used = self.usage(user_id)
+        if daily and day_used + in_flight >= daily:
+            return "daily"
+        if monthly and month_used + in_flight >= monthly:
+            return "monthly"
+        return None
+
+    def top_users(self, limit: int = 5) -> List[Tuple[str, int, int]]:
+        """``(user_id, today, this month)`` for the heaviest users this month."""
+        rows = [(user, *self.usage(user)) for user in self._usage if user]
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return [r for r in rows[:limit] if r[2]]
+
+    async def sync_usage(self) -> None:
+        """Reload per-user totals from Mongo so other nodes' traffic counts too.
+
+        Runs under the flush lock: everything already flushed is in the
+        query result and everything recorded since is still in ``_pending``,
+        so adding the two is exact.
+        """
+        if self._db is None:
+            return
+        async with self._lock:
+            day   = day_floor(datetime.utcnow())
+            month = day.replace(day=1)
+            totals = await self._db.get_user_usage(day, month)
+            if totals is None:
+                return
+            usage = {user: [day, d, month, m] for user, (d, m) in totals.items()}
+            for (scope, user, period), (nbytes, _) in self._pending.items():
+                if scope == _USER_DAY and period == day:
+                    usage.setdefault(user, [day, 0, month, 0])[1] += nbytes
+                elif scope == _USER_MONTH and period == month:
+                    usage.setdefault(user, [day, 0, month, 0])[3] += nbytes
+            self._usage = usage
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self, db) -> None:
+        self._db = db
+        if Config.BANDWIDTH_FLUSH_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        synced = 0.0
+        while True:
+            try:
+                if time.monotonic() - synced >= Config.QUOTA_SYNC_INTERVAL:
+                    synced = time.monotonic()
+                    await self.sync_usage()
+                await asyncio.sleep(Config.BANDWIDTH_FLUSH_INTERVAL)
+                await self.flush()
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.error("bandwidth flush error: %s", exc)
+
+    async def flush(self) -> int:
+        if self._db is None or not (self._pending or self._files):
+            return 0
+        async with self._lock:
+            batch, self._pending = self._pending, {}
+            files, self._files   = self._files, {}
+            buckets = [
+                {"scope": scope, "key": key, "hour": hour, "bytes": b, "requests": n}
+                for (scope, key, hour), (b, n) in batch.items()
+            ]
+            if await self._db.add_bandwidth_buckets(buckets, files):
+                BUCKET_WRITES.labels("ok").inc(len(buckets))
+                return len(buckets)
+            BUCKET_WRITES.labels("retry").inc(len(buckets))
+            self._requeue(batch, files)
+            return 0
+
+    async def history(self, db, scope: str, key: str, since: datetime, until: datetime,
+                      step: int, top: int = 0) -> Dict:
+        """Zero-filled series for (*scope*, *key*) plus the *top* files / users in range.
+
+        *since* / *until* are widened to whole hours (the current, still
+        filling, hour included) so repeated dashboard polls hit the cache.
+        """
+        since = hour_floor(since)
+        until = hour_floor(until) + timedelta(hours=1)
+        cache_key = (scope, key, since, until, step, top)
+        cached = self._history.get(cache_key)
+        if cached is not None:
+            return cached
+        points = await db.get_bandwidth_history(scope, key, since, until, step)
+        result = {
+            "scope":  scope,
+            "key":    key,
+            "from":   epoch(since),
+            "to":     epoch(until),
+            "step":   step,
+            "points": fill_series(points, since, until, step),
+        }
+        if top:
+            result["top"] = {
+                "file": await db.get_bandwidth_top("file", since, until, top),
+                "user": await db.get_bandwidth_top("user", since, until, top),
+            }
+        self._history.set(cache_key, result)
+        return result
+
+    def _requeue(self, batch: Dict[Tuple[str, str, datetime], List[int]],
+                 files: Dict[str, int]) -> None:
+        for k, (b, n) in batch.items():
+            bucket = self._pending.setdefault(k, [0, 0])
+            bucket[0] += b
+            bucket[1] += n
+        for mid, b in files.items():
+            self._files[mid] = self._files.get(mid, 0) + b
+        overflow = len(self._pending) - _MAX_PENDING
+        if overflow > 0:
+            for k in sorted(self._pending, key=lambda k: k[2])[:overflow]:
+                del self._pending[k]
+            BUCKET_WRITES.labels("dropped").inc(overflow)
+            logger.warning("bandwidth buckets dropped after failed flushes: %d", overflow)
+
+
+class IntervalSet:
+    """Sorted, disjoint half-open byte ranges ``[start, end)``.
+
+    Holds at most ``_MAX_INTERVALS`` ranges: past that the two neighbours
+    with the smallest gap are merged, which can only under-count the few
+    bytes in that gap if they are fetched later.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends:   List[int] = []
+
+    def add(self, start: int, end: int) -> int:
+        """Merge ``[start, end)`` in; returns how many of its bytes were new."""
+        if end <= start:
+            return 0
+        requested    = end - start
+        starts, ends = self.starts, self.ends
+        lo = bisect.bisect_left(ends, start)      # first range ending at/after start
+        hi = bisect.bisect_right(starts, end)     # ranges starting at/before end touch it
+        covered = 0
+        for i in range(lo, hi):
+            covered += max(0, min(end, ends[i]) - max(start, starts[i]))
+        if lo < hi:
+            start, end = min(start, starts[lo]), max(end, ends[hi - 1])
+        starts[lo:hi] = [start]
+        ends[lo:hi]   = [end]
+        if len(starts) > _MAX_INTERVALS:
+            gaps = [starts[i + 1] - ends[i] for i in range(len(starts) - 1)]
+            i = gaps.index(min(gaps))
+            ends[i] = ends[i + 1]
+            del starts[i + 1], ends[i + 1]
+        return requested - covered
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def covered(self) -> int:
+        return sum(e - s for s, e in zip(self.starts, self.ends))
+
+
+class ServedRanges:
+    """Byte ranges already accounted per viewer (client IP, file).
+
+    Players re-request overlapping ranges at shifting offsets, and retry
+    the same offset after a short read; merging every response's served
+    spans into the viewer's :class:`IntervalSet` counts each byte once
+    while the viewer stays active. A viewer idle for *ttl* seconds is
+    forgotten, so a later re-watch is billed again like real egress.
+    """
+
+    def __init__(self, ttl: float):
+        self.viewers: ExpiringDict[Tuple[str, str], IntervalSet] = ExpiringDict(ttl)
+
+    def add(self, client_ip: str, message_id: str, spans: List[Tuple[int, int]]) -> int:
+        """Record served ``[start, end)`` *spans*; returns the newly served byte count."""
+        key    = (client_ip, message_id)
+        served = self.viewers.get(key)
+        if served is None:
+            served = IntervalSet()
+        new = sum(served.add(start, end) for start, end in spans)
+        self.viewers.set(key, served)
+        return new
+
+
+def epoch(when: datetime) -> int:
+    """Unix seconds for a naive UTC datetime (what Mongo hands back)."""
+    return int(when.replace(tzinfo=timezone.utc).timestamp())
+
+
+def fill_series(points: List[Dict], since: datetime, until: datetime, step: int) -> List[Dict]:
+    """Zero-fill *points* (``{"t": epoch, ...}``) so every *step* in range is present."""
+    by_t  = {p["t"]: p for p in points}
+    start = epoch(since) // step * step
+    end   = epoch(until)
+    return [
+        by_t.get(t, {"t": t, "bytes": 0, "requests": 0})
+        for t in range(start, end, step)
+    ]
+
+
+def parse_span(value: str, default: int) -> int:
+    """``"90"`` / ``"15m"`` / ``"6h"`` / ``"7d"`` → seconds."""
+    value = (value or "").strip().lower()
+    if not value:
+        return default
+    units = {"s": 1, "m": 60, "h": HOUR, "d": 24 * HOUR}
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(float(value))
+
+
+def auto_step(span: timedelta, max_points: int) -> int:
+    """Smallest whole-hour multiple keeping *span* under *max_points* buckets."""
+    hours = max(1, int(span.total_seconds()) // HOUR)
+    step  = 1
+    for step in (1, 2, 3, 6, 12, 24, 48, 168):
+        if hours / step <= max_points:
+            break
+    return step * HOUR
+
+
+bandwidth_accountant = BandwidthAccountant()
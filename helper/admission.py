@@ -0,0 +1,239 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Hashable, Optional, Tuple
+
+from config import Config
+from .loopmon import loop_monitor
+from .metrics import Gauge
+from .stream import get_buffered_bytes, get_dc_error_rate
+
+logger = logging.getLogger(__name__)
+
+class AdmissionController:
+    """Gate new streams on load so the ones already running keep their quality.
+
+    A request is shed when active streams, buffered prefetch bytes, event-loop
+    lag or the target DC's failure rate exceed their thresholds. ``/dl``
+    requests wait in a bounded FIFO queue for capacity instead of failing
+    straight away; each finished stream hands its slot to the oldest waiter
+    that fits. ``/stream`` requests get 503 with ``Retry-After``. Requests
+    that continue an existing (hash, ip) session always pass.
+    """
+
+    def __init__(self):
+        self.active      = 0
+        self.rejected    = 0
+        self._waiters: Deque[Tuple[asyncio.Future, Optional[int]]] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def loop_lag(self) -> float:
+        return loop_monitor.lag
+
+    def overload_reason(self, dc_id: Optional[int] = None) -> Optional[str]:
+        if self.active >= Config.MAX_ACTIVE_STREAMS:
+            return f"active streams {self.active}/{Config.MAX_ACTIVE_STREAMS}"
+        buffered_mb = get_buffered_bytes() / (1024 * 1024)
+        if buffered_mb >= Config.MAX_BUFFERED_MB:
+            return f"buffered {buffered_mb:.0f}/{Config.MAX_BUFFERED_MB} MB"
+        lag_ms = self.loop_lag * 1000
+        if lag_ms >= Config.MAX_LOOP_LAG_MS:
+            return f"loop lag {lag_ms:.0f}/{Config.MAX_LOOP_LAG_MS} ms"
+        if dc_id is not None:
+            err_rate = get_dc_error_rate(dc_id)
+            if err_rate >= Config.DC_ERROR_THRESHOLD:
+                return f"dc {dc_id} failure rate {err_rate:.2f}"
+        return None
+
+    def retry_after(self) -> int:
+        """Suggested Retry-After, scaled by how far over capacity we are."""
+        pressure = self.active / max(1, Config.MAX_ACTIVE_STREAMS)
+        return int(min(60, max(5, 5 * pressure + self.queued)))
+
+    async def acquire(
+        self,
+        is_download: bool,
+        is_existing: bool,
+        dc_id: Optional[int] = None,
+    ) -> Optional[int]:
+        """Admit a request. Returns None when admitted, else a Retry-After in seconds."""
+        loop_monitor.ensure_started()
+
+        # a new /dl request may not overtake the ones already queued
+        if is_existing or (self.overload_reason(dc_id) is None and not (is_download and self._waiters)):
+            self.active += 1
+            return None
+
+        if not is_download or self.queued >= Config.DL_QUEUE_SIZE:
+            self.rejected += 1
+            logger.info("admission: shed request (%s)", self.overload_reason(dc_id))
+            return self.retry_after()
+
+        fut   = asyncio.get_running_loop().create_future()
+        entry = (fut, dc_id)
+        self._waiters.append(entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=Config.DL_QUEUE_TIMEOUT)
+            return None   # slot handed over by release(); already counted as active
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if fut.done() and not fut.cancelled():
+                if isinstance(exc, asyncio.CancelledError):
+                    # A slot was handed over just as we gave up — pass it on
+                    self.release()
+                    raise
+                return None
+            fut.cancel()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            # lag / buffer / DC pressure can ease without a stream finishing
+            if self.overload_reason(dc_id) is None:
+                self.active += 1
+                return None
+            self.rejected += 1
+            logger.info("admission: /dl queue timeout (%s)", self.overload_reason(dc_id))
+            return self.retry_after()
+        finally:
+            try:
+                self._waiters.remove(entry)
+            except ValueError:
+                pass
+
+    def release(self) -> None:
+        self.active = max(0, self.active - 1)
+        self._admit_waiters()
+
+    def _admit_waiters(self) -> None:
+        """Hand free capacity to queued /dl requests, oldest first."""
+        for entry in list(self._waiters):
+            fut, dc_id = entry
+            if fut.done():
+                continue
+            if self.overload_reason() is not None:
+                break
+            if self.overload_reason(dc_id) is not None:
+                continue   # its DC is failing; don't hold up waiters for other DCs
+            self._waiters.remove(entry)
+            self.active += 1
+            fut.set_result(None)
+
+    def snapshot(self) -> dict:
+        return {
+            "active":       self.active,
+            "queued":       self.queued,
+            "rejected":     self.rejected,
+            "loop_lag_ms":  round(self.loop_lag * 1000, 1),
+            "buffered_mb":  round(get_buffered_bytes() / (1024 * 1024), 1),
+            "overloaded":   self.overload_reason() is not None,
+        }
+
+
+class ConnectionLimiter:
+    """Cap concurrent streaming connections per client IP and per (IP, file).
+
+    Download accelerators open dozens of parallel range connections, each
+    with its own prefetch pipeline. Connections over the cap wait in a FIFO
+    queue per key and receive a slot directly when one is released, so one
+    client cannot starve others and queued sockets cost no Telegram traffic.
+    """
+
+    def __init__(self):
+        self._active:  Dict[Hashable, int] = {}
+        self._waiters: Dict[Hashable, Deque[asyncio.Future]] = {}
+        self.rejected = 0
+
+    async def _acquire_key(self, key: Hashable, cap: int, timeout: float) -> bool:
+        if cap <= 0:
+            return True
+        active  = self._active.get(key, 0)
+        waiters = self._waiters.get(key)
+        if active < cap and not waiters:
+            self._active[key] = active + 1
+            return True
+        if waiters is not None and len(waiters) >= Config.CONN_QUEUE_SIZE:
+            return False
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(fut)
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=timeout)
+            return True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if fut.done() and not fut.cancelled():
+                # A slot was handed over just as we gave up — pass it on
+                self._release_key(key, cap)
+            else:
+                fut.cancel()
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            return False
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                try:
+                    waiters.remove(fut)
+                except ValueError:
+                    pass
+                if not waiters:
+                    self._waiters.pop(key, None)
+
+    def _release_key(self, key: Hashable, cap: int) -> None:
+        if cap <= 0:
+            return
+        waiters = self._waiters.get(key)
+        while waiters:
+            fut = waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)   # hand the slot over; active count unchanged
+                return
+        active = self._active.get(key, 0) - 1
+        if active <= 0:
+            self._active.pop(key, None)
+        else:
+            self._active[key] = active
+
+    async def acquire(self, client_ip: str, file_hash: str) -> bool:
+        """Take a per-(IP, file) slot, then a per-IP slot, queueing for each."""
+        deadline = time.monotonic() + Config.CONN_QUEUE_TIMEOUT
+        file_key = ("file", client_ip, file_hash)
+        if not await self._acquire_key(file_key, Config.MAX_CONNS_PER_FILE, Config.CONN_QUEUE_TIMEOUT):
+            self.rejected += 1
+            return False
+        remaining = max(0.0, deadline - time.monotonic())
+        try:
+            acquired = await self._acquire_key(("ip", client_ip), Config.MAX_CONNS_PER_IP, remaining)
+        except BaseException:
+            # cancelled while queued for the IP slot — don't strand the file slot
+            self._release_key(file_key, Config.MAX_CONNS_PER_FILE)
+            raise
+        if not acquired:
+            self._release_key(file_key, Config.MAX_CONNS_PER_FILE)
+            self.rejected += 1
+            return False
+        return True
+
+    def release(self, client_ip: str, file_hash: str) -> None:
+        self._release_key(("ip", client_ip), Config.MAX_CONNS_PER_IP)
+        self._release_key(("file", client_ip, file_hash), Config.MAX_CONNS_PER_FILE)
+
+    def snapshot(self) -> dict:
+        return {
+            "ips":         sum(1 for k in self._active if k[0] == "ip"),
+            "connections": sum(n for k, n in self._active.items() if k[0] == "ip"),
+            "queued":      sum(len(w) for w in self._waiters.values()),
+            "rejected":    self.rejected,
+        }
+
+
+admission    = AdmissionController()
+conn_limiter = ConnectionLimiter()
+
+Gauge("flix_admission_active", "Streams admitted and running.", func=lambda: admission.active)
+Gauge("flix_admission_queued", "/dl requests waiting for capacity.", func=lambda: admission.queued)
+Gauge("flix_admission_rejected", "Requests shed by admission control since start.", func=lambda: admission.rejected)
+Gauge("flix_client_connections", "Open streaming connections across all IPs.",
+      func=lambda: conn_limiter.snapshot()["connections"])
@@ -0,0 +1,96 @@
+import asyncio
+import logging
+import random
+from typing import Dict, Optional
+
+from pyrogram import raw
+from pyrogram.errors import FileReferenceExpired, FloodWait
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+FAULTS = ("floodwait", "timeout", "connection", "cdn_redirect", "file_ref_expired")
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """Parse ``"floodwait=0.01,timeout=0.02"`` into a fault → probability map."""
+    rates: Dict[str, float] = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.strip().partition("=")
+        if not name:
+            continue
+        if name not in FAULTS or not sep:
+            raise ValueError(f"bad chaos fault spec {item!r}; expected one of {', '.join(FAULTS)}")
+        rates[name] = float(value)
+    return rates
+
+
+class ChaosSession:
+    """Wrap a media ``Session`` and inject failures into ``upload.GetFile``.
+
+    Each call rolls once against the configured per-fault probabilities:
+    FloodWait (``floodwait_seconds``), a hung RPC that only the caller's
+    timeout ends, ``ConnectionError``, a ``FileCdnRedirect`` answer or
+    ``FileReferenceExpired``. Every other call and attribute is passed
+    through untouched, so it can stand in for the real session.
+    """
+
+    def __init__(
+        self,
+        inner,
+        rates: Dict[str, float],
+        floodwait_seconds: int = 1,
+        seed: Optional[int] = None,
+    ):
+        self.inner             = inner
+        self.rates             = {name: rates.get(name, 0.0) for name in FAULTS}
+        self.floodwait_seconds = floodwait_seconds
+        self.injected          = {name: 0 for name in FAULTS}
+        self._rng              = random.Random(seed)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def _pick_fault(self) -> Optional[str]:
+        roll = self._rng.random()
+        for name in FAULTS:
+            roll -= self.rates[name]
+            if roll < 0:
+                return name
+        return None
+
+    async def invoke(self, query, *args, **kwargs):
+        if not isinstance(query, raw.functions.upload.GetFile):
+            return await self.inner.invoke(query, *args, **kwargs)
+
+        fault = self._pick_fault()
+        if fault is None:
+            return await self.inner.invoke(query, *args, **kwargs)
+
+        self.injected[fault] += 1
+        logger.debug("chaos: injecting %s at offset %d", fault, query.offset)
+        if fault == "floodwait":
+            raise FloodWait(value=self.floodwait_seconds)
+        if fault == "timeout":
+            await asyncio.sleep(3600)
+        if fault == "connection":
+            raise ConnectionError("chaos: connection reset")
+        if fault == "cdn_redirect":
+            return raw.types.upload.FileCdnRedirect(
+                dc_id=203,
+                file_token=b"chaos",
+                encryption_key=b"\0" * 32,
+                encryption_iv=b"\0" * 16,
+                file_hashes=[],
+            )
+        raise FileReferenceExpired()
+
+
+def maybe_wrap(session):
+    """Wrap *session* in ``ChaosSession`` when ``CHAOS_MODE`` is on (staging only)."""
+    if not Config.CHAOS_MODE or isinstance(session, ChaosSession):
+        return session
+    rates = parse_rates(Config.CHAOS_RATES)
+    logger.warning("chaos mode ON — injecting media session faults: %s", rates)
+    return ChaosSession(session, rates, floodwait_seconds=Config.CHAOS_FLOODWAIT_SECONDS)
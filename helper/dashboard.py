@@ -0,0 +1,160 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+LIVE_SECTIONS = ("stats", "bandwidth", "health", "streams")
+_SUBSCRIBER_QUEUE = 16
+_RESYNC = None          # queued when a slow subscriber overflowed: resend the full snapshot
+_CLOSE  = b""           # queued on shutdown: end the stream
+
+
+class SnapshotEntry:
+    __slots__ = ("data", "body", "etag")
+
+    def __init__(self, data: Dict):
+        self.data = data
+        self.body = json.dumps(data).encode()
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=12).hexdigest() + '"'
+
+
+class DashboardSampler:
+    """Refresh dashboard payloads on a fixed cadence, independent of traffic.
+
+    *build* returns ``{section: payload}``; each payload is serialised and
+    tagged once per refresh, so any number of open panels cost one set of
+    psutil / Mongo calls per *interval* and requests only copy bytes out.
+
+    Live subscribers (``/api/live``) get one pre-encoded Server-Sent Event
+    per refresh holding only the keys of ``LIVE_SECTIONS`` that changed,
+    so pushing to N clients is N queue puts of the same bytes.
+    """
+
+    def __init__(self, build: Callable[[], Awaitable[Dict[str, Dict]]], interval: float):
+        self.build    = build
+        self.interval = interval
+        self.taken_at = 0.0
+        self._entries: Dict[str, SnapshotEntry] = {}
+        self._lock    = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._seq     = 0
+
+    def ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.error("dashboard sampler error: %s", exc)
+                await asyncio.sleep(self.interval)
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            sections = await self.build()
+            previous = self._entries
+            self._entries = {name: SnapshotEntry(data) for name, data in sections.items()}
+            self.taken_at = time.time()
+        if self._subscribers:
+            self._publish(previous)
+
+    # ── live push ───────────────────────────────────────────────────────────
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        q: asyncio.Queue = asyncio.Queue(_SUBSCRIBER_QUEUE)
+        self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue) -> None:
+        self._subscribers.discard(q)
+
+    def close_subscribers(self) -> None:
+        for q in list(self._subscribers):
+            self._offer(q, _CLOSE)
+
+    def _event(self, kind: str, data: Dict) -> bytes:
+        return f"id: {self._seq}\nevent: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+
+    def snapshot_event(self) -> bytes:
+        """Full ``snapshot`` event — sent on connect and after a resync."""
+        return self._event("snapshot", {
+            name: self._entries[name].data for name in LIVE_SECTIONS if name in self._entries
+        })
+
+    def _publish(self, previous: Dict[str, SnapshotEntry]) -> None:
+        delta: Dict[str, Dict] = {}
+        for name in LIVE_SECTIONS:
+            new = self._entries.get(name)
+            old = previous.get(name)
+            if new is None or (old is not None and old.etag == new.etag):
+                continue
+            old_data = old.data if old is not None else {}
+            changed  = {k: v for k, v in new.data.items() if old_data.get(k) != v}
+            if changed:
+                delta[name] = changed
+        if not delta:
+            return
+        self._seq += 1
+        message = self._event("delta", delta)
+        for q in list(self._subscribers):
+            self._offer(q, message)
+
+    @staticmethod
+    def _offer(q: asyncio.Queue, message) -> None:
+        try:
+            q.put_nowait(message)
+        except asyncio.QueueFull:
+            # the client fell behind; deltas are useless now, start it over
+            while not q.empty():
+                q.get_nowait()
+            q.put_nowait(message if message == _CLOSE else _RESYNC)
+
+    async def get(self, section: str) -> SnapshotEntry:
+        entry = self._entries.get(section)
+        if entry is None:
+            # first request before the sampler's first tick
+            if not self._lock.locked():
+                await self.refresh()
+            else:
+                async with self._lock:
+                    pass
+            entry = self._entries[section]
+        return entry
+
+    def respond(self, request: web.Request, entry: SnapshotEntry) -> web.Response:
+        """JSON response for *entry*, or ``304`` when the client's copy is current."""
+        headers = {
+            "ETag":          entry.etag,
+            "Cache-Control": f"private, max-age={max(1, int(self.interval))}",
+        }
+        inm = request.headers.get("If-None-Match", "")
+        if inm:
+            tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+            if entry.etag in tags or "*" in tags:
+                return web.Response(status=304, headers=headers)
+        return web.Response(body=entry.body, content_type="application/json", headers=headers)
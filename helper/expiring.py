@@ -0,0 +1,93 @@
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Dict, Generic, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class ExpiringDict(Generic[K, V]):
+    """Mapping whose keys expire *ttl* seconds after their last write.
+
+    Expiry uses a min-heap of (deadline, seq, key) with lazy deletion, so
+    ``set``/``touch`` are O(log n) and expiring k keys costs O(k log n) —
+    no request ever scans the whole map. Refreshed keys leave stale heap
+    entries behind; the heap is rebuilt once they outnumber live keys.
+    """
+
+    __slots__ = ("ttl", "_clock", "_data", "_heap", "_seq")
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl    = ttl
+        self._clock = clock
+        self._data: Dict[K, Tuple[float, V]] = {}
+        self._heap: List[Tuple[float, int, K]] = []
+        self._seq   = itertools.count()
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Drop every key whose deadline has passed; returns how many were dropped."""
+        if now is None:
+            now = self._clock()
+        heap, data = self._heap, self._data
+        dropped = 0
+        while heap and heap[0][0] <= now:
+            _, _, key = heapq.heappop(heap)
+            entry = data.get(key)
+            if entry is not None and entry[0] <= now:
+                del data[key]
+                dropped += 1
+        return dropped
+
+    def _push(self, key: K, deadline: float) -> None:
+        heapq.heappush(self._heap, (deadline, next(self._seq), key))
+        if len(self._heap) > 2 * len(self._data) + 64:
+            self._heap = [(exp, next(self._seq), k) for k, (exp, _) in self._data.items()]
+            heapq.heapify(self._heap)
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        now = self._clock()
+        self.expire(now)
+        deadline = now + (self.ttl if ttl is None else ttl)
+        self._data[key] = (deadline, value)
+        self._push(key, deadline)
+
+    def touch(self, key: K, value: Any = _MISSING) -> bool:
+        """Extend *key*'s deadline (optionally replacing its value); False if absent."""
+        now = self._clock()
+        self.expire(now)
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        deadline = now + self.ttl
+        self._data[key] = (deadline, entry[1] if value is _MISSING else value)
+        self._push(key, deadline)
+        return True
+
+    def get(self, key: K, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= self._clock():
+            return default
+        return entry[1]
+
+    def pop(self, key: K, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._heap.clear()
+
+    def items(self) -> Iterator[Tuple[K, V]]:
+        now = self._clock()
+        return ((k, v) for k, (exp, v) in list(self._data.items()) if exp > now)
+
+    def __contains__(self, key: object) -> bool:
+        entry = self._data.get(key)  # type: ignore[arg-type]
+        return entry is not None and entry[0] > self._clock()
+
+    def __len__(self) -> int:
+        self.expire()
+        return len(self._data)
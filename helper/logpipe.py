@@ -0,0 +1,186 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from .metrics import Counter
+
+LOG_RECORDS_DROPPED = Counter(
+    "flix_log_records_dropped",
+    "Log records discarded by the rate limiter or a full log queue.",
+    ["reason"],
+)
+
+_WHEN_SECONDS = {"S": 1, "M": 60, "H": 3600, "D": 86400, "MIDNIGHT": 86400}
+
+
+class SizeTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """``RotatingFileHandler`` that also rolls over on a time interval.
+
+    Backups keep the numbered ``bot.log.1 … bot.log.N`` scheme whichever
+    limit triggers, so a size rollover inside the same time period can never
+    overwrite an older backup. *when* is ``S``/``M``/``H``/``D`` (times
+    *interval*) or ``midnight``; an empty *when* disables the time limit.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0,
+                 when: str = "midnight", interval: int = 1, encoding: Optional[str] = "utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count,
+                         encoding=encoding, delay=True)
+        when = (when or "").upper()
+        if when and when not in _WHEN_SECONDS:
+            raise ValueError(f"invalid rotation interval: {when!r}")
+        self.when     = when
+        self.interval = _WHEN_SECONDS.get(when, 0) * max(1, interval)
+        start = os.stat(filename).st_mtime if os.path.exists(filename) else time.time()
+        self.rollover_at = self._next_rollover(start)
+
+    def _next_rollover(self, now: float) -> float:
+        if not self.when:
+            return float("inf")
+        if self.when == "MIDNIGHT":
+            t = time.localtime(now)
+            return time.mktime((t.tm_year, t.tm_mon, t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        return now + self.interval
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(super().shouldRollover(record))
+
+    def doRollover(self) -> None:
+        if self.backupCount == 0:
+            # RotatingFileHandler only rotates with backups; truncate instead
+            if self.stream:
+                self.stream.close()
+                self.stream = None
+            open(self.baseFilename, "w").close()
+        else:
+            super().doRollover()
+        self.rollover_at = self._next_rollover(time.time())
+
+
+class HotPathFilter(logging.Filter):
+    """Per-logger token bucket for records below INFO.
+
+    Each logger may emit *rate* debug records per second (bursting to
+    *burst*). Once a logger is over budget only every *sample*-th record
+    gets through, and the next one that does carries a note of how many
+    were suppressed. INFO and above always pass.
+    """
+
+    def __init__(self, rate: float, burst: float, sample: int):
+        super().__init__()
+        self.rate   = rate
+        self.burst  = max(burst, 1.0)
+        self.sample = max(0, sample)
+        self._lock  = threading.Lock()
+        self._buckets: Dict[str, List[float]] = {}   # name -> [tokens, last, over, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.INFO or self.rate <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.burst, now, 0, 0]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                keep = True
+            else:
+                bucket[2] += 1
+                keep = bool(self.sample) and bucket[2] % self.sample == 0
+            if not keep:
+                bucket[3] += 1
+                LOG_RECORDS_DROPPED.labels("rate_limited").inc()
+                return False
+            suppressed, bucket[3] = bucket[3], 0
+            if bucket[0] >= 1.0:
+                bucket[2] = 0
+        if suppressed:
+            record.msg  = f"{record.msg} [{suppressed} similar suppressed]"
+        return True
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` that drops records instead of raising when full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message and traceback on the
+        # caller's thread; leave that to the listener's handlers. Arguments
+        # are rendered when written, so log values, not live mutable state.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.labels("queue_full").inc()
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup(*handlers: logging.Handler) -> logging.handlers.QueueListener:
+    """Route every root-logger record through a queue to *handlers*.
+
+    Callers only pay for building the record and a ``put_nowait``; formatting
+    and disk writes happen on the listener's thread, so a slow disk can no
+    longer stall the event loop. Rate limiting runs before the record is
+    queued so suppressed debug lines cost almost nothing.
+    """
+    global _listener
+    shutdown()
+    log_queue: queue.Queue = queue.Queue(Config.LOG_QUEUE_SIZE)
+    q_handler = _DroppingQueueHandler(log_queue)
+    q_handler.addFilter(HotPathFilter(
+        Config.LOG_DEBUG_RATE, Config.LOG_DEBUG_BURST, Config.LOG_DEBUG_SAMPLE,
+    ))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(q_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+
+
+atexit.register(shutdown)
+
+
+def tail(path: str, max_bytes: int) -> str:
+    """Last *max_bytes* of *path*, starting at a line boundary when possible.
+
+    Seeks from the end instead of reading the whole file.
+    """
+    with open(path, "rb") as fh:
+        fh.seek(0, os.SEEK_END)
+        size = fh.tell()
+        fh.seek(max(0, size - max_bytes))
+        data = fh.read(max_bytes)
+    if size > max_bytes:
+        nl = data.find(b"\n")
+        if 0 <= nl < len(data) - 1:
+            data = data[nl + 1:]
+    return data.decode("utf-8", errors="replace")
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import Config
+from .metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+_SAMPLE_INTERVAL = 0.25
+_WINDOW_SECONDS  = 60
+_LAG_EWMA_ALPHA  = 0.3
+_STACK_LIMIT     = 20
+_MAX_SLOW_KEPT   = 20
+
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+LOOP_LAG = Histogram(
+    "flix_loop_lag_samples_seconds",
+    "Event-loop scheduling delay per probe.",
+    buckets=_LAG_BUCKETS,
+)
+SLOW_CALLBACKS = Counter(
+    "flix_slow_callbacks",
+    "Times the event loop was blocked longer than SLOW_CALLBACK_MS.",
+)
+
+
+def _pct(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class LoopMonitor:
+    """Measure event-loop lag and catch the callbacks that cause it.
+
+    An asyncio task sleeps ``_SAMPLE_INTERVAL`` and records how late it woke
+    up. A watchdog thread watches the task's heartbeat; when the loop has
+    not ticked for ``SLOW_CALLBACK_MS`` it grabs the loop thread's stack via
+    ``sys._current_frames`` — the code that is blocking, caught in the act.
+    Sustained lag above ``LOOP_LAG_ALERT_MS`` is reported to ``LOGS_CHAT_ID``.
+    """
+
+    def __init__(self):
+        self.lag        = 0.0
+        self.bot        = None
+        self.slow: Deque[Dict] = deque(maxlen=_MAX_SLOW_KEPT)
+        # Keep enough history for the alert window too, plus a couple of
+        # samples so the oldest one reaches back past ``now - window``
+        history = max(_WINDOW_SECONDS, Config.LOOP_LAG_ALERT_WINDOW)
+        self._samples: Deque[Tuple[float, float]] = deque(
+            maxlen=int(history / _SAMPLE_INTERVAL) + 2
+        )
+        self._heartbeat    = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._last_alert   = float("-inf")
+
+    def ensure_started(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._heartbeat   = time.monotonic()
+        self._task        = asyncio.ensure_future(self._sampler())
+        if self._watchdog is None or not self._watchdog.is_alive():
+            self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sampler(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                start = loop.time()
+                await asyncio.sleep(_SAMPLE_INTERVAL)
+                now = time.monotonic()
+                self._heartbeat = now
+                lag = max(0.0, loop.time() - start - _SAMPLE_INTERVAL)
+                self.lag += _LAG_EWMA_ALPHA * (lag - self.lag)
+                self._samples.append((now, lag))
+                LOOP_LAG.observe(lag)
+                self._maybe_alert(now)
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.error("loop monitor sampler error: %s", exc)
+
+    def _watch(self) -> None:
+        threshold = Config.SLOW_CALLBACK_MS / 1000
+        current: Optional[Dict] = None
+        while True:
+            time.sleep(min(0.05, threshold / 4))
+            if self._task is None or self._task.done():
+                current = None
+                continue
+            blocked = time.monotonic() - self._heartbeat - _SAMPLE_INTERVAL
+            if blocked < threshold:
+                if current is not None:
+                    logger.warning(
+                        "event loop blocked %.0f ms in:\n%s",
+                        current["blocked_ms"], current["stack"],
+                    )
+                    current = None
+                continue
+            if current is None:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is None:
+                    continue
+                current = {
+                    "at":         time.time(),
+                    "blocked_ms": 0.0,
+                    "stack":      "".join(traceback.format_stack(frame, limit=_STACK_LIMIT)),
+                }
+                self.slow.append(current)
+                SLOW_CALLBACKS.inc()
+            current["blocked_ms"] = round(blocked * 1000, 1)
+
+    def percentiles(self, window: float = _WINDOW_SECONDS) -> Dict[str, float]:
+        cutoff  = time.monotonic() - window
+        ordered = sorted(lag for ts, lag in self._samples if ts >= cutoff)
+        return {
+            "p50_ms": round(_pct(ordered, 50) * 1000, 1),
+            "p95_ms": round(_pct(ordered, 95) * 1000, 1),
+            "p99_ms": round(_pct(ordered, 99) * 1000, 1),
+            "max_ms": round((ordered[-1] if ordered else 0.0) * 1000, 1),
+        }
+
+    def _maybe_alert(self, now: float) -> None:
+        if not Config.LOGS_CHAT_ID or self.bot is None or not Config.LOOP_LAG_ALERT_MS:
+            return
+        if now - self._last_alert < Config.LOOP_LAG_ALERT_COOLDOWN:
+            return
+        window = Config.LOOP_LAG_ALERT_WINDOW
+        if not self._samples or self._samples[0][0] > now - window:
+            return   # not enough history yet
+        recent = [lag for ts, lag in self._samples if ts >= now - window]
+        p50 = _pct(sorted(recent), 50) * 1000
+        if p50 < Config.LOOP_LAG_ALERT_MS:
+            return
+        self._last_alert = now
+        asyncio.ensure_future(self._send_alert(p50, window))
+
+    async def _send_alert(self, p50_ms: float, window: float) -> None:
+        stats = self.percentiles(window)
+        text  = (
+            "**#ʟᴏᴏᴘ_ʟᴀɢ**\n\n"
+            f"⏱ **ᴍᴇᴅɪᴀɴ ʟᴀɢ:** `{p50_ms:.0f} ms` ᴏᴠᴇʀ `{window:.0f}s`\n"
+            f"📈 **ᴘ95 / ᴍᴀx:** `{stats['p95_ms']:.0f} / {stats['max_ms']:.0f} ms`"
+        )
+        if self.slow:
+            last  = self.slow[-1]
+            stack = last["stack"][-2500:]
+            text += f"\n\n🐢 **ʟᴀꜱᴛ ʙʟᴏᴄᴋ:** `{last['blocked_ms']:.0f} ms`\n```\n{stack}\n```"
+        try:
+            await self.bot.send_message(Config.LOGS_CHAT_ID, text, disable_web_page_preview=True)
+        except Exception as exc:
+            logger.error("loop lag alert failed: %s", exc)
+
+    def snapshot(self) -> Dict:
+        last = self.slow[-1] if self.slow else None
+        return {
+            **self.percentiles(),
+            "ewma_ms":        round(self.lag * 1000, 1),
+            "slow_callbacks": int(SLOW_CALLBACKS.labels().value),
+            "last_slow": {
+                "at":         last["at"],
+                "blocked_ms": last["blocked_ms"],
+                "where":      last["stack"].strip().splitlines()[-2:],
+            } if last else None,
+        }
+
+
+loop_monitor = LoopMonitor()
+
+Gauge("flix_loop_lag_seconds", "Smoothed event-loop lag.", func=lambda: loop_monitor.lag)
+Gauge(
+    "flix_loop_lag_quantile_seconds",
+    "Event-loop lag quantiles over the last minute.",
+    ["quantile"],
+    func=lambda: {
+        q: loop_monitor.percentiles()[f"p{int(float(q) * 100)}_ms"] / 1000
+        for q in ("0.5", "0.95", "0.99")
+    },
+)
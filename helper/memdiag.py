@@ -0,0 +1,188 @@
+import asyncio
+import itertools
+import linecache
+import logging
+import os
+import sys
+import tracemalloc
+from typing import Dict, List, Optional
+
+import psutil
+
+from .expiring import ExpiringDict
+from .stream import get_caches
+
+logger = logging.getLogger(__name__)
+
+_TRACE_FRAMES = 1
+_SIZE_SAMPLE  = 500
+# tracemalloc taxes every allocation; a forgotten ``start`` switches itself off
+MAX_TRACE_SECONDS = 30 * 60
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, linecache.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+_auto_stop: Optional[asyncio.TimerHandle] = None
+
+
+def _deep_size(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(_deep_size(v, seen) for v in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _deep_size(vars(obj), seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(
+            _deep_size(getattr(obj, name), seen)
+            for name in obj.__slots__ if hasattr(obj, name)
+        )
+    return size
+
+
+def cache_sizes() -> Dict[str, Dict[str, int]]:
+    """Entry count and estimated deep size of every streaming cache.
+
+    Large caches are sized from a sample of ``_SIZE_SAMPLE`` entries and
+    extrapolated, so this stays cheap enough to call from a handler.
+    """
+    result = {}
+    for name, cache in get_caches().items():
+        if isinstance(cache, ExpiringDict):
+            entries   = cache._data
+            container = sys.getsizeof(cache._data) + sys.getsizeof(cache._heap) + 56 * len(cache._heap)
+        else:
+            entries   = cache
+            container = sys.getsizeof(cache)
+        count  = len(entries)
+        seen: set = set()
+        sample = list(itertools.islice(entries.items(), _SIZE_SAMPLE))
+        per    = sum(_deep_size(k, seen) + _deep_size(v, seen) for k, v in sample) / max(1, len(sample))
+        result[name] = {"entries": count, "bytes": int(container + per * count)}
+    return result
+
+
+def start() -> None:
+    """Start tracing (if needed) and take a fresh baseline.
+
+    Tracing switches itself off ``MAX_TRACE_SECONDS`` after the last
+    ``start`` unless :func:`stop` is called first.
+    """
+    global _baseline, _auto_stop
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(_TRACE_FRAMES)
+        logger.info("memdiag: tracemalloc started")
+    _baseline = _take_snapshot()
+    if _auto_stop is not None:
+        _auto_stop.cancel()
+    _auto_stop = asyncio.get_running_loop().call_later(MAX_TRACE_SECONDS, stop)
+
+
+def stop() -> None:
+    global _baseline, _auto_stop
+    _baseline = None
+    if _auto_stop is not None:
+        _auto_stop.cancel()
+        _auto_stop = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("memdiag: tracemalloc stopped")
+
+
+def tracing_stops_in() -> Optional[float]:
+    """Seconds until tracing switches itself off, or None when it is not on."""
+    if _auto_stop is None or not tracemalloc.is_tracing():
+        return None
+    return max(0.0, _auto_stop.when() - asyncio.get_running_loop().time())
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def _site(stat) -> str:
+    frame = stat.traceback[0]
+    parts = frame.filename.replace(os.sep, "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{frame.lineno}"
+
+
+def _build_report(limit: int, caches: Dict) -> Dict:
+    report: Dict = {
+        "tracing":  tracemalloc.is_tracing(),
+        "rss":      psutil.Process().memory_info().rss,
+        "caches":   caches,
+    }
+    if not tracemalloc.is_tracing():
+        return report
+
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot      = _take_snapshot()
+    report.update({
+        "traced_current": current,
+        "traced_peak":    peak,
+        "top": [
+            {"site": _site(s), "size": s.size, "count": s.count}
+            for s in snapshot.statistics("lineno")[:limit]
+        ],
+    })
+    if _baseline is not None:
+        report["growth"] = [
+            {"site": _site(s), "size_diff": s.size_diff, "count_diff": s.count_diff, "size": s.size}
+            for s in snapshot.compare_to(_baseline, "lineno")[:limit]
+            if s.size_diff
+        ]
+    return report
+
+
+async def report(limit: int = 10) -> Dict:
+    """Current memory picture.
+
+    Never starts tracing: without an explicit :func:`start` the report has
+    RSS and cache sizes only. Cache sizes are read on the loop thread (the caches are not
+    thread-safe); snapshot statistics are computed in the default executor
+    so the heavy grouping does not run as one uninterrupted loop callback.
+    """
+    caches = cache_sizes()
+    rep    = await asyncio.get_running_loop().run_in_executor(None, _build_report, limit, caches)
+    stops_in = tracing_stops_in()
+    if stops_in is not None:
+        rep["tracing_stops_in"] = round(stops_in)
+    return rep
+
+
+def format_report(rep: Dict, human_size) -> List[str]:
+    """Plain-text lines for a bot message; *human_size* formats byte counts."""
+    lines = [f"RSS: {human_size(rep['rss'])}"]
+    if rep.get("tracing"):
+        lines.append(
+            f"traced: {human_size(rep['traced_current'])} (peak {human_size(rep['traced_peak'])})"
+        )
+        if rep.get("tracing_stops_in") is not None:
+            lines.append(f"tracing stops in {rep['tracing_stops_in'] // 60} min")
+    else:
+        lines.append("tracing off: start it to see allocation sites")
+    lines.append("")
+    lines.append("caches:")
+    for name, info in sorted(rep["caches"].items(), key=lambda kv: -kv[1]["bytes"]):
+        lines.append(f"  {name:<16} {info['entries']:>7} entries  ~{human_size(info['bytes'])}")
+    if rep.get("growth"):
+        lines.append("")
+        lines.append("growth since baseline:")
+        for g in rep["growth"]:
+            sign = "+" if g["size_diff"] >= 0 else "-"
+            lines.append(f"  {sign}{human_size(abs(g['size_diff'])):>10}  {g['site']}")
+    if rep.get("top"):
+        lines.append("")
+        lines.append("top allocation sites:")
+        for t in rep["top"]:
+            lines.append(f"  {human_size(t['size']):>10}  {t['count']:>7}  {t['site']}")
+    return lines
@@ -0,0 +1,222 @@
+import bisect
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition without the client library: the hot path only
+# does a dict lookup plus a couple of float additions per observation.
+
+_REGISTRY: List["_Metric"] = []
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_DEPTH_BUCKETS   = (0, 1, 2, 4, 8, 12, 16)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name        = name
+        self.doc         = doc
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        _REGISTRY.append(self)
+
+    def labels(self, *values) -> object:
+        key   = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    @abstractmethod
+    def _new_child(self) -> object: ...
+
+    @abstractmethod
+    def _samples(self) -> List[str]: ...
+
+    def render(self) -> str:
+        family = self.name + "_total" if self.kind == "counter" else self.name
+        lines  = [f"# HELP {family} {self.doc}", f"# TYPE {family} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}_total{_fmt_labels(self.label_names, key)} {_fmt_value(child.value)}"
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge that is either set directly or read from *func* at scrape time.
+
+    *func* returns a number for an unlabelled gauge, or a mapping of label
+    value (tuple or scalar) → number for a labelled one.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), func: Optional[Callable] = None):
+        super().__init__(name, doc, labels)
+        self._func = func
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def _samples(self) -> List[str]:
+        if self._func is None:
+            items = [(key, child.value) for key, child in self._children.items()]
+        else:
+            try:
+                result = self._func()
+            except Exception:
+                return []
+            if isinstance(result, dict):
+                items = [
+                    (key if isinstance(key, tuple) else (key,), value)
+                    for key, value in result.items()
+                ]
+            else:
+                items = [((), result)]
+        return [
+            f"{self.name}{_fmt_labels(self.label_names, key)} {_fmt_value(value)}"
+            for key, value in items
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum    = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = _LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_fmt_labels(self.label_names, key, le)} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_fmt_labels(self.label_names, key)} {_fmt_value(child.sum)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    return "\n".join(metric.render() for metric in _REGISTRY) + "\n"
+
+
+# ── Streaming engine metrics ─────────────────────────────────────────────────
+
+STREAM_TTFB = Histogram(
+    "flix_stream_ttfb_seconds",
+    "Time from request arrival to the first body byte written.",
+    ["route"],
+)
+GETFILE_LATENCY = Histogram(
+    "flix_getfile_latency_seconds",
+    "Latency of successful upload.GetFile calls.",
+    ["dc"],
+)
+GETFILE_RETRIES = Counter(
+    "flix_getfile_retries",
+    "GetFile attempts that failed and were retried or aborted.",
+    ["dc", "reason"],
+)
+FLOODWAIT_SECONDS = Counter(
+    "flix_floodwait_seconds",
+    "Seconds spent sleeping on Telegram FloodWait.",
+    ["dc"],
+)
+QUEUE_DEPTH = Histogram(
+    "flix_prefetch_queue_depth",
+    "Prefetch queue depth seen by the writer on each chunk.",
+    buckets=_DEPTH_BUCKETS,
+)
+BYTES_SERVED = Counter(
+    "flix_bytes_served",
+    "Body bytes written to clients.",
+    ["route"],
+)
+CACHE_REQUESTS = Counter(
+    "flix_cache_requests",
+    "In-process cache lookups by cache and result (hit/miss).",
+    ["cache", "result"],
+)
+STREAMS_FINISHED = Counter(
+    "flix_streams",
+    "Finished stream responses by route and outcome.",
+    ["route", "outcome"],
+)
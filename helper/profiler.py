@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILE_SECONDS = 120
+_DEFAULT_INTERVAL   = 0.005
+_MAX_DEPTH          = 64
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for the whole process.
+
+    A background thread walks ``sys._current_frames()`` every *interval*
+    seconds and counts each thread's stack in collapsed ("folded") form —
+    ``thread;outer;…;inner count`` — ready for flamegraph.pl or speedscope.
+    No tracing hooks are installed, so the running code is not slowed down
+    beyond the GIL time the sampler itself takes.
+    """
+
+    def __init__(self, interval: float = _DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples  = 0
+
+    def run(self, seconds: float) -> None:
+        me       = threading.get_ident()
+        names    = {t.ident: t.name for t in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                labels: List[str] = []
+                while frame is not None and len(labels) < _MAX_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 5) -> List[Tuple[str, float]]:
+        """Leaf frames with the largest share of samples (self time)."""
+        leaves: Dict[str, int] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaves.values()) or 1
+        return [(name, count / total) for name, count in leaves.most_common(limit)]
+
+
+_running: Optional[SamplingProfiler] = None
+
+
+def _write_folded(profiler: SamplingProfiler) -> str:
+    fd, path = tempfile.mkstemp(prefix=f"profile-{int(time.time())}-", suffix=".folded")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        fh.write(profiler.folded())
+    return path
+
+
+async def profile(seconds: float, interval: float = _DEFAULT_INTERVAL) -> Tuple[str, SamplingProfiler]:
+    """Sample the process for *seconds*; returns (path to .folded file, profiler).
+
+    Only one profile may run at a time. The caller owns the returned file.
+    """
+    global _running
+    if _running is not None:
+        raise RuntimeError("a profile is already running")
+    seconds  = max(1.0, min(float(seconds), MAX_PROFILE_SECONDS))
+    profiler = SamplingProfiler(interval)
+    loop     = asyncio.get_running_loop()
+    _running = profiler
+    try:
+        await loop.run_in_executor(None, profiler.run, seconds)
+    finally:
+        _running = None
+
+    path = await loop.run_in_executor(None, _write_folded, profiler)
+    logger.info("profile: %d samples over %.0fs → %s", profiler.samples, seconds, path)
+    return path, profiler
@@ -0,0 +1,194 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+from config import Config
+from .expiring import ExpiringDict
+from .metrics import Counter, Gauge
+from .shaping import ShapedStream
+
+logger = logging.getLogger(__name__)
+
+_RATE_WINDOW = 1.0
+
+STREAM_ACTIONS = Counter(
+    "flix_stream_actions",
+    "Operator actions taken on live streams.",
+    ["action"],
+)
+
+
+class LiveStream:
+    """One in-flight ``/stream`` or ``/dl`` response as seen by operators."""
+
+    __slots__ = (
+        "id", "file_hash", "file_name", "message_id", "client_ip", "client",
+        "route", "range_from", "range_to", "length", "dc_id", "started",
+        "bytes_sent", "rate", "shaped", "terminated", "wake", "task", "_win_start", "_win_bytes",
+    )
+
+    def __init__(self, stream_id: str, file_hash: str, file_name: str, message_id: str,
+                 client_ip: str, client: str, route: str, range_from: int, range_to: int,
+                 length: int, dc_id: Optional[int], shaped: ShapedStream):
+        self.id          = stream_id
+        self.file_hash   = file_hash
+        self.file_name   = file_name
+        self.message_id  = message_id
+        self.client_ip   = client_ip
+        self.client      = client
+        self.route       = route
+        self.range_from  = range_from
+        self.range_to    = range_to
+        self.length      = length
+        self.dc_id       = dc_id
+        self.started     = time.time()
+        self.bytes_sent  = 0
+        self.rate        = 0.0
+        self.shaped      = shaped
+        self.terminated: Optional[str] = None
+        # Set on throttle / terminate so a shaping wait in progress re-checks both
+        self.wake        = asyncio.Event()
+        self.task        = asyncio.current_task()
+        self._win_start  = time.monotonic()
+        self._win_bytes  = 0
+
+    def add_bytes(self, n: int) -> None:
+        self.bytes_sent += n
+        self._win_bytes += n
+        now     = time.monotonic()
+        elapsed = now - self._win_start
+        if elapsed >= _RATE_WINDOW:
+            self.rate       = self._win_bytes / elapsed
+            self._win_start = now
+            self._win_bytes = 0
+
+    def current_rate(self) -> float:
+        elapsed = time.monotonic() - self._win_start
+        if elapsed > 2 * _RATE_WINDOW:
+            return self._win_bytes / elapsed   # stalled — don't report a stale rate
+        return self.rate
+
+    @property
+    def throttle(self) -> Optional[int]:
+        return self.shaped.override
+
+    def snapshot(self) -> Dict:
+        return {
+            "id":         self.id,
+            "file_hash":  self.file_hash,
+            "file_name":  self.file_name,
+            "client_ip":  self.client_ip,
+            "client":     self.client,
+            "route":      self.route,
+            "range":      [self.range_from, self.range_to],
+            "length":     self.length,
+            "bytes_sent": self.bytes_sent,
+            "rate":       int(self.current_rate()),
+            "throttle":   self.throttle,
+            "dc":         self.dc_id,
+            "age":        round(time.time() - self.started, 1),
+        }
+
+
+class StreamRegistry:
+    """Every live response, with per-stream throttle and terminate controls.
+
+    Throttling sets a rate override on the stream's own shaper bucket, so it
+    stacks with the global / per-IP limits and survives shaper reloads.
+    Terminating sets a flag the write loop checks before and after shaping
+    every chunk; the (file, IP) pair is then refused for
+    ``STREAM_KILL_COOLDOWN`` seconds so the player cannot simply reconnect.
+    Both wake the stream's shaping wait, so a long throttle sleep neither
+    delays a terminate nor outlives a new rate.
+    """
+
+    def __init__(self):
+        self._streams: Dict[str, LiveStream] = {}
+        self._ids      = itertools.count(1)
+        self._blocked: ExpiringDict = ExpiringDict(60)
+
+    def open(self, **fields) -> LiveStream:
+        stream = LiveStream(format(next(self._ids), "x"), **fields)
+        self._streams[stream.id] = stream
+        return stream
+
+    def close(self, stream: LiveStream) -> None:
+        self._streams.pop(stream.id, None)
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def get(self, stream_id: str) -> Optional[LiveStream]:
+        return self._streams.get(stream_id)
+
+    def list(self, file_hash: Optional[str] = None) -> List[LiveStream]:
+        streams = [
+            s for s in self._streams.values()
+            if file_hash is None or s.file_hash == file_hash
+        ]
+        streams.sort(key=lambda s: s.current_rate(), reverse=True)
+        return streams
+
+    def select(self, target: str) -> List[LiveStream]:
+        """Streams matching *target*: a stream id, or a file hash for all its streams."""
+        stream = self._streams.get(target)
+        return [stream] if stream is not None else self.list(target)
+
+    def throttle(self, target: str, rate: Optional[int]) -> int:
+        """Cap matching streams at *rate* bytes/s (``None`` or 0 lifts the cap)."""
+        streams = self.select(target)
+        for stream in streams:
+            stream.shaped.limit(rate or None)
+            stream.wake.set()
+        if streams:
+            STREAM_ACTIONS.labels("throttle" if rate else "unthrottle").inc(len(streams))
+            logger.info("streams throttled: target=%s rate=%s count=%d", target, rate, len(streams))
+        return len(streams)
+
+    def terminate(self, target: str, reason: str = "terminated by operator", block: bool = True,
+                  cancel: bool = False) -> int:
+        """Stop matching streams after their current chunk.
+
+        With *cancel* the response task is cancelled outright instead, which
+        stops an upstream fetch or socket write in progress and the body's
+        Telegram prefetch with it.
+        """
+        streams = self.select(target)
+        for stream in streams:
+            stream.terminated = reason
+            stream.wake.set()
+            if cancel and stream.task is not None and stream.task is not asyncio.current_task():
+                stream.task.cancel()
+            if block:
+                self._blocked.set(
+                    (stream.file_hash, stream.client_ip), True, ttl=Config.STREAM_KILL_COOLDOWN,
+                )
+        if streams:
+            STREAM_ACTIONS.labels("terminate" if block else reason).inc(len(streams))
+            logger.info("streams terminated: target=%s count=%d", target, len(streams))
+        return len(streams)
+
+    def is_blocked(self, file_hash: str, client_ip: str) -> bool:
+        return (file_hash, client_ip) in self._blocked
+
+    def summary(self) -> Dict:
+        streams = self._streams.values()
+        return {
+            "count": len(self._streams),
+            "rate":  int(sum(s.current_rate() for s in streams)),
+        }
+
+    def snapshot(self, limit: int = 50) -> Dict:
+        streams = self.list()
+        return {
+            "count":   len(streams),
+            "rate":    int(sum(s.current_rate() for s in streams)),
+            "streams": [s.snapshot() for s in streams[:limit]],
+        }
+
+
+stream_registry = StreamRegistry()
+
+Gauge("flix_live_streams", "Responses currently streaming.", func=lambda: len(stream_registry))
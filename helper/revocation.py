@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from config import Config
+from .expiring import ExpiringDict
+from .metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Tombstones are read back with this much overlap so a node whose clock
+# runs a little behind the writer's still sees every revocation once.
+_POLL_OVERLAP = timedelta(seconds=30)
+_TOMBSTONE_BATCH = 1000
+
+REVOCATIONS = Counter(
+    "flix_revocations",
+    "Revocation events applied on this node.",
+    ["origin"],
+)
+
+
+class Revocation:
+    """One revoke action: specific files, or everything (``revokeall``)."""
+
+    __slots__ = ("file_hashes", "message_ids", "everything", "origin")
+
+    def __init__(self, file_hashes: Iterable[str] = (), message_ids: Iterable[str] = (),
+                 everything: bool = False, origin: str = "local"):
+        self.file_hashes = tuple(file_hashes)
+        self.message_ids = tuple(str(m) for m in message_ids)
+        self.everything  = everything
+        self.origin      = origin
+
+
+class RevocationBus:
+    """Propagate revocations to caches, live streams and other nodes.
+
+    :meth:`revoke` applies the event in-process right away — listeners
+    evict cached metadata / FileIds and stop running streams — then writes a
+    tombstone to Mongo. Every node polls the tombstone collection and
+    applies events written by the others. Revoked hashes also go on a
+    short-lived denylist that the stream path checks before touching any
+    cache, closing the window between the DB delete and cache eviction.
+    """
+
+    def __init__(self):
+        self.node_id   = uuid.uuid4().hex[:12]
+        self._denied: ExpiringDict = ExpiringDict(Config.REVOCATION_DENY_TTL)
+        self._seen:   ExpiringDict = ExpiringDict(_POLL_OVERLAP.total_seconds() * 4)
+        self._listeners: List[Callable[[Revocation], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._db       = None
+        self._since    = datetime.utcnow()
+
+    def subscribe(self, listener: Callable[[Revocation], None]) -> None:
+        self._listeners.append(listener)
+
+    def is_revoked(self, file_hash: str) -> bool:
+        return file_hash in self._denied
+
+    def apply(self, event: Revocation) -> None:
+        for file_hash in event.file_hashes:
+            self._denied.set(file_hash, True)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as exc:
+                logger.error("revocation listener error: %s", exc)
+        REVOCATIONS.labels(event.origin).inc()
+        logger.info(
+            "revocation applied: origin=%s files=%d all=%s",
+            event.origin, len(event.file_hashes), event.everything,
+        )
+
+    async def revoke(self, file_hashes: Iterable[str] = (), message_ids: Iterable[str] = (),
+                     everything: bool = False) -> None:
+        event = Revocation(file_hashes, message_ids, everything)
+        self.apply(event)
+        if self._db is None:
+            return
+        try:
+            for hashes, mids in self._batches(event):
+                await self._db.add_revocation(self.node_id, hashes, mids, event.everything)
+        except Exception as exc:
+            logger.error("revocation tombstone write failed: %s", exc)
+
+    @staticmethod
+    def _batches(event: Revocation) -> Iterable[Tuple[List[str], List[str]]]:
+        if event.everything or not event.file_hashes:
+            yield list(event.file_hashes), list(event.message_ids)
+            return
+        for i in range(0, len(event.file_hashes), _TOMBSTONE_BATCH):
+            yield (
+                list(event.file_hashes[i:i + _TOMBSTONE_BATCH]),
+                list(event.message_ids[i:i + _TOMBSTONE_BATCH]),
+            )
+
+    # ── cross-node propagation ──────────────────────────────────────────────
+
+    def start(self, db) -> None:
+        self._db    = db
+        self._since = datetime.utcnow()
+        if Config.REVOCATION_POLL_INTERVAL > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._poll())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll(self) -> None:
+        while True:
+            try:
+                await asyncio.sleep(Config.REVOCATION_POLL_INTERVAL)
+                await self.poll_once()
+            except asyncio.CancelledError:
+                break
+            except Exception as exc:
+                logger.error("revocation poll error: %s", exc)
+
+    async def poll_once(self) -> int:
+        applied = 0
+        for doc in await self._db.get_revocations(self._since - _POLL_OVERLAP):
+            self._since = max(self._since, doc["revoked_at"])
+            key = str(doc["_id"])
+            if doc.get("node") == self.node_id or key in self._seen:
+                continue
+            self._seen.set(key, True)
+            self.apply(Revocation(
+                doc.get("file_hashes", ()), doc.get("message_ids", ()),
+                bool(doc.get("everything")), origin="remote",
+            ))
+            applied += 1
+        return applied
+
+
+revocation_bus = RevocationBus()
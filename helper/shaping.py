@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Never let /dl traffic starve completely, even when every byte of the
+# global budget is reserved for /stream viewers.
+_MIN_DL_RATE = 64 * 1024
+
+
+class TokenBucket:
+    """Debt-based token bucket: a reservation always succeeds and returns the wait."""
+
+    __slots__ = ("rate", "burst", "_tokens", "_stamp")
+
+    def __init__(self, rate: float = 0.0):
+        self.rate    = 0.0
+        self.burst   = 0.0
+        self._tokens = 0.0
+        self._stamp  = time.monotonic()
+        self.set_rate(rate)
+        self._tokens = self.burst
+
+    def set_rate(self, rate: float) -> None:
+        rate = max(0.0, float(rate or 0))
+        if rate == self.rate:
+            return
+        self._refill(time.monotonic())
+        self.rate    = rate
+        self.burst   = rate          # one second worth of tokens
+        self._tokens = min(self._tokens, self.burst) if self._tokens > 0 else self._tokens
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def reserve(self, n: int) -> float:
+        """Debit *n* bytes and return how long the caller must wait (seconds)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        self._tokens -= n
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def wait(self) -> float:
+        """Seconds until the current debt is repaid at the current rate."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+
+class ShapedStream:
+    """Per-response handle returned by :meth:`EgressShaper.open`."""
+
+    __slots__ = ("shaper", "client_ip", "is_download", "bucket", "override", "_deadline")
+
+    def __init__(self, shaper: "EgressShaper", client_ip: str, is_download: bool):
+        self.shaper      = shaper
+        self.client_ip   = client_ip
+        self.is_download = is_download
+        self.bucket      = TokenBucket(shaper.stream_limit)
+        self.override: Optional[int] = None
+        self._deadline   = 0.0   # when the shared (global / dl / IP) buckets are repaid
+
+    def limit(self, rate: Optional[int]) -> None:
+        """Pin this stream to *rate* bytes/s regardless of ``stream_egress_limit``;
+        ``None`` goes back to the configured per-stream limit."""
+        self.override = int(rate) if rate else None
+        self.bucket.set_rate(self.override or self.shaper.stream_limit)
+
+    async def throttle(self, n: int, wake: Optional[asyncio.Event] = None) -> bool:
+        """Debit *n* bytes from every bucket that applies and wait out the debt.
+
+        With *wake* the wait is interruptible: setting the event makes this
+        return False at once. Calling again with ``n=0`` waits out what is
+        still owed, with the stream's own share recomputed at its current
+        rate — so a throttle change applies to a wait already in progress.
+        Returns True once the bytes may be sent.
+        """
+        shaper = self.shaper
+        if n:
+            if not shaper.enabled and self.bucket.rate <= 0:
+                return True
+            self.bucket.reserve(n)
+            delay = shaper.global_bucket.reserve(n)
+            if self.is_download:
+                delay = max(delay, shaper.dl_bucket.reserve(n))
+            ip_bucket = shaper.ip_buckets.get(self.client_ip)
+            if ip_bucket is not None:
+                delay = max(delay, ip_bucket.reserve(n))
+            if delay > 0:
+                self._deadline = max(self._deadline, time.monotonic() + delay)
+        while True:
+            delay = max(self._deadline - time.monotonic(), self.bucket.wait())
+            if delay <= 0:
+                return True
+            if wake is None:
+                await asyncio.sleep(delay)
+                continue
+            try:
+                await asyncio.wait_for(wake.wait(), delay)
+            except asyncio.TimeoutError:
+                continue
+            wake.clear()
+            return False
+
+
+class EgressShaper:
+    """Token-bucket egress shaping at global, per-IP and per-stream level.
+
+    ``/stream`` viewers are guaranteed ``stream_floor`` bytes/s each: ``/dl``
+    traffic is additionally capped at whatever the global limit leaves after
+    that reservation, so downloads only ever use the spare capacity.
+
+    Limits are read from :class:`Config` only by :meth:`reload` (at startup
+    and when an admin changes them); ``open`` / ``close`` just adjust the
+    viewer count and re-split the reservation, so they stay O(1).
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket()
+        self.dl_bucket     = TokenBucket()
+        self.ip_buckets:  Dict[str, TokenBucket] = {}
+        self._ip_refs:    Dict[str, int]         = {}
+        self._streams:    Set[ShapedStream]      = set()
+        self._viewers     = 0
+        self.global_limit = 0
+        self.ip_limit     = 0
+        self.stream_limit = 0
+        self.stream_floor = 0
+        self.enabled      = False
+
+    def reload(self) -> None:
+        """Re-read limits from :class:`Config` and apply them to live streams."""
+        self.global_limit = int(Config.get("egress_limit", 0) or 0)
+        self.ip_limit     = int(Config.get("ip_egress_limit", 0) or 0)
+        self.stream_limit = int(Config.get("stream_egress_limit", 0) or 0)
+        self.stream_floor = int(Config.get("stream_floor", 0) or 0)
+        self.enabled      = bool(self.global_limit or self.ip_limit)
+
+        self.global_bucket.set_rate(self.global_limit)
+        if self.ip_limit:
+            for ip in self._ip_refs:
+                self.ip_buckets.setdefault(ip, TokenBucket(self.ip_limit))
+        else:
+            self.ip_buckets.clear()
+        for bucket in self.ip_buckets.values():
+            bucket.set_rate(self.ip_limit)
+        for stream in self._streams:
+            stream.bucket.set_rate(stream.override or self.stream_limit)
+        self._update_dl_rate()
+
+    def _update_dl_rate(self) -> None:
+        if not self.global_limit:
+            self.dl_bucket.set_rate(0)
+            return
+        reserved = min(self.global_limit, self.stream_floor * self._viewers)
+        self.dl_bucket.set_rate(max(_MIN_DL_RATE, self.global_limit - reserved))
+
+    def open(self, client_ip: str, is_download: bool) -> ShapedStream:
+        stream = ShapedStream(self, client_ip, is_download)
+        self._streams.add(stream)
+        if self.ip_limit and client_ip not in self.ip_buckets:
+            self.ip_buckets[client_ip] = TokenBucket(self.ip_limit)
+        self._ip_refs[client_ip] = self._ip_refs.get(client_ip, 0) + 1
+        if not is_download:
+            self._viewers += 1
+            self._update_dl_rate()
+        return stream
+
+    def close(self, stream: Optional[ShapedStream]) -> None:
+        if stream is None or stream not in self._streams:
+            return
+        self._streams.discard(stream)
+        refs = self._ip_refs.get(stream.client_ip, 1) - 1
+        if refs <= 0:
+            self._ip_refs.pop(stream.client_ip, None)
+            self.ip_buckets.pop(stream.client_ip, None)
+        else:
+            self._ip_refs[stream.client_ip] = refs
+        if not stream.is_download:
+            self._viewers = max(0, self._viewers - 1)
+            self._update_dl_rate()
+
+    def snapshot(self) -> dict:
+        return {
+            "global_limit": self.global_limit,
+            "ip_limit":     self.ip_limit,
+            "stream_limit": self.stream_limit,
+            "stream_floor": self.stream_floor,
+            "dl_rate":      int(self.dl_bucket.rate),
+            "viewers":      self._viewers,
+            "streams":      len(self._streams),
+        }
+
+
+egress_shaper = EgressShaper()
@@ -3,7 +3,9 @@ import logging
 import mimetypes
 import math
 import time
-from typing import Dict, Optional, Set, Tuple, Union
+import uuid
+import weakref
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from aiohttp import web
 from pyrogram import Client, utils, raw
@@ -12,7 +14,18 @@ from pyrogram.file_id import FileId, FileType, ThumbnailSource
 from pyrogram.session import Auth, Session
 
 from config import Config
-from database import Database
+from database import Database, FileRecord
+from .expiring import ExpiringDict
+from .metrics import (
+    BYTES_SERVED, CACHE_REQUESTS, FLOODWAIT_SECONDS, GETFILE_LATENCY,
+    GETFILE_RETRIES, QUEUE_DEPTH, STREAM_TTFB, STREAMS_FINISHED, Gauge,
+)
+from .shaping import egress_shaper
+from .registry import stream_registry
+from .accounting import QUOTA_REJECTS, ServedRanges, bandwidth_accountant
+from .revocation import Revocation, revocation_bus
+from . import tracing
+from .chaos import maybe_wrap
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +38,7 @@ _RETRY_BACKOFF = 0.1              # faster retry backoff
 _RPC_TIMEOUT = 10.0
 _FILE_CACHE_TTL = 5 * 60          # 5 minutes inactivity TTL
 _SEEK_INITIAL_SIZE = 64 * 1024    # 64 KB initial slice on seek
+_MAX_RANGES = 16                  # coalesced ranges honoured per request
 
 MIME_TYPE_MAP = {
     "video":    "video/mp4",
@@ -70,18 +84,17 @@ _BROWSER_NATIVE_AUDIO = {
 }
 
 # Session tracking: session_key → last-heartbeat timestamp
-_active_sessions: Dict[str, float] = {}
-_sessions_lock = asyncio.Lock()
 _SESSION_TTL = 30
+_active_sessions: ExpiringDict[str, float] = ExpiringDict(_SESSION_TTL)
 _SESSION_HEARTBEAT_INTERVAL = 5
 
-# Bandwidth dedup
-_bw_tracked: Dict[Tuple[str, str, int], float] = {}
-_bw_lock = asyncio.Lock()
-_BW_DEDUP_TTL = 60
+# Bandwidth dedup: byte ranges already billed per (client IP, message)
+_served_ranges = ServedRanges(Config.BW_DEDUP_TTL)
+# A running response re-checks its owner's quota every this many chunks
+_QUOTA_CHECK_CHUNKS = 16
 
 # Per-file metadata cache
-_file_meta_cache:  Dict[str, dict]  = {}
+_file_meta_cache:  Dict[str, FileRecord] = {}
 _file_cache_atime: Dict[str, float] = {}
 _cache_lock = asyncio.Lock()
 
@@ -89,6 +102,40 @@ _cache_lock = asyncio.Lock()
 _thumbnail_cache:  Dict[str, Optional[str]] = {}
 _thumb_cache_atime: Dict[str, float] = {}
 
+# Bytes currently parked in yield_file prefetch queues (all streams)
+_buffered_bytes = 0
+
+# Per-DC GetFile health: dc_id → (failure-rate EWMA, last update)
+_dc_health: Dict[int, Tuple[float, float]] = {}
+_DC_HEALTH_ALPHA     = 0.2
+_DC_HEALTH_HALF_LIFE = 30.0
+
+
+def get_buffered_bytes() -> int:
+    return _buffered_bytes
+
+
+def _record_dc_result(dc_id: int, ok: bool) -> None:
+    rate = get_dc_error_rate(dc_id)
+    _dc_health[dc_id] = (rate + _DC_HEALTH_ALPHA * ((0.0 if ok else 1.0) - rate), time.monotonic())
+
+
+def get_dc_error_rate(dc_id: int) -> float:
+    """Recent GetFile failure rate for *dc_id*, decaying towards 0 while idle."""
+    entry = _dc_health.get(dc_id)
+    if entry is None:
+        return 0.0
+    rate, stamp = entry
+    return rate * 0.5 ** ((time.monotonic() - stamp) / _DC_HEALTH_HALF_LIFE)
+
+
+def get_dc_health() -> Dict[int, float]:
+    return {dc: round(get_dc_error_rate(dc), 3) for dc in _dc_health}
+
+
+Gauge("flix_buffered_bytes", "Bytes parked in prefetch queues.", func=get_buffered_bytes)
+Gauge("flix_dc_error_rate", "Recent GetFile failure rate per DC.", ["dc"], func=get_dc_health)
+
 
 def _mime_for_filename(file_name: str, fallback: str) -> str:
     ext = "." + file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
@@ -132,7 +179,7 @@ async def get_file_ids(client: Client, message_id: str) -> FileId:
 async def get_thumbnail_url(
     client: Client,
     file_hash: str,
-    file_data: dict,
+    file_data: FileRecord,
     base_url: str,
 ) -> Optional[str]:
     """Return a publicly-accessible thumbnail URL for external player artwork metadata.
@@ -143,11 +190,13 @@ async def get_thumbnail_url(
 
     # Return cached result (including None → no thumbnail)
     if file_hash in _thumbnail_cache:
+        CACHE_REQUESTS.labels("thumbnail", "hit").inc()
         _thumb_cache_atime[file_hash] = now
         return _thumbnail_cache[file_hash]
+    CACHE_REQUESTS.labels("thumbnail", "miss").inc()
 
     # Only attempt for video / audio files
-    file_type = file_data.get("file_type", "document")
+    file_type = file_data.file_type
     if file_type not in (
         Config.FILE_TYPE_VIDEO, Config.FILE_TYPE_AUDIO, "video", "audio"
     ):
@@ -157,7 +206,7 @@ async def get_thumbnail_url(
 
     try:
         msg = await client.get_messages(
-            Config.FLOG_CHAT_ID, int(file_data["message_id"])
+            Config.FLOG_CHAT_ID, int(file_data.message_id)
         )
         if not msg or msg.empty:
             _thumbnail_cache[file_hash] = None
@@ -219,12 +268,74 @@ async def _evict_stale_file_cache() -> None:
         )
 
 
+_streamers: "weakref.WeakSet[ByteStreamer]" = weakref.WeakSet()
+
+# Bumped on every eviction below, so a metadata lookup that was already in
+# flight when a file was revoked cannot put the revoked document back.
+_cache_generation = 0
+
+
+def evict_files(file_hashes: Iterable[str] = (), message_ids: Iterable[str] = ()) -> None:
+    """Drop every cached trace of the given files (metadata, thumbnail, FileId)."""
+    global _cache_generation
+    _cache_generation += 1
+    for file_hash in file_hashes:
+        _file_meta_cache.pop(file_hash, None)
+        _file_cache_atime.pop(file_hash, None)
+        _thumbnail_cache.pop(file_hash, None)
+        _thumb_cache_atime.pop(file_hash, None)
+    for message_id in message_ids:
+        for streamer in list(_streamers):
+            streamer.cached_file_ids.pop(str(message_id), None)
+
+
+def evict_all_files() -> None:
+    global _cache_generation
+    _cache_generation += 1
+    _file_meta_cache.clear()
+    _file_cache_atime.clear()
+    _thumbnail_cache.clear()
+    _thumb_cache_atime.clear()
+    for streamer in list(_streamers):
+        streamer.cached_file_ids.clear()
+
+
+def _on_revoked(event: Revocation) -> None:
+    if event.everything:
+        evict_all_files()
+        targets = [s.id for s in stream_registry.list()]
+    else:
+        evict_files(event.file_hashes, event.message_ids)
+        targets = event.file_hashes
+    for target in targets:
+        stream_registry.terminate(target, reason="revoked", block=False, cancel=True)
+
+
+revocation_bus.subscribe(_on_revoked)
+
+
+def get_caches() -> Dict[str, object]:
+    """Every in-process cache owned by the streaming engine, by name."""
+    caches: Dict[str, object] = {
+        "file_meta":       _file_meta_cache,
+        "file_meta_atime": _file_cache_atime,
+        "thumbnail":       _thumbnail_cache,
+        "thumbnail_atime": _thumb_cache_atime,
+        "sessions":        _active_sessions,
+        "bw_dedup":        _served_ranges.viewers,
+    }
+    for idx, streamer in enumerate(list(_streamers)):
+        caches[f"file_ids[{idx}]"] = streamer.cached_file_ids
+    return caches
+
+
 class ByteStreamer:
 
     def __init__(self, client: Client):
         self.client: Client = client
         self.cached_file_ids: Dict[str, FileId] = {}
         self._background_tasks: Set[asyncio.Task] = set()
+        _streamers.add(self)
         # Periodic cache cleaner: runs every 2 minutes to evict stale entries
         self._start_background_task(self._cache_cleaner())
 
@@ -235,21 +346,28 @@ class ByteStreamer:
         return task
 
     async def get_file_properties(self, db_id: str) -> FileId:
-        if db_id not in self.cached_file_ids:
+        if db_id in self.cached_file_ids:
+            CACHE_REQUESTS.labels("file_id", "hit").inc()
+        else:
+            CACHE_REQUESTS.labels("file_id", "miss").inc()
             logger.debug("FileId cache miss for %s — fetching from Telegram", db_id)
             await self.generate_file_properties(db_id)
         return self.cached_file_ids[db_id]
 
     async def generate_file_properties(self, db_id: str) -> FileId:
-        file_id = await get_file_ids(self.client, db_id)
+        with tracing.span("tg.get_messages", message_id=db_id):
+            file_id = await get_file_ids(self.client, db_id)
         logger.debug("Decoded FileId for message %s  dc=%s", db_id, file_id.dc_id)
         self.cached_file_ids[db_id] = file_id
         return file_id
 
     async def generate_media_session(self, client: Client, file_id: FileId) -> Session:
         media_session = client.media_sessions.get(file_id.dc_id)
+        if media_session is not None:
+            logger.debug("Reusing cached media session for DC %s", file_id.dc_id)
+            return media_session
 
-        if media_session is None:
+        with tracing.span("tg.media_session", dc=file_id.dc_id):
             if file_id.dc_id != await client.storage.dc_id():
                 media_session = Session(
                     client,
@@ -293,12 +411,11 @@ class ByteStreamer:
                 )
                 await media_session.start()
 
+
             logger.debug("Created media session for DC %s", file_id.dc_id)
+            media_session = maybe_wrap(media_session)
             client.media_sessions[file_id.dc_id] = media_session
 
-        else:
-            logger.debug("Reusing cached media session for DC %s", file_id.dc_id)
-
         return media_session
 
     @staticmethod
@@ -368,25 +485,41 @@ class ByteStreamer:
         queue: asyncio.Queue = asyncio.Queue(maxsize=PREFETCH_COUNT + 4)
         fetch_task: asyncio.Task | None = None
 
+        # Metric children resolved once per stream, not per chunk
+        dc_id         = file_id.dc_id
+        latency_hist  = GETFILE_LATENCY.labels(dc_id)
+        floodwait_sec = FLOODWAIT_SECONDS.labels(dc_id)
+
         async def _fetch_worker():
+            global _buffered_bytes
             current_offset = offset
             for part_idx in range(part_count):
                 for attempt in range(_MAX_CHUNK_RETRIES):
                     try:
-                        r = await asyncio.wait_for(
-                            media_session.invoke(
-                                raw.functions.upload.GetFile(
-                                    location=location,
-                                    offset=current_offset,
-                                    limit=chunk_size,
-                                )
-                            ),
-                            timeout=_RPC_TIMEOUT,
-                        )
+                        started = time.monotonic()
+                        with tracing.span(
+                            "tg.getfile", dc=dc_id, part=part_idx,
+                            offset=current_offset, attempt=attempt,
+                        ):
+                            r = await asyncio.wait_for(
+                                media_session.invoke(
+                                    raw.functions.upload.GetFile(
+                                        location=location,
+                                        offset=current_offset,
+                                        limit=chunk_size,
+                                    )
+                                ),
+                                timeout=_RPC_TIMEOUT,
+                            )
+                        latency_hist.observe(time.monotonic() - started)
+                        _record_dc_result(dc_id, True)
                         break
                     except asyncio.CancelledError:
                         return
                     except FloodWait as fw:
+                        _record_dc_result(dc_id, False)
+                        GETFILE_RETRIES.labels(dc_id, "floodwait").inc()
+                        floodwait_sec.inc(fw.value + 1)
                         logger.warning(
                             "FloodWait %ds on part %d/%d — sleeping",
                             fw.value, part_idx + 1, part_count,
@@ -397,6 +530,8 @@ class ByteStreamer:
                             return
                         continue
                     except asyncio.TimeoutError:
+                        _record_dc_result(dc_id, False)
+                        GETFILE_RETRIES.labels(dc_id, "timeout").inc()
                         logger.debug(
                             "Timeout on part %d (attempt %d)", part_idx + 1, attempt + 1
                         )
@@ -409,6 +544,8 @@ class ByteStreamer:
                             return
                         continue
                     except (AttributeError, ConnectionError, OSError) as exc:
+                        _record_dc_result(dc_id, False)
+                        GETFILE_RETRIES.labels(dc_id, "transient").inc()
                         logger.debug("Transient error part %d: %s", part_idx + 1, exc)
                         if attempt == _MAX_CHUNK_RETRIES - 1:
                             await queue.put(exc)
@@ -459,6 +596,7 @@ class ByteStreamer:
                     await queue.put(sliced)
                 except asyncio.CancelledError:
                     return
+                _buffered_bytes += len(sliced)
 
                 current_offset += chunk_size
 
@@ -471,9 +609,11 @@ class ByteStreamer:
         self._background_tasks.add(fetch_task)
         fetch_task.add_done_callback(self._background_tasks.discard)
 
+        global _buffered_bytes
         parts_yielded = 0
         try:
             while True:
+                QUEUE_DEPTH.observe(queue.qsize())
                 try:
                     item = await asyncio.wait_for(queue.get(), timeout=_RPC_TIMEOUT + 5)
                 except asyncio.TimeoutError:
@@ -488,6 +628,7 @@ class ByteStreamer:
                 if isinstance(item, BaseException):
                     logger.error("yield_file: fetch error: %s", item)
                     break
+                _buffered_bytes -= len(item)
                 yield item
                 parts_yielded += 1
 
@@ -506,6 +647,10 @@ class ByteStreamer:
                     await fetch_task
                 except (asyncio.CancelledError, Exception):
                     pass
+            while not queue.empty():
+                leftover = queue.get_nowait()
+                if isinstance(leftover, (bytes, bytearray)):
+                    _buffered_bytes -= len(leftover)
             logger.debug("yield_file finished after %d part(s)", parts_yielded)
 
     async def _cache_cleaner(self) -> None:
@@ -532,24 +677,138 @@ class ByteStreamer:
                 logger.error("ByteStreamer._cache_cleaner error: %s", exc)
 
 
-def _parse_range(range_header: str, file_size: int):
-    """Parse HTTP Range header and return (from_bytes, until_bytes)."""
-    if range_header:
-        try:
-            raw_range   = range_header.replace("bytes=", "").split(",")[0].strip()
-            start_str, end_str = raw_range.split("-")
-            from_bytes  = int(start_str) if start_str else 0
-            until_bytes = int(end_str)   if end_str   else file_size - 1
-        except (ValueError, AttributeError):
-            from_bytes  = 0
-            until_bytes = file_size - 1
-    else:
-        from_bytes  = 0
-        until_bytes = file_size - 1
+def _parse_range(
+    range_header: str,
+    file_size: int,
+) -> Optional[List[Tuple[int, int]]]:
+    """Parse an RFC 7233 ``Range`` header into sorted, coalesced (start, end) pairs.
+
+    Returns None when the header is absent, malformed or not worth honouring
+    (serve the whole file with 200), and an empty list when none of the
+    requested ranges is satisfiable (416).
+    """
+    if not range_header or file_size <= 0:
+        return None
+
+    unit, sep, spec = range_header.partition("=")
+    if not sep or unit.strip().lower() != "bytes":
+        return None
+
+    ranges: List[Tuple[int, int]] = []
+    saw_spec = False
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        saw_spec = True
+        start_str, dash, end_str = part.partition("-")
+        start_str, end_str = start_str.strip(), end_str.strip()
+        if not dash or (start_str and not start_str.isdigit()) or (end_str and not end_str.isdigit()):
+            return None
+
+        if not start_str:
+            # Suffix range: "bytes=-500" → the final 500 bytes
+            if not end_str:
+                return None
+            suffix = int(end_str)
+            if suffix == 0:
+                continue
+            ranges.append((max(0, file_size - suffix), file_size - 1))
+            continue
+
+        from_bytes  = int(start_str)
+        until_bytes = int(end_str) if end_str else file_size - 1
+        if end_str and until_bytes < from_bytes:
+            # Syntactically invalid spec — the whole header must be ignored
+            return None
+        if from_bytes >= file_size:
+            continue
+        ranges.append((from_bytes, min(until_bytes, file_size - 1)))
+
+    if not saw_spec:
+        return None
+
+    ranges = _coalesce_ranges(ranges)
+    if len(ranges) > _MAX_RANGES:
+        logger.debug("range header with %d ranges ignored", len(ranges))
+        return None
+    return ranges
+
+
+def _coalesce_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping and adjacent byte ranges."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
 
-    from_bytes  = max(0, from_bytes)
-    until_bytes = min(until_bytes, file_size - 1)
-    return from_bytes, until_bytes
+
+def _plan_chunk_spans(
+    ranges: List[Tuple[int, int]],
+    chunk_size: int,
+) -> List[Tuple[int, int, List[Tuple[int, int]]]]:
+    """Group ranges into contiguous GetFile spans of (first_chunk, part_count, ranges).
+
+    Ranges whose chunk footprints overlap or touch share one span, so a chunk
+    needed by several ranges is fetched from Telegram exactly once.
+    """
+    spans: List[Tuple[int, int, List[Tuple[int, int]]]] = []
+    for start, end in ranges:
+        first_chunk = start // chunk_size
+        last_chunk  = end // chunk_size
+        if spans:
+            span_first, span_count, span_ranges = spans[-1]
+            span_last = span_first + span_count - 1
+            if first_chunk <= span_last + 1:
+                span_ranges.append((start, end))
+                spans[-1] = (
+                    span_first,
+                    max(span_last, last_chunk) - span_first + 1,
+                    span_ranges,
+                )
+                continue
+        spans.append((first_chunk, last_chunk - first_chunk + 1, [(start, end)]))
+    return spans
+
+
+def _multipart_part_header(
+    boundary: str,
+    mime: str,
+    start: int,
+    end: int,
+    file_size: int,
+) -> bytes:
+    return (
+        f"\r\n--{boundary}\r\n"
+        f"Content-Type: {mime}\r\n"
+        f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+    ).encode()
+
+
+def _served_spans(
+    ranges: List[Tuple[int, int]],
+    part_heads: Optional[List[bytes]],
+    body_bytes: int,
+) -> List[Tuple[int, int]]:
+    """File byte spans ``[start, end)`` covered by the first *body_bytes* of a response.
+
+    For multipart bodies the per-part headers are skipped, so only file
+    bytes are attributed to the viewer.
+    """
+    spans: List[Tuple[int, int]] = []
+    left = body_bytes
+    for idx, (start, end) in enumerate(ranges):
+        if part_heads is not None:
+            left -= len(part_heads[idx])
+        if left <= 0:
+            break
+        take = min(left, end - start + 1)
+        spans.append((start, start + take))
+        left -= take
+    return spans
 
 
 def _get_client_ip(request: web.Request) -> str:
@@ -560,53 +819,28 @@ def _get_client_ip(request: web.Request) -> str:
 
 
 async def _register_session(session_key: str) -> bool:
-    async with _sessions_lock:
-        _prune_stale_sessions()
-        is_new = session_key not in _active_sessions
-        _active_sessions[session_key] = time.monotonic()
-        return is_new
+    is_new = session_key not in _active_sessions
+    _active_sessions.set(session_key, time.monotonic())
+    return is_new
 
 
 async def _unregister_session(session_key: str) -> None:
-    async with _sessions_lock:
-        _active_sessions.pop(session_key, None)
+    _active_sessions.pop(session_key, None)
 
 
 async def _heartbeat_session(session_key: str) -> None:
-    async with _sessions_lock:
-        if session_key in _active_sessions:
-            _active_sessions[session_key] = time.monotonic()
+    _active_sessions.touch(session_key, time.monotonic())
 
 
-def _prune_stale_sessions() -> None:
-    now = time.monotonic()
-    stale = [k for k, ts in _active_sessions.items() if now - ts > _SESSION_TTL]
-    for k in stale:
-        del _active_sessions[k]
+def is_session_active(session_key: str) -> bool:
+    return session_key in _active_sessions
 
 
 def get_active_session_count() -> int:
-    _prune_stale_sessions()
     return len(_active_sessions)
 
 
-async def _should_track_bandwidth(
-    client_ip: str,
-    message_id: str,
-    from_bytes: int,
-) -> bool:
-    key = (client_ip, message_id, from_bytes)
-    now = time.monotonic()
-    async with _bw_lock:
-        expired = [k for k, exp in _bw_tracked.items() if now > exp]
-        for k in expired:
-            del _bw_tracked[k]
-
-        if key in _bw_tracked:
-            return False
-
-        _bw_tracked[key] = now + _BW_DEDUP_TTL
-        return True
+Gauge("flix_active_sessions", "Unique (file, ip) streaming sessions.", func=get_active_session_count)
 
 
 class StreamingService:
@@ -616,6 +850,54 @@ class StreamingService:
         self.db       = db
         self.streamer = ByteStreamer(bot_client)
 
+    def peek_dc(self, file_hash: str) -> Optional[int]:
+        """DC of *file_hash* if it is already cached — never does any I/O."""
+        file_data = _file_meta_cache.get(file_hash)
+        if file_data is None:
+            return None
+        file_id = self.streamer.cached_file_ids.get(file_data.message_id)
+        return file_id.dc_id if file_id is not None else None
+
+    async def _iter_multipart(
+        self,
+        file_id: FileId,
+        ranges: List[Tuple[int, int]],
+        part_heads: List[bytes],
+        closing: bytes,
+    ) -> AsyncIterator[bytes]:
+        """Yield a multipart/byteranges body, fetching each shared chunk once."""
+        range_idx = 0
+        for first_chunk, part_count, span_ranges in _plan_chunk_spans(ranges, CHUNK_SIZE):
+            pos    = first_chunk * CHUNK_SIZE
+            chunks = self.streamer.yield_file(
+                file_id, pos, 0, CHUNK_SIZE, part_count, CHUNK_SIZE
+            )
+            span_idx = 0
+            try:
+                async for chunk in chunks:
+                    chunk_end = pos + len(chunk)
+                    while span_idx < len(span_ranges):
+                        start, end = span_ranges[span_idx]
+                        if start >= chunk_end:
+                            break
+                        if start >= pos:
+                            yield part_heads[range_idx]
+                        lo = max(start, pos)
+                        hi = min(end + 1, chunk_end)
+                        yield chunk[lo - pos:hi - pos]
+                        if hi <= end:
+                            break
+                        span_idx  += 1
+                        range_idx += 1
+                    pos = chunk_end
+            finally:
+                await chunks.aclose()
+
+            if span_idx < len(span_ranges):
+                # Upstream ended early; stop rather than emit a corrupt body
+                return
+        yield closing
+
     async def stream_file(
         self,
         request: web.Request,
@@ -624,32 +906,48 @@ class StreamingService:
     ) -> web.StreamResponse:
         """Handle an HTTP streaming request with efficient range support."""
         range_header     = request.headers.get("Range", "")
-        is_range_request = bool(range_header)
         client_ip        = _get_client_ip(request)
         now              = time.monotonic()
+        started          = now
+
+        if revocation_bus.is_revoked(file_hash):
+            raise web.HTTPNotFound(reason="file revoked")
+        if stream_registry.is_blocked(file_hash, client_ip):
+            raise web.HTTPForbidden(reason="stream terminated by operator")
 
         async with _cache_lock:
             file_data = _file_meta_cache.get(file_hash)
             if file_data is not None:
                 _file_cache_atime[file_hash] = now  # refresh access time
 
+        CACHE_REQUESTS.labels("file_meta", "miss" if file_data is None else "hit").inc()
         if file_data is None:
-            file_data = await self.db.get_file_by_hash(file_hash)
-            if not file_data:
+            generation = _cache_generation
+            with tracing.span("db.get_file_record"):
+                file_data = await self.db.get_file_record(file_hash)
+            if file_data is None:
                 raise web.HTTPNotFound(reason="file not found")
+            if generation != _cache_generation and revocation_bus.is_revoked(file_hash):
+                raise web.HTTPNotFound(reason="file revoked")
             async with _cache_lock:
-                _file_meta_cache[file_hash]  = file_data
-                _file_cache_atime[file_hash] = now
+                if generation == _cache_generation:
+                    _file_meta_cache[file_hash]  = file_data
+                    _file_cache_atime[file_hash] = now
 
         if Config.get("bandwidth_mode", True):
-            stats  = await self.db.get_bandwidth_stats()
+            exceeded = bandwidth_accountant.over_quota(file_data.user_id)
+            if exceeded:
+                QUOTA_REJECTS.labels(exceeded).inc()
+                raise web.HTTPServiceUnavailable(reason=f"{exceeded} bandwidth quota exceeded")
+            with tracing.span("db.get_bandwidth_stats"):
+                stats = await self.db.get_bandwidth_stats()
             max_bw = Config.get("max_bandwidth", 107374182400)
             if max_bw and stats["total_bandwidth"] >= max_bw:
                 raise web.HTTPServiceUnavailable(reason="bandwidth limit exceeded")
 
-        file_size  = int(file_data["file_size"])
-        file_name  = file_data["file_name"]
-        message_id = str(file_data["message_id"])
+        file_size  = file_data.file_size
+        file_name  = file_data.file_name
+        message_id = file_data.message_id
 
         try:
             file_id = await self.streamer.get_file_properties(message_id)
@@ -661,34 +959,25 @@ class StreamingService:
             logger.error("get_file_properties failed: msg=%s err=%s", message_id, exc)
             raise web.HTTPNotFound(reason="could not resolve file on Telegram")
 
-        from_bytes, until_bytes = _parse_range(range_header, file_size)
+        ranges = _parse_range(range_header, file_size)
 
-        if from_bytes > until_bytes or from_bytes >= file_size:
+        if ranges is not None and not ranges:
             return web.Response(
                 status=416,
                 body=b"Range Not Satisfiable",
                 headers={"Content-Range": f"bytes */{file_size}"},
             )
 
-        until_bytes = min(until_bytes, file_size - 1)
-        req_length  = until_bytes - from_bytes + 1
-
-        # Chunk offset calculation
-        offset         = from_bytes - (from_bytes % CHUNK_SIZE)
-        first_part_cut = from_bytes - offset
-        last_part_cut  = (until_bytes % CHUNK_SIZE) + 1
-        part_count     = math.ceil((until_bytes + 1) / CHUNK_SIZE) - (offset // CHUNK_SIZE)
-
-        logger.debug(
-            "stream  msg=%s  size=%d  range=%d-%d  offset=%d  parts=%d",
-            message_id, file_size, from_bytes, until_bytes, offset, part_count,
-        )
+        is_range_request = ranges is not None
+        if not is_range_request:
+            ranges = [(0, file_size - 1)]
+        from_bytes, until_bytes = ranges[0][0], ranges[-1][1]
 
         mime = (
-            file_data.get("mime_type")
+            file_data.mime_type
             or _mime_for_filename(
                 file_name,
-                MIME_TYPE_MAP.get(file_data.get("file_type"), "application/octet-stream"),
+                MIME_TYPE_MAP.get(file_data.file_type, "application/octet-stream"),
             )
         )
         if not mime:
@@ -699,7 +988,6 @@ class StreamingService:
 
         headers = {
             "Content-Type":                mime,
-            "Content-Length":              str(req_length),
             "Content-Disposition":         f'{disposition}; filename="{file_name}"',
             "Accept-Ranges":               "bytes",
             "Cache-Control":               "no-store",
@@ -711,8 +999,59 @@ class StreamingService:
             "icy-name":                    file_name,
             "icy-metaint":                 "0",
         }
-        if is_range_request:
-            headers["Content-Range"] = f"bytes {from_bytes}-{until_bytes}/{file_size}"
+        request_id = tracing.current_request_id()
+        if request_id:
+            headers["X-Request-ID"] = request_id
+
+        if len(ranges) == 1:
+            req_length = until_bytes - from_bytes + 1
+            part_heads = None
+
+            # Chunk offset calculation
+            offset         = from_bytes - (from_bytes % CHUNK_SIZE)
+            first_part_cut = from_bytes - offset
+            last_part_cut  = (until_bytes % CHUNK_SIZE) + 1
+            part_count     = math.ceil((until_bytes + 1) / CHUNK_SIZE) - (offset // CHUNK_SIZE)
+
+            logger.debug(
+                "stream  msg=%s  size=%d  range=%d-%d  offset=%d  parts=%d",
+                message_id, file_size, from_bytes, until_bytes, offset, part_count,
+            )
+
+            headers["Content-Length"] = str(req_length)
+            if is_range_request:
+                headers["Content-Range"] = f"bytes {from_bytes}-{until_bytes}/{file_size}"
+
+            body = self.streamer.yield_file(
+                file_id,
+                offset,
+                first_part_cut,
+                last_part_cut,
+                part_count,
+                CHUNK_SIZE,
+            )
+        else:
+            boundary   = uuid.uuid4().hex
+            part_heads = [
+                _multipart_part_header(boundary, mime, start, end, file_size)
+                for start, end in ranges
+            ]
+            closing    = f"\r\n--{boundary}--\r\n".encode()
+            req_length = (
+                sum(len(h) for h in part_heads)
+                + sum(end - start + 1 for start, end in ranges)
+                + len(closing)
+            )
+
+            logger.debug(
+                "stream  msg=%s  size=%d  multipart ranges=%d  bytes=%d",
+                message_id, file_size, len(ranges), req_length,
+            )
+
+            headers["Content-Type"]   = f"multipart/byteranges; boundary={boundary}"
+            headers["Content-Length"] = str(req_length)
+
+            body = self._iter_multipart(file_id, ranges, part_heads, closing)
 
         # Artwork metadata headers for external players (VLC, MX Player, iOS AVPlayer)
         try:
@@ -729,7 +1068,8 @@ class StreamingService:
         response = web.StreamResponse(status=status, headers=headers)
 
         try:
-            await response.prepare(request)
+            with tracing.span("http.prepare", status=status):
+                await response.prepare(request)
         except ConnectionResetError:
             logger.debug(
                 "stream  msg=%s  client dropped before response headers", message_id
@@ -740,72 +1080,162 @@ class StreamingService:
         bytes_sent     = 0
         last_heartbeat = time.monotonic()
         is_first_chunk = True
+        shaped         = egress_shaper.open(client_ip, is_download)
+        route          = "dl" if is_download else "stream"
+        live           = stream_registry.open(
+            file_hash=file_hash,
+            file_name=file_name,
+            message_id=message_id,
+            client_ip=client_ip,
+            client=request.headers.get("User-Agent", "")[:80],
+            route=route,
+            range_from=from_bytes,
+            range_to=until_bytes,
+            length=req_length,
+            dc_id=file_id.dc_id,
+            shaped=shaped,
+        )
+        bytes_counter  = BYTES_SERVED.labels(route)
+        outcome        = "complete"
+        check_quota    = Config.get("bandwidth_mode", True)
+        chunks_sent    = 0
 
-        try:
-            async for chunk in self.streamer.yield_file(
-                file_id,
-                offset,
-                first_part_cut,
-                last_part_cut,
-                part_count,
-                CHUNK_SIZE,
-            ):
-                try:
-                    # For the very first chunk, send a small slice immediately
-                    # to minimize TTFB, then send the remainder
-                    if is_first_chunk and len(chunk) > FIRST_CHUNK_SIZE:
-                        await response.write(chunk[:FIRST_CHUNK_SIZE])
-                        await response.write(chunk[FIRST_CHUNK_SIZE:])
-                        bytes_sent += len(chunk)
-                    else:
-                        await response.write(chunk)
-                        bytes_sent += len(chunk)
-                    is_first_chunk = False
-
-                    now = time.monotonic()
-                    if now - last_heartbeat >= _SESSION_HEARTBEAT_INTERVAL:
-                        await _heartbeat_session(session_key)
-                        last_heartbeat = now
-
-                except (ConnectionResetError, BrokenPipeError):
+        upstream_s     = throttle_s = write_s = 0.0
+
+        # Split body time into upstream wait, shaping and client socket writes
+        with tracing.span("stream.body", route=route, ranges=len(ranges)) as body_span:
+            timing = body_span.recording
+            mark   = time.perf_counter()
+            try:
+                async for chunk in body:
+                    try:
+                        if timing:
+                            tick        = time.perf_counter()
+                            upstream_s += tick - mark
+                        if not live.terminated:
+                            cleared = await shaped.throttle(len(chunk), live.wake)
+                            while not cleared and not live.terminated:
+                                cleared = await shaped.throttle(0, live.wake)
+                        if timing:
+                            mark        = time.perf_counter()
+                            throttle_s += mark - tick
+                        if live.terminated:
+                            outcome = "terminated"
+                            logger.info(
+                                "stream  msg=%s  ip=%s  %s after %d bytes",
+                                message_id, client_ip, live.terminated, bytes_sent,
+                            )
+                            break
+                        # For the very first chunk, send a small slice immediately
+                        # to minimize TTFB, then send the remainder
+                        if is_first_chunk and len(chunk) > FIRST_CHUNK_SIZE:
+                            await response.write(chunk[:FIRST_CHUNK_SIZE])
+                            STREAM_TTFB.labels(route).observe(time.monotonic() - started)
+                            await response.write(chunk[FIRST_CHUNK_SIZE:])
+                            bytes_sent += len(chunk)
+                        else:
+                            await response.write(chunk)
+                            if is_first_chunk:
+                                STREAM_TTFB.labels(route).observe(time.monotonic() - started)
+                            bytes_sent += len(chunk)
+                        bytes_counter.inc(len(chunk))
+                        live.add_bytes(len(chunk))
+                        is_first_chunk = False
+                        if timing:
+                            tick     = time.perf_counter()
+                            write_s += tick - mark
+                            mark     = tick
+
+                        now = time.monotonic()
+                        if now - last_heartbeat >= _SESSION_HEARTBEAT_INTERVAL:
+                            await _heartbeat_session(session_key)
+                            last_heartbeat = now
+
+                        # one long response must not run far past its owner's quota
+                        chunks_sent += 1
+                        if check_quota and chunks_sent % _QUOTA_CHECK_CHUNKS == 0:
+                            exceeded = bandwidth_accountant.over_quota(file_data.user_id, bytes_sent)
+                            if exceeded:
+                                QUOTA_REJECTS.labels(exceeded).inc()
+                                stream_registry.terminate(
+                                    live.id, reason=f"{exceeded} quota exceeded", block=False,
+                                )
+                                outcome = "terminated"
+                                logger.info(
+                                    "stream  msg=%s  ip=%s  %s after %d bytes",
+                                    message_id, client_ip, live.terminated, bytes_sent,
+                                )
+                                break
+
+                    except (ConnectionResetError, BrokenPipeError):
+                        outcome = "disconnect"
+                        logger.debug(
+                            "stream  msg=%s  connection reset after %d bytes",
+                            message_id, bytes_sent,
+                        )
+                        break
+
+            except asyncio.CancelledError:
+                if live.terminated:
+                    # cancelled by a revocation, not by aiohttp: finish the response here
+                    asyncio.current_task().uncancel()
+                    outcome = "terminated"
+                    logger.info(
+                        "stream  msg=%s  ip=%s  %s after %d bytes",
+                        message_id, client_ip, live.terminated, bytes_sent,
+                    )
+                else:
+                    outcome = "disconnect"
                     logger.debug(
-                        "stream  msg=%s  connection reset after %d bytes",
+                        "stream  msg=%s  request cancelled after %d bytes",
                         message_id, bytes_sent,
                     )
-                    break
-
-        except asyncio.CancelledError:
-            logger.debug(
-                "stream  msg=%s  request cancelled after %d bytes",
-                message_id, bytes_sent,
-            )
-        except (ConnectionResetError, BrokenPipeError):
-            logger.debug(
-                "stream  msg=%s  client disconnected after %d bytes",
-                message_id, bytes_sent,
-            )
-        except Exception as exc:
-            logger.error("streaming error: msg=%s err=%s", message_id, exc)
+            except (ConnectionResetError, BrokenPipeError):
+                outcome = "disconnect"
+                logger.debug(
+                    "stream  msg=%s  client disconnected after %d bytes",
+                    message_id, bytes_sent,
+                )
+            except Exception as exc:
+                outcome = "error"
+                logger.error("streaming error: msg=%s err=%s", message_id, exc)
+            finally:
+                egress_shaper.close(shaped)
+                stream_registry.close(live)
+                if outcome == "complete" and bytes_sent < req_length:
+                    outcome = "truncated"
+                STREAMS_FINISHED.labels(route, outcome).inc()
+                body_span.set(
+                    bytes=bytes_sent,
+                    outcome=outcome,
+                    upstream_ms=round(upstream_s * 1000, 1),
+                    throttle_ms=round(throttle_s * 1000, 1),
+                    write_ms=round(write_s * 1000, 1),
+                )
+                try:
+                    await body.aclose()
+                except Exception:
+                    pass
 
+        if outcome == "terminated" and request.transport is not None:
+            # the body is short of Content-Length; drop the connection so the
+            # client sees the end now instead of waiting on keep-alive
+            request.transport.close()
         try:
             await response.write_eof()
         except Exception:
             pass
 
-        # Bandwidth accounting with deduplication
+        # Bandwidth accounting: bill only bytes this viewer hasn't already received
         if bytes_sent > 0:
-            should_track = await _should_track_bandwidth(client_ip, message_id, from_bytes)
-            if should_track:
-                task = asyncio.ensure_future(self.db.track_bandwidth(message_id, bytes_sent))
-                task.add_done_callback(
-                    lambda t: t.exception() and logger.error(
-                        "track_bandwidth error: %s", t.exception()
-                    )
-                )
-            else:
+            spans    = _served_spans(ranges, part_heads, bytes_sent)
+            new_sent = _served_ranges.add(client_ip, message_id, spans)
+            if new_sent > 0:
+                bandwidth_accountant.record(file_hash, message_id, file_data.user_id, new_sent)
+            if new_sent < bytes_sent:
                 logger.debug(
-                    "bw dedup  msg=%s  ip=%s  from=%d  bytes=%d  (skipped)",
-                    message_id, client_ip, from_bytes, bytes_sent,
+                    "bw dedup  msg=%s  ip=%s  sent=%d  billed=%d",
+                    message_id, client_ip, bytes_sent, new_sent,
                 )
 
         return response
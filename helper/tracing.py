@@ -0,0 +1,222 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,64}$")
+_EXPORT_BATCH  = 256
+
+
+class Trace:
+    __slots__ = ("request_id", "sampled")
+
+    def __init__(self, request_id: str, sampled: bool):
+        self.request_id = request_id
+        self.sampled    = sampled
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "flix_trace", default=None
+)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "flix_span", default=None
+)
+
+
+class SpanExporter(ABC):
+    """Receives finished spans as plain dicts. Must not block the event loop."""
+
+    @abstractmethod
+    def export(self, record: Dict[str, Any]) -> None: ...
+
+    def shutdown(self) -> None:
+        pass
+
+
+class JsonLinesExporter(SpanExporter):
+    """Append spans to *path*, one JSON object per line, from a writer thread.
+
+    Once the file reaches *max_bytes* it is moved to ``<path>.1`` (replacing
+    the previous one) and a fresh file is started, so at most two files'
+    worth of spans are kept on disk.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 0):
+        self.path      = path
+        self.max_bytes = max_bytes
+        self._queue: "queue.SimpleQueue[Optional[Dict[str, Any]]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="trace-writer", daemon=True)
+        self._thread.start()
+
+    def export(self, record: Dict[str, Any]) -> None:
+        self._queue.put(record)
+
+    def _rotate(self, fh):
+        fh.close()
+        os.replace(self.path, self.path + ".1")
+        return open(self.path, "a", encoding="utf-8")
+
+    def _run(self) -> None:
+        try:
+            fh = open(self.path, "a", encoding="utf-8")
+        except OSError as exc:
+            logger.error("trace exporter disabled: cannot open %s: %s", self.path, exc)
+            return
+        try:
+            while True:
+                record = self._queue.get()
+                batch: List[Optional[Dict[str, Any]]] = [record]
+                while len(batch) < _EXPORT_BATCH:
+                    try:
+                        batch.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                stop = False
+                for item in batch:
+                    if item is None:
+                        stop = True
+                        continue
+                    fh.write(json.dumps(item, default=str, separators=(",", ":")) + "\n")
+                fh.flush()
+                if stop:
+                    return
+                if self.max_bytes and fh.tell() >= self.max_bytes:
+                    try:
+                        fh = self._rotate(fh)
+                    except OSError as exc:
+                        logger.error("trace exporter disabled: cannot rotate %s: %s", self.path, exc)
+                        return
+        finally:
+            fh.close()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def set_exporter(exporter: Optional[SpanExporter]) -> None:
+    """Replace the span exporter (None disables export)."""
+    global _exporter
+    if _exporter is not None and _exporter is not exporter:
+        _exporter.shutdown()
+    _exporter = exporter
+
+
+def _get_exporter() -> Optional[SpanExporter]:
+    global _exporter
+    if _exporter is None and Config.TRACE_FILE:
+        _exporter = JsonLinesExporter(Config.TRACE_FILE, Config.TRACE_MAX_MB * 1024 * 1024)
+    return _exporter
+
+
+def shutdown() -> None:
+    set_exporter(None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attrs", "wall", "start", "error", "_token")
+
+    recording = True
+
+    def __init__(self, trace: Trace, name: str, attrs: Dict[str, Any]):
+        self.trace     = trace
+        self.name      = name
+        self.attrs     = attrs
+        self.span_id   = uuid.uuid4().hex[:16]
+        self.parent_id = None
+        self.error     = None
+        self._token    = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        parent = _current_span.get()
+        if parent is not None and parent.trace is self.trace:
+            self.parent_id = parent.span_id
+        self._token = _current_span.set(self)
+        self.wall   = time.time()
+        self.start  = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        exporter = _get_exporter()
+        if exporter is not None:
+            try:
+                exporter.export({
+                    "request_id":  self.trace.request_id,
+                    "span_id":     self.span_id,
+                    "parent_id":   self.parent_id,
+                    "name":        self.name,
+                    "ts":          round(self.wall, 6),
+                    "duration_ms": round(duration * 1000, 3),
+                    "error":       self.error,
+                    **({"attrs": self.attrs} if self.attrs else {}),
+                })
+            except Exception as exc:
+                logger.debug("span export failed: %s", exc)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    recording = False
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def begin_request(request_id: Optional[str] = None) -> contextvars.Token:
+    """Start a trace for the current task; honours a well-formed incoming ID."""
+    if not request_id or not _REQUEST_ID_RE.match(request_id):
+        request_id = uuid.uuid4().hex[:16]
+    # nothing to export to — don't pay for recording spans
+    rate    = Config.TRACE_SAMPLE_RATE if _get_exporter() is not None else 0
+    sampled = rate >= 1 or (rate > 0 and random.random() < rate)
+    return _current_trace.set(Trace(request_id, sampled))
+
+
+def end_request(token: contextvars.Token) -> None:
+    _current_trace.reset(token)
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace is not None else None
+
+
+def span(name: str, **attrs):
+    """Context manager timing *name*; a shared no-op unless the request is sampled."""
+    trace = _current_trace.get()
+    if trace is None or not trace.sampled:
+        return NOOP_SPAN
+    return Span(trace, name, attrs)
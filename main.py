@@ -7,7 +7,12 @@ from aiohttp import web
 from bot import Bot
 from app import build_app
 from config import Config
-from database import Database, db_instance
+from database import db_instance, open_database
+from helper import logpipe, tracing
+from helper.loopmon import loop_monitor
+from helper.revocation import revocation_bus
+from helper.accounting import bandwidth_accountant
+from helper.shaping import egress_shaper
 
 
 class LoggingFormatter(logging.Formatter):
@@ -48,14 +53,20 @@ def setup_logging() -> None:
     console = logging.StreamHandler(sys.stdout)
     console.setLevel(logging.INFO)
     console.setFormatter(LoggingFormatter())
-    root.addHandler(console)
 
-    file_h = logging.FileHandler("bot.log", encoding="utf-8")
+    file_h = logpipe.SizeTimeRotatingFileHandler(
+        Config.LOG_FILE,
+        max_bytes=Config.LOG_MAX_MB * 1024 * 1024,
+        backup_count=Config.LOG_BACKUPS,
+        when=Config.LOG_ROTATE_WHEN,
+    )
     file_h.setLevel(logging.DEBUG)
     file_h.setFormatter(
         logging.Formatter("%(asctime)s | %(levelname)-8s | %(name)s | %(message)s")
     )
-    root.addHandler(file_h)
+
+    # console + file are written from the listener thread, never the event loop
+    logpipe.setup(console, file_h)
 
     for noisy in ("pyrogram", "aiohttp", "aiohttp.access", "aiohttp.server", "motor", "pymongo"):
         logging.getLogger(noisy).setLevel(logging.WARNING)
@@ -78,10 +89,13 @@ async def main() -> None:
 
     #Database
     logger.info("🗄️   ᴄᴏɴɴᴇᴄᴛɪɴɢ ᴛᴏ ᴅᴀᴛᴀʙᴀꜱᴇ…")
-    database = Database(Config.DB_URI, Config.DATABASE_NAME)
+    database = open_database(Config.DB_URI, Config.DATABASE_NAME)
     await database.init_db()
     db_instance.set(database)
-    await Config.load(database.db)
+    await Config.load(database)
+    egress_shaper.reload()
+    revocation_bus.start(database)
+    bandwidth_accountant.start(database)
     logger.info("✅  ᴄᴏɴꜰɪɢ ᴄʀᴇᴀᴛᴇᴅ & ꜰᴜʟʟʏ ᴛᴜɴᴇᴅ ɪɴ ᴅʙ")
 
     #Bot
@@ -97,6 +111,9 @@ async def main() -> None:
         bot_info.dc_id,
     )
 
+    loop_monitor.bot = bot
+    loop_monitor.ensure_started()
+
     #Web Server
     logger.info("🌐  ꜱᴛᴀʀᴛɪɴɢ ᴡᴇʙ ꜱᴇʀᴠᴇʀ…")
     web_app = build_app(bot, database)
@@ -120,10 +137,14 @@ async def main() -> None:
         logger.info("🛑  ꜱʜᴜᴛᴛɪɴɢ ᴅᴏᴡɴ ᴡᴇʙ ꜱᴇʀᴠᴇʀ…")
         await runner.cleanup()
         logger.info("🛑  ᴄʟᴏꜱɪɴɢ ᴅᴀᴛᴀʙᴀꜱᴇ…")
+        revocation_bus.stop()
+        await bandwidth_accountant.stop()
         await database.close()
         logger.info("🛑  ꜱᴛᴏᴘᴘɪɴɢ ʙᴏᴛ…")
         await bot.stop()
+        tracing.shutdown()
         logger.info("✅  ꜱʜᴜᴛᴅᴏᴡɴ ᴄᴏᴍᴘʟᴇᴛᴇ")
+        logpipe.shutdown()
 
 
 asyncio.run(main())
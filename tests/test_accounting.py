@@ -0,0 +1,97 @@
+import asyncio
+
+from helper.accounting import _MAX_INTERVALS, BandwidthAccountant, IntervalSet, ServedRanges
+from helper.stream import _served_spans
+
+
+def test_interval_set_counts_only_new_bytes():
+    s = IntervalSet()
+    assert s.add(0, 100) == 100
+    assert s.add(50, 150) == 50
+    assert s.add(0, 150) == 0
+    assert s.add(200, 300) == 100
+    assert list(zip(s.starts, s.ends)) == [(0, 150), (200, 300)]
+    # bridging the gap merges both neighbours
+    assert s.add(100, 250) == 50
+    assert list(zip(s.starts, s.ends)) == [(0, 300)]
+    assert s.covered() == 300
+
+
+def test_interval_set_adjacent_and_empty():
+    s = IntervalSet()
+    assert s.add(10, 10) == 0 and len(s) == 0
+    assert s.add(0, 10) == 10
+    assert s.add(10, 20) == 10
+    assert len(s) == 1 and s.covered() == 20
+
+
+def test_interval_set_caps_range_count():
+    s = IntervalSet()
+    for i in range(_MAX_INTERVALS + 10):
+        s.add(i * 100, i * 100 + 10)
+    assert len(s) == _MAX_INTERVALS
+    assert s.starts == sorted(s.starts)
+    assert all(a < b for a, b in zip(s.ends, s.starts[1:]))
+
+
+def test_served_ranges_per_viewer():
+    served = ServedRanges(ttl=60)
+    assert served.add("1.1.1.1", "42", [(0, 1000)]) == 1000
+    # a player re-requesting an overlapping range is billed only the tail
+    assert served.add("1.1.1.1", "42", [(500, 1500)]) == 500
+    # a different viewer or file is billed in full
+    assert served.add("2.2.2.2", "42", [(0, 1000)]) == 1000
+    assert served.add("1.1.1.1", "43", [(0, 1000)]) == 1000
+    assert served.add("1.1.1.1", "42", [(0, 100), (1400, 1600)]) == 100
+
+
+def test_served_ranges_forget_idle_viewers():
+    served = ServedRanges(ttl=60)
+    now = [0.0]
+    served.viewers._clock = lambda: now[0]
+    served.add("1.1.1.1", "42", [(0, 1000)])
+    now[0] = 61
+    assert served.add("1.1.1.1", "42", [(0, 1000)]) == 1000
+
+
+def test_served_spans_skip_part_headers():
+    ranges = [(0, 9), (500, 509)]
+    heads  = [b"h" * 20, b"h" * 20]
+    assert _served_spans(ranges, heads, 0) == []
+    assert _served_spans(ranges, heads, 25) == [(0, 5)]
+    assert _served_spans(ranges, heads, 45) == [(0, 10)]
+    assert _served_spans(ranges, heads, 55) == [(0, 10), (500, 505)]
+    assert _served_spans([(100, 199)], None, 40) == [(100, 140)]
+
+
+class _BucketSink:
+    def __init__(self):
+        self.calls = []
+        self.fail  = False
+
+    async def add_bandwidth_buckets(self, buckets, files=None):
+        self.calls.append((buckets, dict(files or {})))
+        return not self.fail
+
+
+def test_flush_batches_buckets_and_file_totals():
+    async def run():
+        sink = _BucketSink()
+        acct = BandwidthAccountant()
+        acct._db = sink
+        acct.record("hash1", "1001", "7", 100)
+        acct.record("hash1", "1001", "7", 50)
+        acct.record("hash2", "1002", "7", 25)
+
+        sink.fail = True
+        assert await acct.flush() == 0
+        sink.fail = False
+        acct.record("hash1", "1001", "7", 5)
+        assert await acct.flush() > 0
+
+        buckets, files = sink.calls[-1]
+        assert files == {"1001": 155, "1002": 25}
+        total = [b for b in buckets if b["scope"] == "total"]
+        assert [(b["bytes"], b["requests"]) for b in total] == [(180, 4)]
+        assert await acct.flush() == 0 and len(sink.calls) == 2
+    asyncio.run(run())
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from config import Config
+from helper.admission import AdmissionController, ConnectionLimiter
+from helper.loopmon import loop_monitor
+
+
+@pytest.fixture
+def caps(monkeypatch):
+    monkeypatch.setattr(Config, "MAX_CONNS_PER_IP", 2)
+    monkeypatch.setattr(Config, "MAX_CONNS_PER_FILE", 1)
+    monkeypatch.setattr(Config, "CONN_QUEUE_SIZE", 4)
+    monkeypatch.setattr(Config, "CONN_QUEUE_TIMEOUT", 0.2)
+
+
+def test_caps_per_file_and_per_ip(caps):
+    async def run():
+        limiter = ConnectionLimiter()
+        assert await limiter.acquire("ip1", "a")
+        assert await limiter.acquire("ip1", "b")
+        # per-(IP, file) cap → queue times out
+        assert not await limiter.acquire("ip1", "a")
+        # per-IP cap → queue times out, file slot is given back
+        assert not await limiter.acquire("ip1", "c")
+        assert ("file", "ip1", "c") not in limiter._active
+        # other clients are unaffected
+        assert await limiter.acquire("ip2", "a")
+        assert limiter.rejected == 2
+        assert limiter.snapshot()["connections"] == 3
+    asyncio.run(run())
+
+
+def test_release_hands_slot_to_waiter(caps):
+    async def run():
+        limiter = ConnectionLimiter()
+        assert await limiter.acquire("ip1", "a")
+        waiter = asyncio.create_task(limiter.acquire("ip1", "a"))
+        await asyncio.sleep(0.01)
+        assert limiter.snapshot()["queued"] == 1
+        limiter.release("ip1", "a")
+        assert await waiter
+        assert limiter._active == {("file", "ip1", "a"): 1, ("ip", "ip1"): 1}
+        assert limiter.snapshot()["queued"] == 0
+        limiter.release("ip1", "a")
+        assert limiter._active == {}
+    asyncio.run(run())
+
+
+def test_slot_handed_to_a_waiter_that_gives_up_is_passed_on(caps):
+    async def run():
+        limiter = ConnectionLimiter()
+        key = ("file", "ip1", "a")
+        assert await limiter._acquire_key(key, 1, 1)
+        first  = asyncio.create_task(limiter._acquire_key(key, 1, 1))
+        second = asyncio.create_task(limiter._acquire_key(key, 1, 1))
+        await asyncio.sleep(0.01)
+        # the first waiter gives up in the same tick the slot reaches it
+        first.cancel()
+        limiter._release_key(key, 1)
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second
+        assert limiter._active == {key: 1}
+        assert key not in limiter._waiters
+    asyncio.run(run())
+
+
+def test_timed_out_waiter_leaves_the_queue(caps):
+    async def run():
+        limiter = ConnectionLimiter()
+        key = ("file", "ip1", "a")
+        assert await limiter._acquire_key(key, 1, 1)
+        assert not await limiter._acquire_key(key, 1, 0.01)
+        assert key not in limiter._waiters
+        limiter._release_key(key, 1)
+        assert limiter._active == {}
+    asyncio.run(run())
+
+
+def test_cancel_while_queued_for_ip_releases_file_slot(caps):
+    async def run():
+        limiter = ConnectionLimiter()
+        assert await limiter.acquire("ip1", "a")
+        assert await limiter.acquire("ip1", "b")
+        pending = asyncio.create_task(limiter.acquire("ip1", "c"))
+        await asyncio.sleep(0.01)
+        assert limiter._active.get(("file", "ip1", "c")) == 1
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+        assert ("file", "ip1", "c") not in limiter._active
+        assert limiter.snapshot()["queued"] == 0
+    asyncio.run(run())
+
+
+@pytest.fixture
+def capacity(monkeypatch):
+    monkeypatch.setattr(Config, "MAX_ACTIVE_STREAMS", 1)
+    monkeypatch.setattr(Config, "DL_QUEUE_SIZE", 4)
+    monkeypatch.setattr(Config, "DL_QUEUE_TIMEOUT", 0.2)
+    yield
+    loop_monitor.stop()
+
+
+def test_admission_hands_slots_to_downloads_in_order(capacity):
+    async def run():
+        adm = AdmissionController()
+        assert await adm.acquire(False, False) is None
+        # /stream is shed straight away, /dl queues
+        assert await adm.acquire(False, False) is not None
+        order   = []
+        waiters = [asyncio.create_task(adm.acquire(True, False)) for _ in range(3)]
+        for i, task in enumerate(waiters):
+            task.add_done_callback(lambda t, i=i: order.append(i))
+        await asyncio.sleep(0.01)
+        assert adm.queued == 3
+        for _ in range(3):
+            adm.release()
+            await asyncio.sleep(0)
+        assert await asyncio.gather(*waiters) == [None, None, None]
+        assert order == [0, 1, 2]
+        assert adm.active == 1 and adm.queued == 0
+    asyncio.run(run())
+
+
+def test_admission_queue_timeout_and_cancel(capacity):
+    async def run():
+        adm = AdmissionController()
+        assert await adm.acquire(False, False) is None
+        assert await adm.acquire(True, False) is not None      # timed out
+        assert adm.rejected == 1 and adm.queued == 0
+
+        first  = asyncio.create_task(adm.acquire(True, False))
+        second = asyncio.create_task(adm.acquire(True, False))
+        await asyncio.sleep(0.01)
+        # the first waiter gives up in the same tick the slot reaches it
+        first.cancel()
+        adm.release()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second is None
+        assert adm.active == 1 and adm.queued == 0
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+from helper.expiring import ExpiringDict
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_keys_expire_after_ttl():
+    clock = Clock()
+    d = ExpiringDict(10, clock=clock)
+    d.set("a", 1)
+    clock.now = 9.9
+    assert d.get("a") == 1 and "a" in d
+    clock.now = 10
+    assert d.get("a") is None and "a" not in d
+    assert len(d) == 0
+
+
+def test_set_and_touch_extend_deadline():
+    clock = Clock()
+    d = ExpiringDict(10, clock=clock)
+    d.set("a", 1)
+    d.set("b", 2)
+    clock.now = 8
+    assert d.touch("a")
+    d.set("b", 3)
+    clock.now = 15
+    assert d.get("a") == 1 and d.get("b") == 3
+    assert d.touch("a", 4) and d.get("a") == 4
+    assert not d.touch("missing")
+    clock.now = 30
+    assert len(d) == 0
+
+
+def test_per_key_ttl_and_expire_count():
+    clock = Clock()
+    d = ExpiringDict(10, clock=clock)
+    d.set("short", 1, ttl=1)
+    d.set("long", 2)
+    clock.now = 5
+    assert d.expire() == 1
+    assert dict(d.items()) == {"long": 2}
+
+
+def test_pop_and_clear():
+    clock = Clock()
+    d = ExpiringDict(10, clock=clock)
+    d.set("a", 1)
+    assert d.pop("a") == 1
+    assert d.pop("a", "gone") == "gone"
+    d.set("b", 2)
+    d.clear()
+    assert len(d) == 0 and d.get("b") is None
+
+
+def test_refreshes_do_not_grow_heap_unbounded():
+    clock = Clock()
+    d = ExpiringDict(10, clock=clock)
+    for key in range(10):
+        d.set(key, key)
+    for i in range(10_000):
+        clock.now = i * 0.0001
+        d.touch(i % 10)
+    assert len(d._heap) <= 2 * len(d._data) + 64 + 1
+    assert len(d) == 10
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+from FLiX.gen import FIRST_PAGE, _page_token, _parse_page_token
+
+
+def _anchor(oid: ObjectId, created_at=datetime(2024, 5, 17, 12, 30, 45, 123000)) -> dict:
+    return {"_id": oid, "created_at": created_at}
+
+
+def test_round_trip():
+    oid = ObjectId()
+    for page, backward in ((2, False), (7, True), (0x7FFF, False)):
+        token = _page_token(page, _anchor(oid), backward)
+        assert len(token) == 27
+        assert _parse_page_token(token) == (
+            page, (datetime(2024, 5, 17, 12, 30, 45, 123000), oid), backward,
+        )
+
+
+def test_created_at_is_truncated_to_milliseconds():
+    anchor = _anchor(ObjectId(), datetime(2024, 1, 1, 0, 0, 0, 999999))
+    _, (created_at, _), _ = _parse_page_token(_page_token(2, anchor))
+    assert created_at == datetime(2024, 1, 1, 0, 0, 0, 999000)
+
+
+def test_tokens_containing_underscores_survive_callback_split():
+    oid   = ObjectId(b"\xff" * 12)
+    token = _page_token(3, _anchor(oid), backward=True)
+    assert "_" in token
+
+    # userfiles_<token>
+    data = "userfiles_" + token
+    assert _parse_page_token(data[len("userfiles_"):])[1][1] == oid
+    # ownfiles_<user_id>_<token> and myfile_<_id_hex>_<token>
+    for data in (f"ownfiles_12345_{token}", f"myfile_{oid}_{token}"):
+        parts = data.split("_", 2)
+        assert _parse_page_token(parts[2]) == (
+            3, (datetime(2024, 5, 17, 12, 30, 45, 123000), oid), True,
+        )
+
+
+def test_callback_data_fits_telegram_limit():
+    token = _page_token(0x7FFF, _anchor(ObjectId()), backward=True)
+    for data in (f"userfiles_{token}", f"ownfiles_{10**13}_{token}", f"myfile_{ObjectId()}_{token}"):
+        assert len(data.encode()) <= 64
+
+
+def test_first_page_and_garbage_tokens():
+    assert _parse_page_token(FIRST_PAGE) == (1, None, False)
+    assert _parse_page_token("42") == (1, None, False)
+    for token in ("", "not-a-token", "AAAA", "!" * 27):
+        assert _parse_page_token(token) == (1, None, False)
@@ -0,0 +1,72 @@
+from helper.stream import (
+    _MAX_RANGES,
+    _coalesce_ranges,
+    _multipart_part_header,
+    _parse_range,
+)
+
+SIZE = 1000
+
+
+def test_single_and_open_ended_ranges():
+    assert _parse_range("bytes=0-99", SIZE) == [(0, 99)]
+    assert _parse_range("bytes=900-", SIZE) == [(900, 999)]
+    # end past EOF is clamped
+    assert _parse_range("bytes=950-5000", SIZE) == [(950, 999)]
+
+
+def test_suffix_ranges():
+    assert _parse_range("bytes=-100", SIZE) == [(900, 999)]
+    # suffix longer than the file → whole file
+    assert _parse_range("bytes=-5000", SIZE) == [(0, 999)]
+    # zero-length suffix is unsatisfiable
+    assert _parse_range("bytes=-0", SIZE) == []
+
+
+def test_overlapping_and_adjacent_ranges_coalesce():
+    assert _parse_range("bytes=0-99,50-149", SIZE) == [(0, 149)]
+    assert _parse_range("bytes=0-99,100-199", SIZE) == [(0, 199)]
+    assert _parse_range("bytes=500-599,0-9", SIZE) == [(0, 9), (500, 599)]
+    # suffix overlapping an explicit range
+    assert _parse_range("bytes=850-949,-100", SIZE) == [(850, 999)]
+
+
+def test_unsatisfiable_and_ignored_headers():
+    assert _parse_range("bytes=1000-", SIZE) == []
+    assert _parse_range("bytes=2000-3000,1500-", SIZE) == []
+    for header in ("", "items=0-1", "bytes=", "bytes=a-b", "bytes=5-1", "bytes=0-1,5-1", "bytes=-"):
+        assert _parse_range(header, SIZE) is None, header
+    assert _parse_range("bytes=0-1", 0) is None
+
+
+def test_too_many_ranges_are_ignored():
+    spec = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(_MAX_RANGES + 1))
+    assert _parse_range("bytes=" + spec, SIZE) is None
+    spec = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(_MAX_RANGES))
+    assert len(_parse_range("bytes=" + spec, SIZE)) == _MAX_RANGES
+
+
+def test_coalesce_ranges():
+    assert _coalesce_ranges([]) == []
+    assert _coalesce_ranges([(10, 20), (0, 5), (6, 8), (15, 30)]) == [(0, 8), (10, 30)]
+    assert _coalesce_ranges([(0, 100), (10, 20)]) == [(0, 100)]
+
+
+def test_multipart_framing():
+    ranges = [(0, 9), (500, 509)]
+    heads  = [_multipart_part_header("b0undary", "video/mp4", s, e, SIZE) for s, e in ranges]
+    assert heads[0] == (
+        b"\r\n--b0undary\r\n"
+        b"Content-Type: video/mp4\r\n"
+        b"Content-Range: bytes 0-9/1000\r\n\r\n"
+    )
+    closing = b"\r\n--b0undary--\r\n"
+    body    = heads[0] + b"a" * 10 + heads[1] + b"b" * 10 + closing
+
+    parts = body.split(b"\r\n--b0undary")
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    for part, (start, end) in zip(parts[1:-1], ranges):
+        head, _, payload = part.partition(b"\r\n\r\n")
+        assert f"bytes {start}-{end}/{SIZE}".encode() in head
+        assert len(payload) == end - start + 1
+
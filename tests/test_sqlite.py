@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import FileRecord, SQLiteDatabase, open_database
+
+
+def _file(i: int, user_id: str = "100") -> dict:
+    return {
+        "file_id":          f"hash{i}",
+        "message_id":       str(1000 + i),
+        "telegram_file_id": f"tg{i}",
+        "user_id":          user_id,
+        "username":         "someone",
+        "file_name":        f"file_{i}.mkv",
+        "file_size":        1_000 + i,
+        "file_type":        "video",
+        "mime_type":        "video/x-matroska",
+    }
+
+
+@pytest.fixture
+def run(tmp_path):
+    """Run ``test(db)`` against a fresh database file; reopening keeps the data."""
+    path = str(tmp_path / "flix.db")
+
+    def runner(test):
+        async def main():
+            db = SQLiteDatabase(path)
+            assert await db.init_db()
+            try:
+                return await test(db)
+            finally:
+                await db.close()
+        return asyncio.run(main())
+    return runner
+
+
+def test_open_database_picks_backend(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    opened = [
+        open_database(f"sqlite:///{tmp_path}/a.db", "flix"),
+        SQLiteDatabase.from_uri("sqlite:///rel.db", "flix"),
+        SQLiteDatabase.from_uri("sqlite:///", "flix"),
+    ]
+    try:
+        assert all(isinstance(db, SQLiteDatabase) for db in opened)
+        assert [db.path for db in opened] == [f"{tmp_path}/a.db", "rel.db", "flix.db"]
+    finally:
+        for db in opened:
+            db._shutdown()
+
+
+def test_file_lookups_and_deletes(run):
+    async def test(db):
+        assert await db.add_file(_file(1))
+        assert await db.add_file(_file(2, user_id="200"))
+
+        doc = await db.get_file_by_hash("hash1")
+        assert doc["message_id"] == "1001" and doc["file_size"] == 1001
+        assert (await db.get_file("1001"))["file_id"] == "hash1"
+        assert (await db.get_file_by_oid(str(doc["_id"])))["file_id"] == "hash1"
+        assert await db.get_file_by_oid("not-an-oid") is None
+        assert await db.get_file_by_hash("missing") is None
+
+        record = await db.get_file_record("hash2")
+        assert isinstance(record, FileRecord)
+        assert (record.message_id, record.user_id, record.file_size) == ("1002", "200", 1002)
+
+        assert await db.get_file_refs("200") == [{"file_id": "hash2", "message_id": "1002"}]
+        assert len(await db.get_file_refs()) == 2
+        assert (await db.get_stats())["total_files"] == 2
+
+        assert await db.delete_file("1001")
+        assert not await db.delete_file("1001")
+        assert await db.delete_user_files("200") == 1
+        assert (await db.get_stats())["total_files"] == 0
+    run(test)
+
+
+def test_keyset_pages(run):
+    async def test(db):
+        for i in range(7):
+            await db.add_file(_file(i))
+        await db.add_file(_file(99, user_id="other"))
+        assert await db.count_user_files("100") == 7
+
+        newest_first = [f["file_id"] for f in await db.get_user_files("100", limit=0)]
+        assert newest_first == [f"hash{i}" for i in reversed(range(7))]
+
+        page1 = await db.find_files("100", 3)
+        page2 = await db.find_files("100", 3, (page1[-1]["created_at"], page1[-1]["_id"]))
+        page3 = await db.find_files("100", 3, (page2[-1]["created_at"], page2[-1]["_id"]))
+        ids = [f["file_id"] for f in page1 + page2 + page3]
+        assert ids == newest_first
+
+        back = await db.find_files("100", 3, (page3[0]["created_at"], page3[0]["_id"]), backward=True)
+        assert [f["file_id"] for f in back] == [f["file_id"] for f in page2]
+    run(test)
+
+
+def test_settings_round_trip(run):
+    async def test(db):
+        assert await db.get_settings() is None
+        assert await db.save_settings({"fsub_mode": True, "max_bandwidth": 10, "_id": "x"})
+        assert await db.save_settings({"max_bandwidth": 20})
+        assert await db.get_settings() == {"fsub_mode": True, "max_bandwidth": 20}
+    run(test)
+
+
+def test_bandwidth_counters_survive_reopen(run):
+    async def test(db):
+        await db.add_file(_file(1))
+        assert await db.track_bandwidth("1001", 500)
+        assert await db.update_bandwidth(250)
+        stats = await db.get_bandwidth_stats()
+        assert stats == {"total_bandwidth": 750, "today_bandwidth": 750}
+        assert await db.get_total_bandwidth() == 750
+        assert (await db.get_file("1001"))["bandwidth_used"] == 500
+    run(test)
+
+    async def reopened(db):
+        assert (await db.get_stats())["total_bandwidth"] == 750
+        assert (await db.get_stats())["total_files"] == 1
+        assert await db.reset_bandwidth()
+        assert await db.get_total_bandwidth() == 0
+    run(reopened)
+
+
+def test_bandwidth_buckets(run):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    async def test(db):
+        await db.add_file(_file(1))
+        assert await db.add_bandwidth_buckets([
+            {"scope": "file", "key": "hash1", "hour": hour, "bytes": 100, "requests": 1},
+            {"scope": "file", "key": "hash1", "hour": hour, "bytes": 50, "requests": 2},
+            {"scope": "file", "key": "hash2", "hour": hour - timedelta(hours=1), "bytes": 10, "requests": 1},
+            {"scope": "user_day", "key": "100", "hour": hour, "bytes": 7, "requests": 1},
+        ])
+        since, until = hour - timedelta(hours=2), hour + timedelta(hours=1)
+        history = await db.get_bandwidth_history("file", "hash1", since, until, 3600)
+        assert [(p["bytes"], p["requests"]) for p in history] == [(150, 3)]
+
+        top = await db.get_bandwidth_top("file", since, until)
+        assert [(t["key"], t["bytes"], t["file_name"]) for t in top] == [
+            ("hash1", 150, "file_1.mkv"), ("hash2", 10, ""),
+        ]
+        assert await db.get_user_usage(hour, hour) == {"100": (7, 0)}
+    run(test)
+
+
+def test_users_sudo_and_revocations(run):
+    async def test(db):
+        assert await db.register_user_on_start({"user_id": 5, "username": "u5"})
+        assert not await db.register_user_on_start({"user_id": 5})
+        assert await db.get_user_count() == 1
+        assert (await db.get_user("5"))["username"] == "u5"
+
+        assert await db.add_sudo_user("5", "1")
+        assert await db.is_sudo_user("5")
+        assert [u["user_id"] for u in await db.get_sudo_users()] == ["5"]
+        assert await db.remove_sudo_user("5")
+        assert not await db.is_sudo_user("5")
+
+        since = datetime.utcnow() - timedelta(seconds=1)
+        assert await db.add_revocation("node-a", ["hash1"], ["1001"])
+        revoked = await db.get_revocations(since)
+        assert [(r["node"], r["file_hashes"], r["everything"]) for r in revoked] == [
+            ("node-a", ["hash1"], False),
+        ]
+    run(test)
+
+
+def test_concurrent_writes_are_group_committed(run):
+    async def test(db):
+        results = await asyncio.gather(*(db.add_file(_file(i)) for i in range(200)))
+        assert all(results)
+        assert await db.count_user_files("100") == 200
+        # a failing job rolls back alone; its batch-mates still commit
+        dup, ok = await asyncio.gather(db.add_file(_file(0)), db.add_file(_file(500)))
+        assert (dup, ok) == (False, True)
+        assert await db.get_file_by_hash("hash500")
+        assert (await db.get_stats())["total_files"] == 201
+    run(test)
+
+
+def test_bucket_flush_applies_file_and_daily_totals(run):
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+
+    async def test(db):
+        await db.add_file(_file(1))
+        assert await db.add_bandwidth_buckets(
+            [
+                {"scope": "total", "key": "", "hour": hour, "bytes": 300, "requests": 2},
+                {"scope": "total", "key": "", "hour": hour - timedelta(days=1), "bytes": 50, "requests": 1},
+                {"scope": "file", "key": "hash1", "hour": hour, "bytes": 300, "requests": 2},
+            ],
+            {"1001": 300},
+        )
+        assert (await db.get_file("1001"))["bandwidth_used"] == 300
+        assert await db.get_bandwidth_stats() == {"total_bandwidth": 350, "today_bandwidth": 300}
+        assert await db.get_total_bandwidth() == 350
+    run(test)